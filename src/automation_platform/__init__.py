@@ -10,11 +10,28 @@ from automation_platform.auth.routes import auth_bp
 from automation_platform.api import api
 from datetime import timedelta
 from automation_platform.scheduler.scheduler import scheduler_service
+from automation_platform.bot_logs.stream import log_stream_hub
 import logging
 from logging.handlers import RotatingFileHandler
 import os
 
-def create_app():
+SCHEDULER_MODES = ("embedded", "web", "worker")
+
+
+def create_app(scheduler_mode: str | None = None):
+    """
+    Build the Flask app.
+
+    scheduler_mode overrides settings.SCHEDULER_MODE:
+      - "embedded": web server and scheduler in one process (default)
+      - "web": serve requests only; schedules and executions are written
+        to the database and picked up by a separate worker process
+      - "worker": run the scheduler and bots (see automation_platform.worker)
+    """
+    scheduler_mode = scheduler_mode or settings.SCHEDULER_MODE
+    if scheduler_mode not in SCHEDULER_MODES:
+        raise ValueError(f"Invalid SCHEDULER_MODE '{scheduler_mode}', expected one of {SCHEDULER_MODES}")
+
     app = Flask(
         __name__,
         template_folder="templates",  
@@ -28,6 +45,35 @@ def create_app():
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["BOT_EXECUTION_TIMEOUT"] = None
     app.config["SCHEDULER_THREAD_POOL_SIZE"] = 20
+    app.config["SUPERVISOR_MAX_CONCURRENCY"] = 200  # bots running at once
+    app.config["BOT_KILL_GRACE_SECONDS"] = 10  # SIGTERM to SIGKILL on kills and timeouts
+    app.config["STRAY_SWEEP_INTERVAL"] = 60  # seconds; 0 only reaps strays when a bot exits
+    app.config["SCHEDULER_MODE"] = scheduler_mode
+    app.config["WORKER_POLL_INTERVAL"] = 5  # seconds
+    app.config["RUN_NOW_WORKERS"] = 2  # threads handing "Run now" requests to the dispatcher
+    app.config["FILE_WATCH_POLL_INTERVAL"] = 5  # seconds; only used where inotify is unavailable
+    app.config["SCHEDULE_RECONCILE_INTERVAL"] = 60  # seconds
+    app.config["SCHEDULE_JITTER_MAX_SECONDS"] = settings.SCHEDULE_JITTER_MAX_SECONDS  # see scheduler/smoothing.py
+    app.config["LAUNCH_RATE"] = settings.LAUNCH_RATE  # bot launches per second per worker, 0 = unlimited
+    app.config["LAUNCH_BURST"] = settings.LAUNCH_BURST
+    app.config["EXECUTION_LEASE_SECONDS"] = 60  # renewed every poll while claimed
+    app.config["EXECUTION_FLUSH_INTERVAL"] = 0.5  # seconds; 0 writes state changes synchronously
+    app.config["EXECUTION_FLUSH_BATCH_SIZE"] = 100
+    app.config["WARM_POOLS"] = settings.WARM_POOLS  # opt-in per interpreter, see scheduler/warm_pool.py
+    app.config["BOT_LOG_ROTATION"] = {  # per-bot overrides on Bot.log_*, see bot_logs/rotation.py
+        "log_rotate_mb": settings.BOT_LOG_ROTATE_MB,
+        "log_rotate_days": settings.BOT_LOG_ROTATE_DAYS,
+        "log_keep_files": settings.BOT_LOG_KEEP_FILES,
+        "log_keep_days": settings.BOT_LOG_KEEP_DAYS
+    }
+    app.config["LOG_WRITER_QUEUE_BYTES"] = 8 * 1024 * 1024  # bot output waiting for the disk; then bots are held
+    app.config["LOG_WRITER_MAX_OPEN_FILES"] = 256  # least recently written logs are closed past this
+    app.config["LOG_WRITER_FSYNC_INTERVAL"] = 5  # seconds; 0 leaves syncing to the OS
+    app.config["LOG_INDEX_PATH"] = "logs/log_index.db"  # shared by the worker (indexes) and web (searches)
+    app.config["LOG_INDEX_INTERVAL"] = 10  # seconds
+    app.config["LOG_INDEX_KEEP_DAYS"] = 30
+    app.config["LOG_STREAM_MAX_CLIENTS"] = 32  # open log streams, each holds a server thread
+    app.config["LOG_STREAM_MAX_SECONDS"] = 1800  # then the browser reconnects and resumes
 
     # --- Setup Logging ---
     setup_logging(app)
@@ -38,6 +84,7 @@ def create_app():
     
     # Initialize scheduler
     scheduler_service.init_app(app)
+    log_stream_hub.init_app(app)
     
     # --- Register Blueprints ---
     app.register_blueprint(api)
@@ -8,6 +8,9 @@ from .populate import populate_bp
 from .schedule import schedule_bp
 from .schedule_reports import schedule_reports_bp
 from .bot_reports import bot_reports_bp
+from .triggers import triggers_bp
+from .pipelines import pipelines_bp
+from .log_search import log_search_bp
 
 api = Blueprint('api', __name__)
 
@@ -18,6 +21,9 @@ api.register_blueprint(populate_bp, url_prefix='/api/populate')
 api.register_blueprint(schedule_bp, url_prefix='/api/schedule')
 api.register_blueprint(schedule_reports_bp, url_prefix='/api/schedule_reports')
 api.register_blueprint(bot_reports_bp, url_prefix='/api/bot_reports')
+api.register_blueprint(triggers_bp, url_prefix='/api/triggers')
+api.register_blueprint(pipelines_bp, url_prefix='/api/pipelines')
+api.register_blueprint(log_search_bp, url_prefix='/api/logs')
 
 
 
@@ -1,9 +1,13 @@
-from flask import Blueprint, session, request, render_template, jsonify, redirect, url_for
-from automation_platform.database.models import Bot, User, BotAssignment, Organization, BotExecution
+from flask import Blueprint, session, request, render_template, jsonify, redirect, url_for, Response, current_app
+from automation_platform.database.models import Bot, User, BotAssignment, Organization, BotExecution, OverlapPolicy
 from automation_platform.database.database import db
 from automation_platform.auth.middleware import login_required, admin_required
+from automation_platform.scheduler.dispatch import normalize_priority
+from automation_platform.bot_logs.tail import DEFAULT_TAIL_LINES, read_since, tail_lines
+from automation_platform.bot_logs.stream import (
+    RETRY_MS, StreamLimitReached, event_id_to_cursor, log_event_stream, log_stream_hub
+)
 from sqlalchemy import func, desc
-from pathlib import Path
 import os
 
 bot_control_bp = Blueprint('bot_control_bp', __name__)
@@ -161,6 +165,20 @@ def bot_logs_page():
 @bot_control_bp.route("/bot-wise-logs", methods=["POST"])
 @login_required
 def get_bot_logs():
+    """
+    The bot's log, incrementally.
+
+    Body:
+    {
+        "bot_id": 1,
+        "lines": 500,                                (optional: first request, last N lines)
+        "cursor": {"offset": 1048576, "inode": 42}   (optional: the cursor of the previous response)
+    }
+
+    With a cursor only the bytes appended since are returned. "reset" is
+    true when the text replaces what the client has (first request, log
+    rotated or truncated) and "more" when there is more to read right away.
+    """
     data = request.get_json(silent=True)
     if not data or "bot_id" not in data:
         return jsonify({"error": "bot_id is required"}), 400
@@ -172,25 +190,89 @@ def get_bot_logs():
     if not bot:
         return jsonify({"error": "Bot not found"}), 404
 
-    # Check log file path
-    log_file_path = bot.log_file_path
-    log_file = Path(log_file_path) if log_file_path else None
-
-    content = ""
-    if log_file and log_file.exists():
-        with open(log_file, "r", encoding="utf-8", errors="replace") as f:
-            content = f.read()
-    else:
-        content = "Log file not found"
-
-    return jsonify({
+    response = {
         "bot_id": bot_id,
-        "logs": content,
         "is_active": bot.is_active,
         "bot_custom_url": bot.bot_custom_url if bot.bot_custom_url else None
+    }
+
+    # Check log file path
+    log_file_path = bot.log_file_path
+    try:
+        if not log_file_path:
+            raise FileNotFoundError(log_file_path)
+        if data.get("cursor"):
+            chunk = read_since(log_file_path, data["cursor"])
+        else:
+            lines = data.get("lines", DEFAULT_TAIL_LINES)
+            if isinstance(lines, bool) or not isinstance(lines, int):
+                return jsonify({"error": "lines must be an integer"}), 400
+            chunk = tail_lines(log_file_path, lines)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (FileNotFoundError, IsADirectoryError):
+        response.update({"logs": "Log file not found", "cursor": None, "reset": True, "more": False})
+        return jsonify(response)
+
+    response.update({
+        "logs": chunk["text"],
+        "cursor": chunk["cursor"],
+        "reset": chunk["reset"],
+        "more": chunk["more"]
     })
+    return jsonify(response)
 
 
+@bot_control_bp.route("/bot-wise-logs/stream", methods=["GET"])
+@login_required
+def stream_bot_logs():
+    """
+    The bot's log and execution status as Server-Sent Events.
+
+    Query: bot_id, lines (optional, backlog on a fresh connection) and
+    last_event_id (optional, same as the Last-Event-ID header the browser
+    sends on reconnect: resume right after that event).
+
+    Events: "log" {logs, reset} with the cursor as id, and "status"
+    {execution_id, status, started_at, completed_at, is_active}.
+    """
+    bot_id = request.args.get("bot_id", type=int)
+    if bot_id is None:
+        return jsonify({"error": "bot_id is required"}), 400
+    lines = request.args.get("lines", DEFAULT_TAIL_LINES, type=int)
+
+    user = db.session.query(User).get(session.get("user", {}).get("id"))
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    bot = db.session.query(Bot).get(bot_id)
+    if not bot:
+        return jsonify({"error": "Bot not found"}), 404
+    # Only the bot's own organization may watch it, admins included
+    if user.organization_id != bot.organization_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    log_file_path = bot.log_file_path
+
+    cursor = event_id_to_cursor(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+    try:
+        subscriber = log_stream_hub.subscribe(bot_id, log_file_path)
+    except StreamLimitReached:
+        response = jsonify({"error": "Too many open log streams, try again later"})
+        response.headers["Retry-After"] = str(RETRY_MS // 1000)
+        return response, 503
+
+    stream = log_event_stream(
+        log_stream_hub, subscriber, log_file_path, cursor, lines,
+        max_seconds=current_app.config["LOG_STREAM_MAX_SECONDS"]
+    )
+    # No request context in the stream: it would hold a database session
+    # for as long as the client stays connected
+    response = Response(stream, mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Also covers a client that leaves before the stream starts
+    response.call_on_close(lambda: log_stream_hub.unsubscribe(subscriber))
+    return response
+
 
 @bot_control_bp.route("/set-status", methods=["POST"])
 @admin_required
@@ -224,6 +306,128 @@ def set_bot_status():
 
 
 
+@bot_control_bp.route("/set-priority", methods=["POST"])
+@admin_required
+def set_bot_priority():
+    data = request.get_json() or {}
+    bot_id = data.get("bot_id")
+    priority = data.get("priority")
+
+    if bot_id is None or priority is None:
+        return jsonify({"error": "Bot ID and 'priority' are required"}), 400
+
+    try:
+        priority = normalize_priority(priority)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    bot = db.session.query(Bot).filter_by(bot_id=bot_id).first()
+    if not bot:
+        return jsonify({"error": "Bot not found"}), 404
+
+    bot.priority = priority
+
+    try:
+        db.session.commit()
+        return jsonify({
+            "message": "Bot priority updated successfully",
+            "bot_id": bot.bot_id,
+            "priority": bot.priority
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@bot_control_bp.route("/set-overlap-policy", methods=["POST"])
+@admin_required
+def set_bot_overlap_policy():
+    """
+    What a new run does while the bot is busy.
+    Body: {"bot_id": 1, "policy": "SKIP|QUEUE|COALESCE|REPLACE", "max_queued_runs": 3}
+    """
+    data = request.get_json() or {}
+    bot_id = data.get("bot_id")
+    policy = data.get("policy")
+
+    if bot_id is None or policy is None:
+        return jsonify({"error": "Bot ID and 'policy' are required"}), 400
+
+    try:
+        policy = OverlapPolicy(str(policy).upper())
+    except ValueError:
+        return jsonify({"error": f"Policy must be one of {', '.join(p.value for p in OverlapPolicy)}"}), 400
+
+    max_queued_runs = data.get("max_queued_runs")
+    if max_queued_runs is not None and (isinstance(max_queued_runs, bool) or not isinstance(max_queued_runs, int) or max_queued_runs < 0):
+        return jsonify({"error": "max_queued_runs must be a non-negative integer"}), 400
+
+    bot = db.session.query(Bot).filter_by(bot_id=bot_id).first()
+    if not bot:
+        return jsonify({"error": "Bot not found"}), 404
+
+    bot.overlap_policy = policy
+    if max_queued_runs is not None:
+        bot.max_queued_runs = max_queued_runs
+
+    try:
+        db.session.commit()
+        return jsonify({
+            "message": "Bot overlap policy updated successfully",
+            "bot_id": bot.bot_id,
+            "policy": bot.overlap_policy.value,
+            "max_queued_runs": bot.max_queued_runs
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@bot_control_bp.route("/set-log-retention", methods=["POST"])
+@admin_required
+def set_bot_log_retention():
+    """
+    Rotation and retention of the bot's log file.
+    Body: {"bot_id": 1, "rotate_mb": 100, "rotate_days": 7, "keep_files": 10, "keep_days": 90}
+    Each field is optional: a number sets it (0 = no limit), null goes back
+    to the platform default.
+    """
+    data = request.get_json() or {}
+    bot_id = data.get("bot_id")
+    if bot_id is None:
+        return jsonify({"error": "Bot ID is required"}), 400
+
+    fields = {"rotate_mb": "log_rotate_mb", "rotate_days": "log_rotate_days",
+              "keep_files": "log_keep_files", "keep_days": "log_keep_days"}
+    for field in fields:
+        value = data.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+            return jsonify({"error": f"{field} must be a non-negative integer or null"}), 400
+
+    bot = db.session.query(Bot).filter_by(bot_id=bot_id).first()
+    if not bot:
+        return jsonify({"error": "Bot not found"}), 404
+
+    for field, column in fields.items():
+        if field in data:
+            setattr(bot, column, data[field])
+
+    try:
+        db.session.commit()
+        defaults = current_app.config["BOT_LOG_ROTATION"]
+        return jsonify({
+            "message": "Bot log retention updated successfully",
+            "bot_id": bot.bot_id,
+            **{
+                field: getattr(bot, column) if getattr(bot, column) is not None else defaults[column]
+                for field, column in fields.items()
+            }
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
 # --- API Route 1: Fetch all active Organizations ---
 @bot_control_bp.route('/organizations', methods=['GET'])
 @login_required
@@ -0,0 +1,117 @@
+from flask import Blueprint, current_app, session, request, jsonify
+from automation_platform.database.database import db
+from automation_platform.database.models import Bot, BotExecutionLogSegment, User
+from automation_platform.bot_logs.search import MAX_PAGE_SIZE, fts_query, matching_line, search
+from automation_platform.bot_logs.segments import LogSegmentGone, open_source
+from automation_platform.auth.middleware import login_required
+from datetime import datetime, timedelta
+import re, pytz
+
+log_search_bp = Blueprint('log_search_bp', __name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+
+def _timestamp(value: str | None) -> float | None:
+    """Epoch seconds of an ISO date/time; naive values are IST like the rest of the platform"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date/time '{value}', expected ISO 8601")
+    if moment.tzinfo is None:
+        moment = ist.localize(moment)
+    return moment.timestamp()
+
+
+def _execution_at(path: str, inode: int, offset: int) -> int | None:
+    """The execution whose output holds this byte of the log"""
+    segment = (
+        BotExecutionLogSegment.query
+        .filter(
+            BotExecutionLogSegment.log_inode == inode,
+            BotExecutionLogSegment.offset <= offset,
+            BotExecutionLogSegment.log_file_path == path
+        )
+        .order_by(BotExecutionLogSegment.offset.desc())
+        .first()
+    )
+    if segment and offset < segment.offset + segment.length:
+        return segment.execution_id
+    return None
+
+
+@log_search_bp.route('/search', methods=['GET'])
+@login_required
+def search_logs():
+    """
+    Search the logs of the caller's organization's bots.
+
+    Query: q (required), match (phrase|all|any, default phrase), bot_id
+    (repeatable), since / until (ISO date/time) or days, limit (max 100)
+    and cursor (next_cursor of the previous page). Newest matches first.
+    """
+    try:
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        text = (request.args.get('q') or '').strip()
+        if not text:
+            return jsonify({'error': 'q is required'}), 400
+        mode = request.args.get('match', 'phrase')
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PAGE_SIZE)
+        bot_ids = request.args.getlist('bot_id', type=int)
+
+        try:
+            query = fts_query(text, mode)
+            since = _timestamp(request.args.get('since'))
+            until = _timestamp(request.args.get('until'))
+            days = request.args.get('days', type=int)
+            if days and since is None:
+                since = (datetime.now(ist) - timedelta(days=days)).timestamp()
+            docs, next_cursor = search(
+                current_app.config['LOG_INDEX_PATH'], query, user.organization_id,
+                bot_ids=bot_ids, since=since, until=until, cursor=request.args.get('cursor'), limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except FileNotFoundError:
+            return jsonify({'hits': [], 'next_cursor': None, 'note': 'Logs have not been indexed yet'})
+
+        bots = {
+            bot.bot_id: bot.bot_name
+            for bot in Bot.query.filter(Bot.bot_id.in_({doc['bot_id'] for doc in docs})).all()
+        } if docs else {}
+        words = re.findall(r"\w+", text)
+        phrase = " ".join(words) if mode == 'phrase' else None
+
+        hits = []
+        for doc in docs:
+            offset, line = doc['offset'], None
+            try:
+                source = open_source(doc['path'], doc['inode'])
+                try:
+                    chunk = source.read(doc['offset'], doc['length']).decode('utf-8', errors='replace')
+                finally:
+                    source.close()
+                position, line = matching_line(chunk, [phrase] if phrase else words)
+                offset += position
+            except LogSegmentGone:
+                pass  # deleted past its retention; the hit is still reported
+
+            hits.append({
+                'bot_id': doc['bot_id'],
+                'bot_name': bots.get(doc['bot_id']),
+                'execution_id': _execution_at(doc['path'], doc['inode'], offset),
+                'log_file': doc['path'],
+                'inode': doc['inode'],
+                'offset': offset,
+                'line': line,
+                'logged_at': datetime.fromtimestamp(doc['logged_at'], ist).replace(tzinfo=None).isoformat()
+            })
+
+        return jsonify({'hits': hits, 'next_cursor': next_cursor})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,345 @@
+from flask import Blueprint, session, request, jsonify
+from automation_platform.database.database import db
+from automation_platform.database.models import (
+    Bot, BotSchedule, EdgeCondition, Pipeline, PipelineEdge, PipelineNode, PipelineRun, PipelineRunStatus, User
+)
+from automation_platform.scheduler.scheduler import scheduler_service
+from automation_platform.scheduler.pipelines import root_node_ids, run_summary, validate_graph
+from automation_platform.auth.middleware import login_required
+
+pipelines_bp = Blueprint('pipelines_bp', __name__)
+
+
+def _current_user():
+    return db.session.get(User, session.get("user", {}).get("id"))
+
+
+def _pipeline_dict(pipeline: Pipeline) -> dict:
+    roots = root_node_ids(pipeline)
+    return {
+        'pipeline_id': pipeline.pipeline_id,
+        'name': pipeline.name,
+        'description': pipeline.description,
+        'is_active': pipeline.is_active,
+        'trigger_schedule_id': pipeline.trigger_schedule_id,
+        'bots': [
+            {'bot_id': node.bot_id, 'bot_name': node.bot.bot_name, 'root': node.node_id in roots}
+            for node in pipeline.nodes
+        ],
+        'edges': [
+            {'from': edge.upstream.bot_id, 'to': edge.downstream.bot_id, 'condition': edge.condition.value}
+            for edge in pipeline.edges
+        ]
+    }
+
+
+def _apply_graph(pipeline: Pipeline, data: dict, organization_id: int):
+    """
+    Replace the pipeline's bots and edges from request data:
+    "bots": [bot_id, ...], "edges": [{"from": bot_id, "to": bot_id, "condition": "SUCCESS"}].
+    Raises ValueError.
+    """
+    bot_ids = data.get('bots') or []
+    if not isinstance(bot_ids, list) or not all(isinstance(b, int) and not isinstance(b, bool) for b in bot_ids):
+        raise ValueError("bots must be a list of bot ids")
+    edges = []
+    for edge in data.get('edges') or []:
+        try:
+            condition = EdgeCondition((edge.get('condition') or EdgeCondition.SUCCESS.value).upper())
+            edges.append((int(edge['from']), int(edge['to']), condition))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError(
+                f"Each edge needs from and to bot ids and a condition of {', '.join(c.value for c in EdgeCondition)}"
+            )
+    if len({(up, down) for up, down, _ in edges}) != len(edges):
+        raise ValueError("Duplicate edge")
+    validate_graph(bot_ids, [(up, down) for up, down, _ in edges])
+
+    bots = {bot.bot_id: bot for bot in Bot.query.filter(Bot.bot_id.in_(bot_ids)).all()}
+    for bot_id in bot_ids:
+        if bot_id not in bots or bots[bot_id].organization_id != organization_id:
+            raise ValueError(f"Bot {bot_id} not found")
+
+    pipeline.edges = []
+    pipeline.nodes = []
+    db.session.flush()
+    nodes = {bot_id: PipelineNode(bot_id=bot_id) for bot_id in bot_ids}
+    pipeline.nodes = list(nodes.values())
+    pipeline.edges = [
+        PipelineEdge(upstream=nodes[up], downstream=nodes[down], condition=condition)
+        for up, down, condition in edges
+    ]
+
+
+def _check_trigger_schedule(schedule_id, pipeline: Pipeline, organization_id: int):
+    """The trigger schedule must run a root bot of the pipeline. Raises ValueError."""
+    if schedule_id is None:
+        return
+    schedule = db.session.get(BotSchedule, schedule_id)
+    if not schedule or schedule.bot.organization_id != organization_id:
+        raise ValueError(f"Schedule {schedule_id} not found")
+    targets = {edge.downstream.bot_id for edge in pipeline.edges}
+    bots = {node.bot_id for node in pipeline.nodes}
+    if schedule.bot_id not in bots or schedule.bot_id in targets:
+        raise ValueError("The trigger schedule must run one of the pipeline's root bots")
+    other = Pipeline.query.filter(
+        Pipeline.trigger_schedule_id == schedule_id, Pipeline.pipeline_id != pipeline.pipeline_id
+    ).first()
+    if other:
+        raise ValueError(f"Schedule {schedule_id} already triggers pipeline {other.pipeline_id}")
+
+
+def _has_running_run(pipeline_id: int) -> bool:
+    return db.session.query(PipelineRun.run_id).filter(
+        PipelineRun.pipeline_id == pipeline_id, PipelineRun.status == PipelineRunStatus.RUNNING
+    ).first() is not None
+
+
+@pipelines_bp.route('', methods=['GET'])
+@login_required
+def list_pipelines():
+    """Pipelines of the user's organization"""
+    try:
+        user = _current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        pipelines = Pipeline.query.filter_by(organization_id=user.organization_id)\
+            .order_by(Pipeline.pipeline_id).all()
+        return jsonify({'pipelines': [_pipeline_dict(p) for p in pipelines]})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('', methods=['POST'])
+@login_required
+def create_pipeline():
+    """
+    Create a pipeline: a DAG of bots where a bot runs as soon as the bots
+    it depends on have ended as its edges require.
+
+    Body:
+    {
+        "name": "Nightly inventory",
+        "bots": [1, 2, 3],
+        "edges": [{"from": 1, "to": 2, "condition": "SUCCESS"},
+                  {"from": 1, "to": 3, "condition": "FAILED"}],
+        "trigger_schedule_id": 7,  (optional: runs of this schedule of bot 1 start the pipeline)
+        "description": "...",
+        "is_active": true
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        user = _current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if not data.get('name'):
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        pipeline = Pipeline(
+            organization_id=user.organization_id,
+            name=data['name'],
+            description=data.get('description'),
+            is_active=data.get('is_active', True),
+            created_by=user.user_id
+        )
+        db.session.add(pipeline)
+        try:
+            _apply_graph(pipeline, data, user.organization_id)
+            db.session.flush()
+            _check_trigger_schedule(data.get('trigger_schedule_id'), pipeline, user.organization_id)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        pipeline.trigger_schedule_id = data.get('trigger_schedule_id')
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'pipeline_id': pipeline.pipeline_id,
+            'message': 'Pipeline created successfully'
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/<int:pipeline_id>', methods=['GET'])
+@login_required
+def get_pipeline(pipeline_id):
+    try:
+        user = _current_user()
+        pipeline = db.session.get(Pipeline, pipeline_id)
+        if not pipeline:
+            return jsonify({'error': 'Pipeline not found'}), 404
+        if user.organization_id != pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+        return jsonify(_pipeline_dict(pipeline))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/<int:pipeline_id>', methods=['PUT'])
+@login_required
+def update_pipeline(pipeline_id):
+    """
+    Update a pipeline. Sending "bots" replaces the whole graph (with
+    "edges"), which is refused while a run is in progress.
+    """
+    try:
+        data = request.get_json() or {}
+        user = _current_user()
+        pipeline = db.session.get(Pipeline, pipeline_id)
+        if not pipeline:
+            return jsonify({'error': 'Pipeline not found'}), 404
+        if user.organization_id != pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        if 'name' in data:
+            pipeline.name = data['name']
+        if 'description' in data:
+            pipeline.description = data['description']
+        if 'is_active' in data:
+            pipeline.is_active = data['is_active']
+
+        try:
+            if 'bots' in data:
+                if _has_running_run(pipeline_id):
+                    return jsonify({'error': 'Pipeline has a run in progress'}), 409
+                _apply_graph(pipeline, data, user.organization_id)
+                db.session.flush()
+            trigger_schedule_id = data.get('trigger_schedule_id', pipeline.trigger_schedule_id)
+            _check_trigger_schedule(trigger_schedule_id, pipeline, user.organization_id)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        pipeline.trigger_schedule_id = trigger_schedule_id
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Pipeline updated successfully'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/<int:pipeline_id>', methods=['DELETE'])
+@login_required
+def delete_pipeline(pipeline_id):
+    """Delete a pipeline and its run history; bot executions are kept"""
+    try:
+        user = _current_user()
+        pipeline = db.session.get(Pipeline, pipeline_id)
+        if not pipeline:
+            return jsonify({'error': 'Pipeline not found'}), 404
+        if user.organization_id != pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+        if _has_running_run(pipeline_id):
+            return jsonify({'error': 'Pipeline has a run in progress'}), 409
+
+        db.session.delete(pipeline)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Pipeline deleted successfully'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/<int:pipeline_id>/run', methods=['POST'])
+@login_required
+def run_pipeline(pipeline_id):
+    """Start a run now; its root bots are queued like manual runs"""
+    try:
+        user = _current_user()
+        pipeline = db.session.get(Pipeline, pipeline_id)
+        if not pipeline:
+            return jsonify({'error': 'Pipeline not found'}), 404
+        if user.organization_id != pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+        if not pipeline.is_active:
+            return jsonify({'error': 'Pipeline is inactive'}), 400
+
+        try:
+            run_id = scheduler_service.run_pipeline(pipeline_id, user.user_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'message': 'Pipeline run started',
+            'run_id': run_id
+        }), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/<int:pipeline_id>/runs', methods=['GET'])
+@login_required
+def get_pipeline_runs(pipeline_id):
+    """Runs of a pipeline, newest first, with their end-to-end duration"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        user = _current_user()
+        pipeline = db.session.get(Pipeline, pipeline_id)
+        if not pipeline:
+            return jsonify({'error': 'Pipeline not found'}), 404
+        if user.organization_id != pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        runs = PipelineRun.query.filter_by(pipeline_id=pipeline_id)\
+            .order_by(PipelineRun.started_at.desc(), PipelineRun.run_id.desc())\
+            .paginate(page=page, per_page=per_page, error_out=False)
+
+        return jsonify({
+            'runs': [{
+                'run_id': r.run_id,
+                'status': r.status.value,
+                'triggered_by': r.triggered_by_user.name if r.triggered_by_user else ('Scheduled' if r.schedule_id else None),
+                'started_at': r.started_at.isoformat(),
+                'completed_at': r.completed_at.isoformat() if r.completed_at else None,
+                'duration_seconds': (r.completed_at - r.started_at).total_seconds() if r.completed_at else None
+            } for r in runs.items],
+            'total': runs.total,
+            'page': page,
+            'per_page': per_page,
+            'pages': runs.pages
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pipelines_bp.route('/runs/<int:run_id>', methods=['GET'])
+@login_required
+def get_pipeline_run(run_id):
+    """
+    Status of a pipeline run: every bot's execution, how long it waited
+    after its upstream bots ended and how long it ran, and the run's
+    end-to-end duration.
+    """
+    try:
+        user = _current_user()
+        run = db.session.get(PipelineRun, run_id)
+        if not run:
+            return jsonify({'error': 'Pipeline run not found'}), 404
+        if user.organization_id != run.pipeline.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+        return jsonify(run_summary(run))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,17 +1,38 @@
-from flask import Blueprint, session, request, jsonify
+from flask import Blueprint, current_app, session, request, jsonify
 from automation_platform.database.database import db
 from automation_platform.database.models import (
-    Bot, BotSchedule, BotExecution, ExecutionStatus, User, BotAssignment
+    Bot, BotSchedule, BotExecution, BotExecutionMetric, BotExecutionUsage, ExecutionStatus, TriggerType, User,
+    BotAssignment, Organization
 )
 from automation_platform.scheduler.scheduler import scheduler_service
 from automation_platform.scheduler.scheduler import kill_bot
-from automation_platform.auth.middleware import login_required
-from datetime import datetime, timezone
-from croniter import croniter
-import pytz
+from automation_platform.scheduler.dispatch import normalize_priority, queue_depths
+from automation_platform.scheduler.forecast import MAX_WINDOW_HOURS, forecast
+from automation_platform.scheduler.triggers import new_webhook_token, parse_trigger_type, validate_trigger
+from automation_platform.bot_logs.records import metric_name
+from automation_platform.bot_logs.segments import LogSegmentGone, read_segments
+from automation_platform.bot_logs.tail import MAX_READ_BYTES
+from automation_platform.auth.middleware import login_required, admin_required
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, func, or_
+import base64, json, pytz
 
 schedule_bp = Blueprint('schedule_bp', __name__)
 
+TRIGGER_FIELDS = ('trigger_type', 'cron_expression', 'watch_path', 'watch_pattern', 'debounce_seconds')
+
+
+def _set_webhook_token(schedule: BotSchedule):
+    """A new token for a WEBHOOK schedule that has none; returns it (shown once)"""
+    if schedule.trigger_type != TriggerType.WEBHOOK:
+        schedule.webhook_token_hash = None
+        return None
+    if schedule.webhook_token_hash:
+        return None
+    token, schedule.webhook_token_hash = new_webhook_token()
+    return token
+
+
 @schedule_bp.route('/run/<int:bot_id>', methods=['POST'])
 @login_required
 def run_bot_immediately(bot_id):
@@ -41,6 +62,16 @@ def run_bot_immediately(bot_id):
         
         # Execute bot immediately
         execution = scheduler_service.run_bot_immediately(bot_id, user_id)
+
+        # Overlap policy turned the run down while the bot is busy
+        if execution.status == ExecutionStatus.SKIPPED:
+            return jsonify({
+                'success': False,
+                'message': 'Bot execution skipped',
+                'reason': execution.status_reason,
+                'execution_id': execution.execution_id,
+                'status': execution.status.value
+            }), 409
         
         return jsonify({
             'success': True,
@@ -66,15 +97,21 @@ def create_schedule():
         "name": "Daily Report",
         "cron_expression": "0 9 * * *",
         "timezone": "America/New_York",
-        "is_active": true
+        "is_active": true,
+        "priority": 5  (optional, 0-9; defaults to the bot priority)
     }
+
+    Event-triggered schedules set "trigger_type" instead of a cron expression:
+    FILE with "watch_path" (absolute directory) and "watch_pattern" (e.g.
+    "*.csv"), or WEBHOOK, whose token is returned once in the response.
+    Both take "debounce_seconds" (default 5).
     """
     try:
         data = request.get_json()
         user_id = session.get("user", {}).get("id")
         
         # Validate required fields
-        required = ['bot_id', 'name', 'cron_expression']
+        required = ['bot_id', 'name']
         if not all(field in data for field in required):
             return jsonify({'error': 'Missing required fields'}), 400
         
@@ -88,11 +125,11 @@ def create_schedule():
         if user.organization_id != bot.organization_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Validate cron expression
+        # Validate the trigger (cron expression, watched directory or webhook)
         try:
-            croniter(data['cron_expression'])
-        except Exception:
-            return jsonify({'error': 'Invalid cron expression'}), 400
+            trigger = validate_trigger(parse_trigger_type(data.get('trigger_type')), data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Validate timezone
         timezone = data.get('timezone', 'UTC')
@@ -100,16 +137,26 @@ def create_schedule():
             pytz.timezone(timezone)
         except Exception:
             return jsonify({'error': 'Invalid timezone'}), 400
+
+        # Validate priority
+        priority = data.get('priority')
+        if priority is not None:
+            try:
+                priority = normalize_priority(priority)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         # Create schedule
         schedule = BotSchedule(
             bot_id=data['bot_id'],
             name=data['name'],
-            cron_expression=data['cron_expression'],
             timezone=timezone,
+            priority=priority,
             is_active=data.get('is_active', True),
-            created_by=user_id
+            created_by=user_id,
+            **trigger
         )
+        webhook_token = _set_webhook_token(schedule)
         
         db.session.add(schedule)
         db.session.commit()
@@ -118,11 +165,14 @@ def create_schedule():
         if schedule.is_active:
             scheduler_service.add_schedule(schedule)
         
-        return jsonify({
+        response = {
             'success': True,
             'schedule_id': schedule.schedule_id,
             'message': 'Schedule created successfully'
-        }), 201
+        }
+        if webhook_token:
+            response['webhook_token'] = webhook_token
+        return jsonify(response), 201
         
     except Exception as e:
         db.session.rollback()
@@ -152,13 +202,15 @@ def update_schedule(schedule_id):
         if 'name' in data:
             schedule.name = data['name']
         
-        if 'cron_expression' in data:
-            # Validate cron
+        if any(field in data for field in TRIGGER_FIELDS):
             try:
-                croniter(data['cron_expression'])
-                schedule.cron_expression = data['cron_expression']
-            except Exception:
-                return jsonify({'error': 'Invalid cron expression'}), 400
+                trigger_type = parse_trigger_type(data.get('trigger_type', schedule.trigger_type.value))
+                trigger = validate_trigger(trigger_type, data, current=schedule)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            for field, value in trigger.items():
+                setattr(schedule, field, value)
+        webhook_token = _set_webhook_token(schedule)
         
         if 'timezone' in data:
             try:
@@ -166,6 +218,12 @@ def update_schedule(schedule_id):
                 schedule.timezone = data['timezone']
             except Exception:
                 return jsonify({'error': 'Invalid timezone'}), 400
+
+        if 'priority' in data:
+            try:
+                schedule.priority = normalize_priority(data['priority']) if data['priority'] is not None else None
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         if 'is_active' in data:
             schedule.is_active = data['is_active']
@@ -178,10 +236,13 @@ def update_schedule(schedule_id):
         else:
             scheduler_service.remove_schedule(schedule_id)
         
-        return jsonify({
+        response = {
             'success': True,
             'message': 'Schedule updated successfully'
-        })
+        }
+        if webhook_token:
+            response['webhook_token'] = webhook_token
+        return jsonify(response)
         
     except Exception as e:
         db.session.rollback()
@@ -231,12 +292,11 @@ def pause_schedule(schedule_id):
         if not schedule:
             return jsonify({'error': 'Schedule not found'}), 404
         
-        # Pause in APScheduler
-        scheduler_service.pause_schedule(schedule_id)
-
-        # Update DB
+        # Update DB first; the scheduler follows the committed row
         schedule.is_active = False
         db.session.commit()
+
+        scheduler_service.pause_schedule(schedule_id)
         
         return jsonify({
             'success': True,
@@ -259,10 +319,10 @@ def resume_schedule(schedule_id):
         if not schedule:
             return jsonify({'error': 'Schedule not found'}), 404
         
-        scheduler_service.resume_schedule(schedule_id)
-
         schedule.is_active = True
         db.session.commit()
+
+        scheduler_service.resume_schedule(schedule_id)
         
         return jsonify({
             'success': True,
@@ -277,6 +337,42 @@ def resume_schedule(schedule_id):
 
 
 
+@schedule_bp.route('/schedule_bot/<int:schedule_id>/webhook_token', methods=['POST'])
+@login_required
+def rotate_webhook_token(schedule_id):
+    """
+    Issue a new token for a WEBHOOK schedule; the old one stops working.
+    The token is only ever returned here and on creation.
+    """
+    try:
+        user_id = session.get("user", {}).get("id")
+
+        schedule = db.session.get(BotSchedule, schedule_id)
+        if not schedule:
+            return jsonify({'error': 'Schedule not found'}), 404
+
+        user = db.session.get(User, user_id)
+        if user.organization_id != schedule.bot.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        if schedule.trigger_type != TriggerType.WEBHOOK:
+            return jsonify({'error': 'Schedule is not webhook-triggered'}), 400
+
+        token, schedule.webhook_token_hash = new_webhook_token()
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'schedule_id': schedule_id,
+            'webhook_token': token,
+            'webhook_url': f"/api/triggers/webhook/{schedule_id}"
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @schedule_bp.route('/execution/<int:execution_id>', methods=['GET'])
 @login_required
 def get_execution_status(execution_id):
@@ -299,6 +395,15 @@ def get_execution_status(execution_id):
             'bot_id': execution.bot_id,
             'bot_name': execution.bot.bot_name,
             'status': execution.status.value,
+            'priority': execution.priority,
+            'status_reason': execution.status_reason,
+            'warm_start_saved_ms': execution.warm_start_saved_ms,
+            'admission_delay_ms': execution.admission_delay_ms,
+            'trigger_events': execution.trigger_events,
+            'not_before': execution.not_before.isoformat() if execution.not_before else None,
+            'pipeline_run_id': execution.pipeline_run_id,
+            'stray_processes': execution.stray_processes,
+            'reclaimed_rss_kb': execution.reclaimed_rss_kb,
             'scheduled_at': execution.scheduled_at.isoformat() if execution.scheduled_at else None,
             'started_at': execution.started_at.isoformat() if execution.started_at else None,
             'completed_at': execution.completed_at.isoformat() if execution.completed_at else None,
@@ -310,6 +415,94 @@ def get_execution_status(execution_id):
         return jsonify({'error': str(e)}), 500
 
 
+@schedule_bp.route('/execution/<int:execution_id>/logs', methods=['GET'])
+@login_required
+def get_execution_logs(execution_id):
+    """
+    Output of one execution, read from where it was recorded in the bot's
+    log file. Query: offset (within the run's output, default 0) and limit
+    (bytes, at most 1 MiB); page on with next_offset while "more" is true.
+    Recorded when the run ends, so a running execution has none yet.
+    """
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', MAX_READ_BYTES, type=int)
+        if offset < 0 or limit < 1:
+            return jsonify({'error': 'offset must not be negative and limit must be positive'}), 400
+
+        execution = db.session.get(BotExecution, execution_id)
+        if not execution:
+            return jsonify({'error': 'Execution not found'}), 404
+
+        # Check permissions
+        user_id = session.get("user", {}).get("id")
+        user = db.session.get(User, user_id)
+        if user is None or execution.bot is None or user.organization_id != execution.bot.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        if not execution.log_segments:
+            return jsonify({'error': 'No log recorded for this execution', 'status': execution.status.value}), 404
+
+        try:
+            chunk = read_segments(execution.log_segments, offset, min(limit, MAX_READ_BYTES))
+        except LogSegmentGone:
+            return jsonify({'error': 'The log holding this execution has been deleted (past its retention)'}), 410
+
+        return jsonify({
+            'execution_id': execution.execution_id,
+            'status': execution.status.value,
+            'logs': chunk['text'],
+            'offset': chunk['offset'],
+            'next_offset': chunk['next_offset'],
+            'total_bytes': chunk['total_bytes'],
+            'more': chunk['more']
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('/execution/<int:execution_id>/metrics', methods=['GET'])
+@login_required
+def get_execution_metrics(execution_id):
+    """
+    Metrics and events one execution printed as ::ap:: lines. Recorded
+    when the run ends, so a running execution has none yet.
+    """
+    try:
+        execution = db.session.get(BotExecution, execution_id)
+        if not execution:
+            return jsonify({'error': 'Execution not found'}), 404
+
+        # Check permissions
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if user is None or execution.bot is None or user.organization_id != execution.bot.organization_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        return jsonify({
+            'execution_id': execution.execution_id,
+            'status': execution.status.value,
+            'metrics': {
+                metric.name: {
+                    'total': metric.total,
+                    'count': metric.count,
+                    'min': metric.min_value,
+                    'max': metric.max_value,
+                    'last': metric.last_value
+                }
+                for metric in execution.metrics
+            },
+            'events': [{
+                'name': event.name,
+                'data': json.loads(event.data) if event.data else None,
+                'emitted_at': event.emitted_at.isoformat()
+            } for event in execution.events]
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @schedule_bp.route('/bot/<int:bot_id>/executions', methods=['GET'])
 @login_required
 def get_bot_executions(bot_id):
@@ -339,6 +532,15 @@ def get_bot_executions(bot_id):
             'executions': [{
                 'execution_id': e.execution_id,
                 'status': e.status.value,
+                'priority': e.priority,
+                'status_reason': e.status_reason,
+                'warm_start_saved_ms': e.warm_start_saved_ms,
+                'admission_delay_ms': e.admission_delay_ms,
+                'trigger_events': e.trigger_events,
+                'not_before': e.not_before.isoformat() if e.not_before else None,
+                'pipeline_run_id': e.pipeline_run_id,
+                'stray_processes': e.stray_processes,
+                'reclaimed_rss_kb': e.reclaimed_rss_kb,
                 'scheduled_at': e.scheduled_at.isoformat() if e.scheduled_at else None,
                 'started_at': e.started_at.isoformat() if e.started_at else None,
                 'completed_at': e.completed_at.isoformat() if e.completed_at else None,
@@ -357,54 +559,527 @@ def get_bot_executions(bot_id):
 
 
 
+def _usage_dict(usage):
+    """Resource usage of one execution, or None if it was not recorded"""
+    if not usage:
+        return None
+    return {
+        'user_cpu_ms': usage.user_cpu_ms,
+        'sys_cpu_ms': usage.sys_cpu_ms,
+        'max_rss_kb': usage.max_rss_kb,
+        'block_input_ops': usage.block_input_ops,
+        'block_output_ops': usage.block_output_ops,
+        'voluntary_ctx_switches': usage.voluntary_ctx_switches,
+        'involuntary_ctx_switches': usage.involuntary_ctx_switches
+    }
+
+
+def _usage_aggregates(days, *filters):
+    """Per-bot resource usage totals over the last `days` days"""
+    cpu_ms = BotExecutionUsage.user_cpu_ms + BotExecutionUsage.sys_cpu_ms
+    since = datetime.now(pytz.timezone("Asia/Kolkata")) - timedelta(days=days)
+    rows = (
+        db.session.query(
+            BotExecution.bot_id,
+            func.count(BotExecutionUsage.execution_id).label('runs'),
+            func.sum(cpu_ms).label('cpu_ms_total'),
+            func.avg(cpu_ms).label('cpu_ms_avg'),
+            func.max(cpu_ms).label('cpu_ms_max'),
+            func.sum(BotExecutionUsage.user_cpu_ms).label('user_cpu_ms_total'),
+            func.sum(BotExecutionUsage.sys_cpu_ms).label('sys_cpu_ms_total'),
+            func.avg(BotExecutionUsage.max_rss_kb).label('max_rss_kb_avg'),
+            func.max(BotExecutionUsage.max_rss_kb).label('max_rss_kb_max'),
+            func.sum(BotExecutionUsage.block_input_ops).label('block_input_ops_total'),
+            func.sum(BotExecutionUsage.block_output_ops).label('block_output_ops_total'),
+            func.sum(BotExecutionUsage.voluntary_ctx_switches).label('voluntary_ctx_switches_total'),
+            func.sum(BotExecutionUsage.involuntary_ctx_switches).label('involuntary_ctx_switches_total')
+        )
+        .join(BotExecutionUsage, BotExecutionUsage.execution_id == BotExecution.execution_id)
+        .join(Bot, Bot.bot_id == BotExecution.bot_id)
+        .filter(BotExecution.started_at >= since, *filters)
+        .group_by(BotExecution.bot_id)
+        .all()
+    )
+    return [{
+        key: (round(float(value), 1) if key.endswith('_avg') else int(value or 0))
+        for key, value in row._mapping.items()
+    } for row in rows]
+
+
+@schedule_bp.route('/bot/<int:bot_id>/usage', methods=['GET'])
+@login_required
+def get_bot_usage(bot_id):
+    """
+    Resource usage of a bot's executions over the last ?days= days (default 7)
+    """
+    try:
+        days = request.args.get('days', 7, type=int)
+
+        bot = db.session.get(Bot, bot_id)
+        if not bot:
+            return jsonify({'error': 'Bot not found'}), 404
+
+        # Check permissions
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user or (not user.is_admin and user.organization_id != bot.organization_id):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        aggregates = _usage_aggregates(days, BotExecution.bot_id == bot_id)
+        return jsonify({
+            'bot_id': bot.bot_id,
+            'bot_name': bot.bot_name,
+            'days': days,
+            'usage': aggregates[0] if aggregates else None
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('/usage/bots', methods=['GET'])
+@login_required
+def get_bots_usage():
+    """
+    Bots ranked by resource usage over the last ?days= days (default 7).
+    ?sort=cpu|rss|io, ?limit= (default 20). Non-admins see their organization.
+    """
+    sort_keys = {
+        'cpu': 'cpu_ms_total',
+        'rss': 'max_rss_kb_max',
+        'io': 'block_io_total'
+    }
+    try:
+        days = request.args.get('days', 7, type=int)
+        limit = request.args.get('limit', 20, type=int)
+        sort = request.args.get('sort', 'cpu')
+        if sort not in sort_keys:
+            return jsonify({'error': f"sort must be one of {', '.join(sort_keys)}"}), 400
+
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        filters = [] if user.is_admin else [Bot.organization_id == user.organization_id]
+        aggregates = _usage_aggregates(days, *filters)
+        for row in aggregates:
+            row['block_io_total'] = row['block_input_ops_total'] + row['block_output_ops_total']
+        aggregates.sort(key=lambda row: row[sort_keys[sort]], reverse=True)
+        aggregates = aggregates[:limit]
+
+        names = dict(
+            db.session.query(Bot.bot_id, Bot.bot_name)
+            .filter(Bot.bot_id.in_([row['bot_id'] for row in aggregates]))
+            .all()
+        )
+        for row in aggregates:
+            row['bot_name'] = names.get(row['bot_id'])
+
+        return jsonify({'days': days, 'sort': sort, 'bots': aggregates})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('/metrics', methods=['GET'])
+@login_required
+def get_metric_aggregates():
+    """
+    One metric bots print (::ap::{"metric": name, ...}) aggregated over the
+    executions started in the last ?days= days (default 7). ?name= is
+    required; ?bot_id= (repeatable) narrows the bots; ?group_by=bot
+    (default) or day. Without ?name= the metric names recorded are listed.
+    Non-admins see their organization.
+    """
+    groups = {
+        'bot': BotExecution.bot_id,
+        'day': func.date(BotExecution.started_at)
+    }
+    try:
+        days = request.args.get('days', 7, type=int)
+        name = request.args.get('name')
+        if name:
+            name = metric_name(name)
+            if name is None:
+                return jsonify({'error': 'Invalid metric name'}), 400
+        group_by = request.args.get('group_by', 'bot')
+        bot_ids = request.args.getlist('bot_id', type=int)
+        if group_by not in groups:
+            return jsonify({'error': f"group_by must be one of {', '.join(groups)}"}), 400
+
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        since = datetime.now(pytz.timezone("Asia/Kolkata")) - timedelta(days=days)
+        filters = [BotExecution.started_at >= since]
+        if not user.is_admin:
+            filters.append(Bot.organization_id == user.organization_id)
+        if bot_ids:
+            filters.append(BotExecution.bot_id.in_(bot_ids))
+
+        query = (
+            db.session.query(BotExecutionMetric)
+            .join(BotExecution, BotExecution.execution_id == BotExecutionMetric.execution_id)
+            .join(Bot, Bot.bot_id == BotExecution.bot_id)
+            .filter(*filters)
+        )
+        if not name:
+            names = (
+                query.with_entities(BotExecutionMetric.name, func.count(BotExecutionMetric.execution_id))
+                .group_by(BotExecutionMetric.name)
+                .order_by(BotExecutionMetric.name)
+                .all()
+            )
+            return jsonify({'days': days, 'metrics': [{'name': n, 'runs': runs} for n, runs in names]})
+
+        group = groups[group_by].label(group_by)
+        rows = (
+            query.with_entities(
+                group,
+                func.count(BotExecutionMetric.execution_id).label('runs'),
+                func.sum(BotExecutionMetric.count).label('reports'),
+                func.sum(BotExecutionMetric.total).label('total'),
+                func.min(BotExecutionMetric.min_value).label('min'),
+                func.max(BotExecutionMetric.max_value).label('max')
+            )
+            .filter(BotExecutionMetric.name == name)
+            .group_by(group)
+            .order_by(group)
+            .all()
+        )
+        results = []
+        for row in rows:
+            result = dict(row._mapping)
+            result[group_by] = str(result[group_by]) if group_by == 'day' else result[group_by]
+            # Mean of the reported values, and per run for counters reported once per run
+            result['avg'] = result['total'] / result['reports'] if result['reports'] else None
+            result['avg_per_run'] = result['total'] / result['runs'] if result['runs'] else None
+            results.append(result)
+
+        if group_by == 'bot':
+            names = dict(
+                db.session.query(Bot.bot_id, Bot.bot_name)
+                .filter(Bot.bot_id.in_([row['bot'] for row in results]))
+                .all()
+            )
+            for row in results:
+                row['bot_name'] = names.get(row['bot'])
+
+        return jsonify({'name': name, 'days': days, 'group_by': group_by, 'groups': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Sort keys of /jobs; each is indexed together with schedule_id (NULL sorts lowest)
+JOB_SORTS = {
+    'schedule_id': BotSchedule.schedule_id,
+    'next_run': BotSchedule.next_run_at,
+    'last_run': BotSchedule.last_run_at,
+    'name': BotSchedule.name
+}
+MAX_JOBS_PAGE = 500
+
+
+def _encode_cursor(value, schedule_id) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, schedule_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, is_datetime: bool):
+    value, schedule_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if is_datetime and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, int(schedule_id)
+
+
+def _after_cursor(column, value, schedule_id, descending: bool):
+    """Rows after (value, schedule_id) in (column, schedule_id) order, NULLs lowest"""
+    key = BotSchedule.schedule_id
+    if not descending:
+        if value is None:
+            return or_(and_(column.is_(None), key > schedule_id), column.isnot(None))
+        return or_(column > value, and_(column == value, key > schedule_id))
+    if value is None:
+        return and_(column.is_(None), key < schedule_id)
+    return or_(column < value, and_(column == value, key < schedule_id), column.is_(None))
+
+
 @schedule_bp.route('/jobs', methods=['GET'])
 @login_required
 def get_all_schedules():
+    """
+    Schedules with their next and latest run, a page at a time.
+
+    Query parameters (all optional):
+        limit           page size (default 100, max 500)
+        cursor          next_cursor of the previous page
+        sort            schedule_id (default) | next_run | last_run | name
+        order           asc (default) | desc
+        organization_id admins only; other users see their organization
+        bot_id
+        status          active | paused
+        last_status     e.g. SUCCESS, FAILED, MISSED
+        from, to        ISO datetimes bounding next_run_at (IST)
+    """
     try:
-        schedules = BotSchedule.query.all()
-        aps_jobs = scheduler_service.scheduler.get_jobs()
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
 
-        # Map: schedule_id → APScheduler job
-        job_map = {}
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_JOBS_PAGE)
+        sort = request.args.get('sort', 'schedule_id')
+        order = request.args.get('order', 'asc')
+        if sort not in JOB_SORTS:
+            return jsonify({'error': f"sort must be one of {', '.join(JOB_SORTS)}"}), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({'error': 'order must be asc or desc'}), 400
+        column = JOB_SORTS[sort]
+        descending = order == 'desc'
 
-        for job in aps_jobs:
-            if job.id.startswith("schedule_"):
-                try:
-                    sid = int(job.id.replace("schedule_", ""))
-                    job_map[sid] = job
-                except:
-                    pass
+        query = (
+            db.session.query(
+                BotSchedule.schedule_id,
+                BotSchedule.name,
+                BotSchedule.bot_id,
+                BotSchedule.trigger_type,
+                BotSchedule.cron_expression,
+                BotSchedule.watch_path,
+                BotSchedule.watch_pattern,
+                BotSchedule.debounce_seconds,
+                BotSchedule.is_active,
+                BotSchedule.next_run_at,
+                BotSchedule.last_run_at,
+                BotSchedule.last_status,
+                BotSchedule.last_execution_id,
+                Bot.bot_name,
+                Bot.organization_id
+            )
+            .join(Bot, Bot.bot_id == BotSchedule.bot_id)
+        )
 
-        data = []
+        # Filters
+        if user.is_admin:
+            organization_id = request.args.get('organization_id', type=int)
+            if organization_id is not None:
+                query = query.filter(Bot.organization_id == organization_id)
+        else:
+            query = query.filter(Bot.organization_id == user.organization_id)
+
+        bot_id = request.args.get('bot_id', type=int)
+        if bot_id is not None:
+            query = query.filter(BotSchedule.bot_id == bot_id)
 
-        for s in schedules:
-            job = job_map.get(s.schedule_id)
+        status = request.args.get('status')
+        if status is not None:
+            if status not in ('active', 'paused'):
+                return jsonify({'error': 'status must be active or paused'}), 400
+            query = query.filter(BotSchedule.is_active.is_(status == 'active'))
 
-            next_date = None
-            next_time = None
+        last_status = request.args.get('last_status')
+        if last_status:
+            query = query.filter(BotSchedule.last_status == last_status.upper())
 
-            # Extract date and time correctly
-            if job and job.next_run_time:
-                dt = job.next_run_time  # aware datetime
+        try:
+            window_start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            window_end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'error': 'from and to must be ISO datetimes'}), 400
+        if window_start:
+            query = query.filter(BotSchedule.next_run_at >= window_start)
+        if window_end:
+            query = query.filter(BotSchedule.next_run_at < window_end)
+
+        # Keyset pagination over (sort column, schedule_id)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                value, after_id = _decode_cursor(cursor, sort in ('next_run', 'last_run'))
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            if sort == 'schedule_id':
+                query = query.filter(
+                    BotSchedule.schedule_id < after_id if descending else BotSchedule.schedule_id > after_id
+                )
+            else:
+                query = query.filter(_after_cursor(column, value, after_id, descending))
 
-                # Convert to simple string parts
-                next_date = dt.strftime("%Y-%m-%d")
-                next_time = dt.strftime("%H:%M")
+        ordering = [column.desc(), BotSchedule.schedule_id.desc()] if descending else [column, BotSchedule.schedule_id]
+        if sort == 'schedule_id':
+            ordering = ordering[:1]
+        rows = query.order_by(*ordering).limit(limit + 1).all()
 
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor(getattr(last, column.key), last.schedule_id)
+
+        data = []
+        for row in rows:
             data.append({
-                "schedule_id": s.schedule_id,
-                "bot_name": s.bot.bot_name if s.bot else None,
-                "next_run_date": next_date,
-                "next_run_time": next_time,
-                "status": "active" if s.is_active else "paused"
+                "schedule_id": row.schedule_id,
+                "schedule_name": row.name,
+                "bot_id": row.bot_id,
+                "bot_name": row.bot_name,
+                "organization_id": row.organization_id,
+                "trigger_type": row.trigger_type.value,
+                "cron_expression": row.cron_expression,
+                "watch_path": row.watch_path,
+                "watch_pattern": row.watch_pattern,
+                "debounce_seconds": row.debounce_seconds,
+                # Next run as kept by the scheduler's job store (IST)
+                "next_run_at": row.next_run_at.isoformat() if row.next_run_at else None,
+                "next_run_date": row.next_run_at.strftime("%Y-%m-%d") if row.next_run_at else None,
+                "next_run_time": row.next_run_at.strftime("%H:%M") if row.next_run_at else None,
+                "last_run_at": row.last_run_at.isoformat() if row.last_run_at else None,
+                "last_status": row.last_status,
+                "last_execution_id": row.last_execution_id,
+                "status": "active" if row.is_active else "paused"
             })
 
-        return jsonify({"schedules": data})
+        return jsonify({"schedules": data, "next_cursor": next_cursor})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
+@schedule_bp.route('/forecast', methods=['GET'])
+@login_required
+def get_schedule_forecast():
+    """
+    Projected concurrent runs of the active schedules, from their cron
+    expressions and each bot's median run time.
+
+    Query parameters (all optional):
+        hours           window length (default 24, max 168)
+        start           ISO datetime (IST) the window starts at (default now)
+        resolution      minutes per series bucket (default 1 up to 24 hours, else 15)
+        organization_id admins only; other users see their organization
+    """
+    try:
+        user = db.session.get(User, session.get("user", {}).get("id"))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        hours = request.args.get('hours', 24, type=int)
+        if not 1 <= hours <= MAX_WINDOW_HOURS:
+            return jsonify({'error': f'hours must be between 1 and {MAX_WINDOW_HOURS}'}), 400
+        resolution = request.args.get('resolution', 1 if hours <= 24 else 15, type=int)
+        if resolution < 1:
+            return jsonify({'error': 'resolution must be at least 1 minute'}), 400
+
+        ist = pytz.timezone("Asia/Kolkata")
+        try:
+            start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else datetime.now(ist)
+        except ValueError:
+            return jsonify({'error': 'start must be an ISO datetime'}), 400
+        if start.tzinfo is None:
+            start = ist.localize(start)
+
+        if user.is_admin:
+            organization_id = request.args.get('organization_id', type=int)
+        else:
+            organization_id = user.organization_id
+
+        return jsonify(forecast(
+            start, hours,
+            organization_id=organization_id,
+            resolution=resolution,
+            capacity=current_app.config.get('SUPERVISOR_MAX_CONCURRENCY')
+        ))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('/queue', methods=['GET'])
+@login_required
+def get_queue_depths():
+    """
+    Queued and running executions per organization and priority.
+    Admins see every organization, other users their own.
+    """
+    try:
+        user_id = session.get("user", {}).get("id")
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        organizations = queue_depths(None if user.is_admin else [user.organization_id])
+
+        totals = {}
+        for org in organizations:
+            for priority, count in org['pending_by_priority'].items():
+                totals[priority] = totals.get(priority, 0) + count
+
+        return jsonify({
+            "organizations": organizations,
+            "pending": sum(org['pending'] for org in organizations),
+            "running": sum(org['running'] for org in organizations),
+            "pending_by_priority": dict(sorted(totals.items(), key=lambda item: int(item[0]), reverse=True))
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@schedule_bp.route('/stats', methods=['GET'])
+@admin_required
+def get_scheduler_stats():
+    """Supervisor load and execution recorder flush metrics of this process"""
+    try:
+        return jsonify(scheduler_service.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@schedule_bp.route('/queue/organization/<int:organization_id>', methods=['PUT'])
+@admin_required
+def update_organization_dispatch(organization_id):
+    """
+    Set an organization's dispatch quota and weight
+
+    Body:
+    {
+        "max_concurrent_bots": 5,   (null = no limit)
+        "dispatch_weight": 2
+    }
+    """
+    try:
+        data = request.get_json() or {}
+
+        organization = db.session.get(Organization, organization_id)
+        if not organization:
+            return jsonify({'error': 'Organization not found'}), 404
+
+        if 'max_concurrent_bots' in data:
+            limit = data['max_concurrent_bots']
+            if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+                return jsonify({'error': 'max_concurrent_bots must be a positive integer or null'}), 400
+            organization.max_concurrent_bots = limit
+
+        if 'dispatch_weight' in data:
+            weight = data['dispatch_weight']
+            if isinstance(weight, bool) or not isinstance(weight, int) or weight < 1:
+                return jsonify({'error': 'dispatch_weight must be a positive integer'}), 400
+            organization.dispatch_weight = weight
+
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'organization_id': organization.organization_id,
+            'max_concurrent_bots': organization.max_concurrent_bots,
+            'dispatch_weight': organization.dispatch_weight
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @schedule_bp.route('/kill', methods=['POST'])
 @login_required
 def kill_running_bot():
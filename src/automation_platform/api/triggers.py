@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from automation_platform.database.database import db
+from automation_platform.database.models import BotSchedule, TriggerType
+from automation_platform.scheduler.scheduler import scheduler_service
+from automation_platform.scheduler.triggers import webhook_token_matches
+
+triggers_bp = Blueprint('triggers_bp', __name__)
+
+
+def _request_token():
+    """Webhook token from X-Webhook-Token or an Authorization: Bearer header"""
+    token = request.headers.get('X-Webhook-Token')
+    if token:
+        return token
+    authorization = request.headers.get('Authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return authorization[7:].strip()
+    return None
+
+
+@triggers_bp.route('/webhook/<int:schedule_id>', methods=['POST'])
+def fire_webhook(schedule_id):
+    """
+    Fire a WEBHOOK schedule. Called by other systems rather than users, so
+    there is no session: the schedule's token authenticates the call.
+
+    The run is debounced; calls during its quiet period join it. Returns
+    202 with the execution the call was counted towards.
+    """
+    try:
+        schedule = db.session.get(BotSchedule, schedule_id)
+        # Unknown schedules and bad tokens look the same to the caller
+        if (not schedule or schedule.trigger_type != TriggerType.WEBHOOK
+                or not webhook_token_matches(schedule.webhook_token_hash, _request_token())):
+            return jsonify({'error': 'Invalid webhook token'}), 401
+
+        if not schedule.is_active:
+            return jsonify({'error': 'Schedule is paused'}), 409
+        db.session.rollback()  # release the connection before queueing
+
+        try:
+            result = scheduler_service.trigger_event(schedule_id, source="webhook")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+
+        return jsonify(result), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
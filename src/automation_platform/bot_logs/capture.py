@@ -0,0 +1,145 @@
+"""
+capture.py - Stream bot stdout/stderr into the bot log file while it runs
+"""
+
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+import codecs, logging, pytz
+
+from automation_platform.bot_logs.records import RecordParser
+from automation_platform.bot_logs.rotation import LogPolicy
+from automation_platform.bot_logs.writer import log_writer
+
+logger = logging.getLogger("automation_platform.scheduler.capture")
+ist = pytz.timezone("Asia/Kolkata")
+
+# Read size per pipe read; bounds the memory held per stream
+CHUNK_SIZE = 64 * 1024
+
+# Seconds to keep draining pipes after the bot process has exited
+OUTPUT_DRAIN_TIMEOUT = 10
+
+# Number of stderr lines kept for the execution error message
+ERROR_TAIL_LINES = 50
+
+# Byte ranges kept per run; past this, concurrent runs' output in between
+# is folded into the last range rather than tracked write by write
+MAX_LOG_SEGMENTS = 1000
+
+
+class BotOutputCapture:
+    """
+    Copies a bot's stdout/stderr to its log file incrementally.
+
+    The supervisor feeds each pipe in bounded chunks as it is read, so
+    memory use does not depend on how much the bot prints and the log file
+    can be read while the bot is still running. Only the last few stderr
+    lines are kept in memory for the execution result. The chunks are
+    handed to the log writer (writer.py), which does the file I/O.
+
+    The byte ranges the run wrote are recorded as they are written
+    (segments()), so its output can later be read back with a seek instead
+    of a scan of the whole file.
+
+    With a log policy the file is rotated when the run starts, if it is
+    due and no other run is writing to it (see rotation.py).
+
+    Metric and event lines the bot prints to stdout are parsed on the way
+    through (records(), see records.py); they are logged like any output.
+    """
+
+    def __init__(self, log_file_path: str | None, log_policy: LogPolicy | None = None):
+        self.log_file_path = log_file_path
+        self.log_policy = log_policy
+        self.error_tail = deque(maxlen=ERROR_TAIL_LINES)
+        self.key = str(Path(log_file_path)) if log_file_path else None
+        self.failed = False  # set by the writer when the log cannot be opened
+        self._opened = False
+        self._last_label = None
+        self._decoders = {}
+        self._segments = []  # [inode, offset, length], appended by the writer
+        self._records = RecordParser()
+
+    def open(self):
+        """Start the run's output in the log with the execution banner"""
+        if not self.log_file_path:
+            return
+        log_writer.open(self)
+        self._opened = True
+        self._write(None, f"\n{'='*80}\nExecution at: {datetime.now(ist)}\n{'='*80}\n")
+
+    def close(self):
+        """End the run's output; returns once the writer has written all of it"""
+        if not self._opened:
+            return
+        self._opened = False
+        if not log_writer.close(self):
+            logger.warning(f"Output of {self.log_file_path} still being written, its log segments may be incomplete")
+
+    def segments(self) -> list:
+        """Byte ranges of the log file this run wrote, in order"""
+        return [
+            {'log_file_path': str(self.log_file_path), 'log_inode': inode, 'offset': offset, 'length': length}
+            for inode, offset, length in self._segments
+        ]
+
+    def records(self) -> dict | None:
+        """Metrics and events the run printed, if any"""
+        return self._records.result()
+
+    def error_text(self) -> str | None:
+        """Last stderr lines of the run, if any"""
+        return "".join(self.error_tail) or None
+
+    def feed(self, label: str, chunk: bytes):
+        """Write a chunk read from the STDOUT or STDERR pipe"""
+        decoder = self._decoders.get(label)
+        if decoder is None:
+            decoder = self._decoders[label] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        text = decoder.decode(chunk)
+        if label == "STDERR":
+            self.error_tail.append(text)
+        elif label == "STDOUT":
+            self._parse_records(text)
+        self._write(label, text)
+
+    def finish(self, label: str):
+        """Flush any partial character left at end of stream"""
+        decoder = self._decoders.pop(label, None)
+        if decoder:
+            text = decoder.decode(b"", final=True)
+            if text:
+                if label == "STDOUT":
+                    self._parse_records(text)
+                self._write(label, text)
+        if label == "STDOUT":
+            self._parse_records(None)
+
+    def _parse_records(self, text: str | None):
+        # Whatever a bot prints, the pipe must keep being drained
+        try:
+            if text is None:
+                self._records.finish()
+            else:
+                self._records.feed(text)
+        except Exception as e:
+            logger.error(f"Error parsing records from {self.log_file_path}: {e}", exc_info=True)
+
+    def _write(self, label: str | None, text: str):
+        if not self._opened:
+            return
+        # Emit a section header whenever the output source switches
+        if label and label != self._last_label:
+            text = f"{label}:\n{text}"
+            self._last_label = label
+        log_writer.write(self, text.encode('utf-8'))
+
+    def add_segment(self, inode: int, offset: int, length: int):
+        """Called by the writer for each chunk of this run it wrote"""
+        if self._segments:
+            last = self._segments[-1]
+            if last[0] == inode and (last[1] + last[2] == offset or len(self._segments) >= MAX_LOG_SEGMENTS):
+                last[2] = offset + length - last[1]
+                return
+        self._segments.append([inode, offset, length])
@@ -0,0 +1,159 @@
+"""
+records.py - Structured records bots print among their output
+
+A stdout line starting with RECORD_PREFIX carries one JSON record:
+
+    ::ap::{"metric": "rows_processed", "value": 1200}
+    ::ap::{"event": "invoice_posted", "data": {"invoice": "INV-42"}}
+
+Any bot can emit them, whatever its language, with a print. The
+capture parses them as the output streams by (the lines still go to the
+log), folding metrics into one total/count/min/max/last per name for the
+run and keeping events in order. Both are stored with the execution
+(BotExecutionMetric, BotExecutionEvent) when it ends, so reports
+aggregate numbers instead of scraping logs.
+
+Metric names are normalised to lower case and limited to METRIC_NAME's
+characters, so names the database would compare as equal ("Rows",
+"rows ") are the same metric. Values must be finite numbers and so must
+a metric's running total.
+
+Records are bounded per run: past MAX_METRICS names or MAX_EVENTS events
+the rest are dropped and counted, as are malformed lines.
+"""
+
+from datetime import datetime
+import json, math, re, pytz
+
+ist = pytz.timezone("Asia/Kolkata")
+
+RECORD_PREFIX = "::ap::"
+
+MAX_RECORD_CHARS = 64 * 1024
+MAX_NAME_LENGTH = 100
+MAX_METRICS = 100  # metric names per run
+MAX_EVENTS = 500  # events per run
+MAX_EVENT_DATA_CHARS = 4096
+
+METRIC_NAME = re.compile(r"[a-z0-9_.:/-]+")
+
+
+def _name(value) -> str | None:
+    if isinstance(value, str) and 0 < len(value) <= MAX_NAME_LENGTH:
+        return value
+    return None
+
+
+def metric_name(value) -> str | None:
+    """The stored form of a metric name, None if it is not a valid one"""
+    if not isinstance(value, str):
+        return None
+    name = value.strip().lower()
+    if len(name) > MAX_NAME_LENGTH or not METRIC_NAME.fullmatch(name):
+        return None
+    return name
+
+
+def _number(value) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        value = float(value)  # a huge JSON integer overflows here
+    except OverflowError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+class RecordParser:
+    """Finds and parses record lines in a stream of stdout text"""
+
+    def __init__(self):
+        self.metrics = {}  # name -> {'total', 'count', 'min_value', 'max_value', 'last_value'}
+        self.events = []
+        self.malformed = 0
+        self.dropped = 0
+        self._at_line_start = True
+        self._record = None  # parts of the record line being read
+
+    def feed(self, text: str):
+        """Stdout text as it arrives, split anywhere"""
+        for piece in text.splitlines(keepends=True):
+            if self._at_line_start and piece.startswith(RECORD_PREFIX):
+                self._record = []
+            if self._record is not None:
+                self._record.append(piece)
+                if sum(len(part) for part in self._record) > MAX_RECORD_CHARS:
+                    self.malformed += 1
+                    self._record = None
+            self._at_line_start = piece.endswith("\n")
+            if self._at_line_start and self._record is not None:
+                self._parse("".join(self._record))
+                self._record = None
+
+    def finish(self):
+        """End of the stream: a last record without a newline still counts"""
+        if self._record is not None:
+            self._parse("".join(self._record))
+            self._record = None
+
+    def _parse(self, line: str):
+        try:
+            record = json.loads(line[len(RECORD_PREFIX):])
+        except ValueError:
+            self.malformed += 1
+            return
+        if not isinstance(record, dict):
+            self.malformed += 1
+        elif 'metric' in record:
+            self._add_metric(record)
+        elif 'event' in record:
+            self._add_event(record)
+        else:
+            self.malformed += 1
+
+    def _add_metric(self, record: dict):
+        name, value = metric_name(record['metric']), _number(record.get('value', 1))
+        if name is None or value is None:
+            self.malformed += 1
+            return
+        metric = self.metrics.get(name)
+        if metric is None:
+            if len(self.metrics) >= MAX_METRICS:
+                self.dropped += 1
+                return
+            self.metrics[name] = {'total': value, 'count': 1, 'min_value': value, 'max_value': value, 'last_value': value}
+            return
+        total = metric['total'] + value
+        if not math.isfinite(total):
+            self.malformed += 1
+            return
+        metric['total'] = total
+        metric['count'] += 1
+        metric['min_value'] = min(metric['min_value'], value)
+        metric['max_value'] = max(metric['max_value'], value)
+        metric['last_value'] = value
+
+    def _add_event(self, record: dict):
+        name = _name(record['event'])
+        if name is None:
+            self.malformed += 1
+            return
+        data = json.dumps(record['data']) if record.get('data') is not None else None
+        if data is not None and len(data) > MAX_EVENT_DATA_CHARS:
+            self.malformed += 1
+            return
+        if len(self.events) >= MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append({'name': name, 'data': data, 'emitted_at': datetime.now(ist)})
+
+    def result(self) -> dict | None:
+        """What the run emitted, for the execution result; None if nothing"""
+        if not (self.metrics or self.events or self.malformed or self.dropped):
+            return None
+        return {
+            'metrics': self.metrics,
+            'events': self.events,
+            'malformed': self.malformed,
+            'dropped': self.dropped
+        }
@@ -0,0 +1,268 @@
+"""
+rotation.py - Size/age rotation and compression of bot log files
+
+A bot's log is rotated when a run starts and the file has grown past the
+bot's size limit or its oldest run is older than its age limit - never in
+the middle of a run, so a run's output stays in one file. The file is
+renamed to <log>.<YYYYmmdd-HHMMSS> and compressed in the background to
+<log>.<stamp>.gz, then archives beyond the bot's retention (count and
+age) are deleted.
+
+Archives are gzip files made of independent members of BLOCK_SIZE input
+bytes each, so zcat reads them as usual but a reader can also start at
+any block. The block index (<archive>.idx, JSON) lists each member's
+position and records the inode the log had before rotation: readers
+holding a cursor or a log segment of the old file find their bytes in
+the archive by that inode (find_archive) and decompress only the blocks
+they need.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json, logging, os, re, time, zlib
+
+import pytz
+
+logger = logging.getLogger("automation_platform.scheduler.capture")
+ist = pytz.timezone("Asia/Kolkata")
+
+BLOCK_SIZE = 256 * 1024  # uncompressed bytes per gzip member
+COMPRESS_LEVEL = 6
+
+# Bytes read at the start of a log to find the time of its first run
+HEAD_BYTES = 512
+FIRST_RUN = re.compile(rb"Execution at: ([0-9][0-9:. +-]+)")
+
+ARCHIVE_NAME = re.compile(r"\.(\d{8}-\d{6}(?:-\d+)?)(\.gz)?$")
+
+
+@dataclass
+class LogPolicy:
+    rotate_bytes: int = 0  # 0 = no size limit
+    rotate_seconds: int = 0  # 0 = no age limit
+    keep_files: int = 0  # archives kept, 0 = no limit
+    keep_seconds: int = 0  # archive age kept, 0 = no limit
+
+    @property
+    def rotates(self) -> bool:
+        return bool(self.rotate_bytes or self.rotate_seconds)
+
+
+def policy_for(bot, defaults: dict) -> LogPolicy:
+    """The bot's rotation settings, its own where set, else the defaults (BOT_LOG_ROTATION)"""
+    def setting(name):
+        value = getattr(bot, name)
+        return defaults.get(name, 0) if value is None else value
+
+    return LogPolicy(
+        rotate_bytes=setting('log_rotate_mb') * 1024 * 1024,
+        rotate_seconds=setting('log_rotate_days') * 86400,
+        keep_files=setting('log_keep_files'),
+        keep_seconds=setting('log_keep_days') * 86400
+    )
+
+
+# -------------------
+# Archives
+# -------------------
+class Archive:
+    """A rotated log, compressed or not yet, read by offset in the original file"""
+
+    def __init__(self, path: str, compressed: bool):
+        self.path = path
+        self.compressed = compressed
+        if compressed:
+            with open(path + ".idx") as f:
+                index = json.load(f)
+            self.inode = index['inode']
+            self.size = index['size']
+            self.block_size = index['block_size']
+            self.blocks = index['blocks']  # [compressed offset, compressed length]
+        else:
+            stat = os.stat(path)
+            self.inode = stat.st_ino
+            self.size = stat.st_size
+
+    @property
+    def mtime(self) -> float:
+        return os.stat(self.path).st_mtime
+
+    def read(self, offset: int, size: int) -> bytes:
+        size = min(size, self.size - offset)
+        if size <= 0:
+            return b""
+        if not self.compressed:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                return f.read(size)
+
+        first = offset // self.block_size
+        last = (offset + size - 1) // self.block_size
+        parts = []
+        with open(self.path, 'rb') as f:
+            for position, length in self.blocks[first:last + 1]:
+                f.seek(position)
+                parts.append(zlib.decompress(f.read(length), wbits=31))
+        start = offset - first * self.block_size
+        return b"".join(parts)[start:start + size]
+
+
+def list_archives(log_path: str) -> list:
+    """Archives of a log, newest first"""
+    directory, name = os.path.split(os.path.abspath(log_path))
+    found = {}
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.startswith(name + "."):
+            continue
+        match = ARCHIVE_NAME.fullmatch(entry[len(name):])
+        if not match:
+            continue
+        stamp, gz = match.groups()
+        # Mid-compression both exist; the finished .gz wins
+        if gz and os.path.exists(os.path.join(directory, entry + ".idx")):
+            found[stamp] = (os.path.join(directory, entry), True)
+        elif stamp not in found:
+            found.setdefault(stamp, (os.path.join(directory, entry), False))
+
+    archives = []
+    for stamp in sorted(found, reverse=True):
+        path, compressed = found[stamp]
+        try:
+            archives.append(Archive(path, compressed))
+        except (OSError, ValueError, KeyError):
+            continue  # deleted meanwhile, or a half-written index
+    return archives
+
+
+def find_archive(log_path: str, inode: int) -> Archive | None:
+    """The archive of the log that was `inode` before it was rotated"""
+    for archive in list_archives(log_path):
+        if archive.inode == inode:
+            return archive
+    return None
+
+
+# -------------------
+# Rotation
+# -------------------
+def _first_run_at(path: str) -> datetime | None:
+    try:
+        with open(path, 'rb') as f:
+            match = FIRST_RUN.search(f.read(HEAD_BYTES))
+        return datetime.fromisoformat(match.group(1).decode().strip()) if match else None
+    except (OSError, ValueError):
+        return None
+
+
+def rotation_due(path: str, policy: LogPolicy) -> bool:
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        return False
+    if not size:
+        return False
+    if policy.rotate_bytes and size >= policy.rotate_bytes:
+        return True
+    if policy.rotate_seconds:
+        first_run = _first_run_at(path)
+        if first_run and datetime.now(ist) - first_run >= timedelta(seconds=policy.rotate_seconds):
+            return True
+    return False
+
+
+def rotate(path: str, policy: LogPolicy) -> str | None:
+    """
+    Rename the log aside if it is due and queue its compression and the
+    retention sweep. The caller makes sure no run is writing to it.
+    """
+    if not policy.rotates or not rotation_due(path, policy):
+        return None
+    stamp = datetime.now(ist).strftime("%Y%m%d-%H%M%S")
+    target, n = f"{path}.{stamp}", 1
+    while os.path.exists(target) or os.path.exists(target + ".gz"):
+        n += 1
+        target = f"{path}.{stamp}-{n}"
+    try:
+        os.rename(path, target)
+    except OSError as e:
+        logger.error(f"Error rotating log {path}: {e}", exc_info=True)
+        return None
+    logger.info(f"Rotated log {path} to {target}")
+    compressor.submit(_compress_and_prune, path, policy)
+    return target
+
+
+def compress(raw_path: str) -> str:
+    """gzip a rotated log as independent blocks and write its index"""
+    stat = os.stat(raw_path)
+    gz_path = raw_path + ".gz"
+    tmp_path = gz_path + ".tmp"
+    blocks = []
+    with open(raw_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        while True:
+            data = src.read(BLOCK_SIZE)
+            if not data:
+                break
+            deflate = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+            member = deflate.compress(data) + deflate.flush()
+            blocks.append([dst.tell(), len(member)])
+            dst.write(member)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+    # The index goes first: a .gz without one is not an archive yet
+    index = {'inode': stat.st_ino, 'size': stat.st_size, 'block_size': BLOCK_SIZE, 'blocks': blocks}
+    with open(gz_path + ".idx.tmp", 'w') as f:
+        json.dump(index, f)
+    os.replace(gz_path + ".idx.tmp", gz_path + ".idx")
+    os.replace(tmp_path, gz_path)
+    os.remove(raw_path)
+    return gz_path
+
+
+def prune(path: str, policy: LogPolicy) -> int:
+    """Delete archives beyond the retention limits; returns how many"""
+    now = time.time()
+    deleted = 0
+    for position, archive in enumerate(list_archives(path)):
+        try:
+            expired = policy.keep_seconds and now - archive.mtime > policy.keep_seconds
+        except OSError:
+            continue
+        if not (policy.keep_files and position >= policy.keep_files) and not expired:
+            continue
+        for name in (archive.path, archive.path + ".idx"):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+        deleted += 1
+    if deleted:
+        logger.info(f"Deleted {deleted} old archive(s) of {path}")
+    return deleted
+
+
+def _compress_and_prune(path: str, policy: LogPolicy):
+    # Also picks up archives a crash left uncompressed
+    for archive in list_archives(path):
+        if archive.compressed:
+            continue
+        try:
+            compress(archive.path)
+        except Exception as e:
+            logger.error(f"Error compressing {archive.path}: {e}", exc_info=True)
+    try:
+        prune(path, policy)
+    except Exception as e:
+        logger.error(f"Error pruning archives of {path}: {e}", exc_info=True)
+
+
+# -------------------
+# Background compression
+# -------------------
+compressor = ThreadPoolExecutor(1, thread_name_prefix="log-compress")
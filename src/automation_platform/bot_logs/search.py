@@ -0,0 +1,421 @@
+"""
+search.py - Full-text search across bot logs (SQLite FTS5 index)
+
+The indexer thread runs next to the bots (embedded and worker mode) and
+tails every bot's log into a local SQLite database: the output is cut
+into small documents of consecutive lines, never spanning two runs, and
+each document records its bot, organization, the file and inode it came
+from and its byte range. Reading goes through tail.read_since, so rotated
+logs are finished from their archives and nothing is indexed twice.
+
+Several workers may index the same database. Each chunk of a log is
+indexed in its own BEGIN IMMEDIATE transaction that first re-reads the
+file's offset, so one worker's bytes are never indexed again by another
+and the write lock is only held for one chunk (tail.MAX_READ_BYTES).
+
+Only the words are stored (a contentless FTS5 table); the text of a hit
+is read back from the log with a seek when it is shown. The FTS tables
+are partitioned by week, so a time-filtered query only touches the weeks
+it covers and the index is trimmed by dropping whole weeks
+(LOG_INDEX_KEEP_DAYS). Hits are timed by the start of the run that
+logged them (its "Execution at" banner).
+
+A query returns the newest matches first, paginated with a cursor; which
+execution a hit belongs to is looked up from BotExecutionLogSegment.
+"""
+
+from datetime import datetime, timedelta
+from threading import Event, Thread
+import logging, os, re, sqlite3, time
+
+import pytz
+
+from automation_platform.bot_logs.tail import read_since
+
+logger = logging.getLogger("automation_platform.scheduler.log_index")
+ist = pytz.timezone("Asia/Kolkata")
+
+DEFAULT_INDEX_PATH = "logs/log_index.db"
+DEFAULT_INTERVAL = 10  # seconds between indexing passes
+DEFAULT_KEEP_DAYS = 30
+
+# Bytes indexed per log file and pass, so one huge backlog does not hold
+# up every other bot's log
+PASS_BYTES = 16 * 1024 * 1024
+
+# A document ends after this many lines or bytes
+DOC_LINES = 64
+DOC_BYTES = 16 * 1024
+
+MAX_PAGE_SIZE = 100
+
+RUN_BANNER = re.compile(r"Execution at: (\S+ \S+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, inode INTEGER NOT NULL, offset INTEGER NOT NULL, run_at REAL
+);
+CREATE TABLE IF NOT EXISTS parts (
+    name TEXT PRIMARY KEY, starts REAL NOT NULL, ends REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    part TEXT NOT NULL,
+    bot_id INTEGER NOT NULL,
+    organization_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    logged_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_docs_part ON docs (part);
+"""
+
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")  # searches read while the indexer writes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _week(timestamp: float) -> tuple:
+    """Partition of a time: (name, starts, ends), weeks starting Monday IST"""
+    day = datetime.fromtimestamp(timestamp, ist).date()
+    monday = day - timedelta(days=day.weekday())
+    starts = ist.localize(datetime.combine(monday, datetime.min.time())).timestamp()
+    return f"fts_{monday:%Y%m%d}", starts, starts + 7 * 86400
+
+
+def _run_started(line: str) -> float | None:
+    match = RUN_BANNER.match(line)
+    if not match:
+        return None
+    try:
+        return datetime.fromisoformat(match.group(1)).timestamp()
+    except ValueError:
+        return None
+
+
+class LogIndexer:
+    def __init__(self):
+        self.app = None
+        self.path = DEFAULT_INDEX_PATH
+        self.interval = DEFAULT_INTERVAL
+        self.keep_days = DEFAULT_KEEP_DAYS
+        self._thread = None
+        self._stopping = Event()
+        self._conn = None
+        self._parts = set()
+        self._next_trim = 0
+        self._docs = 0
+        self._bytes = 0
+        self._last_pass_ms = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, path: str = DEFAULT_INDEX_PATH, interval: float = DEFAULT_INTERVAL,
+              keep_days: int = DEFAULT_KEEP_DAYS):
+        if self.running:
+            return
+        self.app = app
+        self.path = path
+        self.interval = interval
+        self.keep_days = keep_days
+        self._stopping.clear()
+        self._thread = Thread(target=self._run, name="log-index", daemon=True)
+        self._thread.start()
+        logger.info(f"Log indexer started ({path})")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        logger.info("Log indexer stopped")
+
+    def _run(self):
+        self._conn = connect(self.path)
+        self._parts = {row[0] for row in self._conn.execute("SELECT name FROM parts")}
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self.index_once()
+                    if time.time() >= self._next_trim:
+                        self._next_trim = time.time() + 3600
+                        self.trim()
+                except Exception as e:
+                    logger.error(f"Error indexing bot logs: {e}", exc_info=True)
+                self._stopping.wait(self.interval)
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    # -------------------
+    # Indexing
+    # -------------------
+    def _bots(self) -> dict:
+        """{log path: (bot_id, organization_id)} of bots that have a log"""
+        from automation_platform.database.database import db
+        from automation_platform.database.models import Bot
+
+        with self.app.app_context():
+            rows = (
+                db.session.query(Bot.bot_id, Bot.organization_id, Bot.log_file_path)
+                .filter(Bot.log_file_path.isnot(None))
+                .order_by(Bot.bot_id)
+                .all()
+            )
+            db.session.remove()
+        bots = {}
+        for bot_id, organization_id, path in rows:
+            bots.setdefault(path, (bot_id, organization_id))
+        return bots
+
+    def index_once(self) -> int:
+        """One pass over all bot logs; returns the bytes indexed"""
+        started = time.monotonic()
+        total = 0
+        # Another worker may have added or trimmed weeks
+        self._parts = {row[0] for row in self._conn.execute("SELECT name FROM parts")}
+        for path, (bot_id, organization_id) in self._bots().items():
+            if self._stopping.is_set():
+                break
+            total += self._index_file(path, bot_id, organization_id)
+        self._last_pass_ms = round((time.monotonic() - started) * 1000)
+        return total
+
+    def _index_file(self, path: str, bot_id: int, organization_id: int) -> int:
+        indexed = 0
+        while indexed < PASS_BYTES and not self._stopping.is_set():
+            length, more = self._index_chunk(path, bot_id, organization_id)
+            indexed += length
+            if not more:
+                break
+        self._bytes += indexed
+        return indexed
+
+    def _index_chunk(self, path: str, bot_id: int, organization_id: int) -> tuple:
+        """Index the next chunk of a log; returns (bytes indexed, whether more is waiting)"""
+        with self._conn:
+            # Taking the write lock before reading the offset: no other worker can index these bytes meanwhile
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT inode, offset, run_at FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                cursor, run_at = {'inode': row[0], 'offset': row[1]}, row[2]
+            else:
+                try:
+                    cursor, run_at = {'inode': os.stat(path).st_ino, 'offset': 0}, None
+                except OSError:
+                    return 0, False
+
+            try:
+                chunk = read_since(path, cursor)
+            except (FileNotFoundError, IsADirectoryError):
+                return 0, False
+            same_file = chunk['cursor']['inode'] == cursor['inode'] and not chunk['reset']
+            start = cursor['offset'] if same_file else 0
+            text = chunk['text']
+            # Leave a line still being written for the next pass
+            if not text.endswith("\n"):
+                cut = text.rfind("\n")
+                if cut >= 0:
+                    text = text[:cut + 1]
+                elif not chunk['more']:
+                    text = ""
+            if text:
+                run_at = self._add_text(text, start, chunk['cursor']['inode'], path, bot_id, organization_id, run_at)
+            length = len(text.encode('utf-8'))
+
+            self._conn.execute(
+                "INSERT INTO files (path, inode, offset, run_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET inode = excluded.inode, offset = excluded.offset, run_at = excluded.run_at",
+                (path, chunk['cursor']['inode'], start + length, run_at)
+            )
+        return length, bool(chunk['more'] and chunk['text'])
+
+    def _add_text(self, text, offset, inode, path, bot_id, organization_id, run_at) -> float | None:
+        """Cut complete lines into documents; returns the start of the last run seen"""
+        lines, size, doc_offset = [], 0, offset
+
+        def flush():
+            nonlocal lines, size, doc_offset
+            if lines:
+                self._add_doc("".join(lines), path, inode, doc_offset, size, bot_id, organization_id, run_at)
+            doc_offset += size
+            lines, size = [], 0
+
+        for line in text.splitlines(keepends=True):
+            started = _run_started(line)
+            if started is not None:
+                # A new run: its output goes into documents of its own
+                flush()
+                run_at = started
+            lines.append(line)
+            size += len(line.encode('utf-8'))
+            if len(lines) >= DOC_LINES or size >= DOC_BYTES:
+                flush()
+        flush()
+        return run_at
+
+    def _add_doc(self, text, path, inode, offset, length, bot_id, organization_id, run_at):
+        logged_at = run_at or time.time()
+        part, starts, ends = _week(logged_at)
+        if part not in self._parts:
+            self._conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {part} USING fts5(text, content='')")
+            self._conn.execute("INSERT OR IGNORE INTO parts (name, starts, ends) VALUES (?, ?, ?)", (part, starts, ends))
+            self._parts.add(part)
+        doc_id = self._conn.execute(
+            "INSERT INTO docs (part, bot_id, organization_id, path, inode, offset, length, logged_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (part, bot_id, organization_id, path, inode, offset, length, logged_at)
+        ).lastrowid
+        self._conn.execute(f"INSERT INTO {part} (rowid, text) VALUES (?, ?)", (doc_id, text))
+        self._docs += 1
+
+    def trim(self) -> int:
+        """Drop the weeks older than keep_days; returns how many"""
+        if not self.keep_days:
+            return 0
+        cutoff = time.time() - self.keep_days * 86400
+        old = [row[0] for row in self._conn.execute("SELECT name FROM parts WHERE ends < ?", (cutoff,))]
+        with self._conn:
+            for part in old:
+                self._conn.execute(f"DROP TABLE IF EXISTS {part}")
+                self._conn.execute("DELETE FROM docs WHERE part = ?", (part,))
+                self._conn.execute("DELETE FROM parts WHERE name = ?", (part,))
+                self._parts.discard(part)
+        if old:
+            logger.info(f"Dropped {len(old)} week(s) of the log index")
+        return len(old)
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'path': self.path,
+            'docs_indexed': self._docs,
+            'bytes_indexed': self._bytes,
+            'last_pass_ms': self._last_pass_ms
+        }
+
+
+# -------------------
+# Searching
+# -------------------
+MATCH_MODES = ("phrase", "all", "any")
+
+
+def fts_query(text: str, mode: str = "phrase") -> str:
+    """FTS5 query for user text: the exact phrase, all words or any word"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        raise ValueError("Query has no words to search for")
+    if mode == "phrase":
+        return '"' + " ".join(words) + '"'
+    if mode not in MATCH_MODES:
+        raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+    return f" {'AND' if mode == 'all' else 'OR'} ".join(f'"{word}"' for word in words)
+
+
+def search(index_path: str, query: str, organization_id: int, bot_ids: list | None = None,
+           since: float | None = None, until: float | None = None, cursor: str | None = None,
+           limit: int = 20) -> tuple:
+    """
+    Documents matching the FTS5 query in the organization's logs, newest
+    week first and newest indexed first within a week. Returns (docs,
+    next cursor or None). Raises ValueError for a bad cursor and
+    FileNotFoundError when nothing was indexed yet.
+    """
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(index_path)
+    after_part, before_id = None, None
+    if cursor:
+        try:
+            after_part, before_id = cursor.split(":")
+            before_id = int(before_id)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    conn = connect(index_path, readonly=True)
+    try:
+        parts = conn.execute(
+            "SELECT name FROM parts WHERE ends > ? AND starts <= ? ORDER BY starts DESC",
+            (since or 0, until or time.time() + 86400)
+        ).fetchall()
+        docs = []
+        for (part,) in parts:
+            if after_part and part > after_part:
+                continue  # already paged through
+            filters = ["d.organization_id = ?"]
+            params = [query, organization_id]
+            if part == after_part:
+                filters.append("f.rowid < ?")
+                params.append(before_id)
+            if bot_ids:
+                filters.append(f"d.bot_id IN ({', '.join('?' * len(bot_ids))})")
+                params.extend(bot_ids)
+            if since:
+                filters.append("d.logged_at >= ?")
+                params.append(since)
+            if until:
+                filters.append("d.logged_at < ?")
+                params.append(until)
+            params.append(limit + 1 - len(docs))
+            rows = conn.execute(
+                f"SELECT d.id, d.bot_id, d.path, d.inode, d.offset, d.length, d.logged_at "
+                f"FROM {part} f JOIN docs d ON d.id = f.rowid "
+                f"WHERE {part} MATCH ? AND {' AND '.join(filters)} "
+                f"ORDER BY f.rowid DESC LIMIT ?",
+                params
+            ).fetchall()
+            docs.extend(
+                {'part': part, 'doc_id': row[0], 'bot_id': row[1], 'path': row[2], 'inode': row[3],
+                 'offset': row[4], 'length': row[5], 'logged_at': row[6]}
+                for row in rows
+            )
+            if len(docs) > limit:
+                break
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e) or "syntax" in str(e):
+            raise ValueError(f"Invalid query: {e}")
+        raise
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = f"{docs[-1]['part']}:{docs[-1]['doc_id']}"
+    return docs, next_cursor
+
+
+def matching_line(text: str, words: list) -> tuple:
+    """
+    (byte offset in text, line) of the first line holding all the words,
+    else the first holding any of them
+    """
+    lowered = [word.lower() for word in words]
+    fallback = None
+    position = 0
+    for line in text.splitlines(keepends=True):
+        found = [word in line.lower() for word in lowered]
+        if all(found):
+            return position, line.rstrip("\n")
+        if fallback is None and any(found):
+            fallback = (position, line.rstrip("\n"))
+        position += len(line.encode('utf-8'))
+    return fallback or (0, text.split("\n", 1)[0])
+
+
+# -------------------
+# Global indexer instance
+# -------------------
+log_indexer = LogIndexer()
@@ -0,0 +1,108 @@
+"""
+segments.py - Read one execution's output back from the bot log
+
+A run's output is recorded as byte ranges of the bot's log file
+(BotExecutionLogSegment, written from BotOutputCapture.segments()), so
+reading it is a seek and a bounded read per range: the cost does not
+depend on how many other runs the file holds. Once the log has been
+rotated the ranges are read from its archive, decompressing only the
+blocks they cover.
+
+Offsets in and out are positions within the run's own output (its ranges
+laid end to end), so a client pages through it with next_offset.
+"""
+
+import os
+
+from automation_platform.bot_logs.rotation import find_archive
+from automation_platform.bot_logs.tail import MAX_READ_BYTES, _utf8_safe_end
+
+
+class LogSegmentGone(Exception):
+    """The log file holding the output is gone, archive included"""
+
+
+class _LogFile:
+    def __init__(self, f):
+        self.file = f
+        self.size = os.fstat(f.fileno()).st_size
+
+    def read(self, offset: int, size: int) -> bytes:
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+
+
+class _ArchiveSource:
+    def __init__(self, archive):
+        self.size = archive.size
+        self.read = archive.read
+
+    def close(self):
+        pass
+
+
+def open_source(path: str, inode: int):
+    """The log file if it is still the one written to, else its archive"""
+    try:
+        f = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        f = None
+    if f is not None:
+        if os.fstat(f.fileno()).st_ino == inode:
+            return _LogFile(f)
+        f.close()
+    archive = find_archive(path, inode)
+    if archive is None:
+        raise LogSegmentGone(path)
+    return _ArchiveSource(archive)
+
+
+def read_segments(segments: list, offset: int = 0, max_bytes: int = MAX_READ_BYTES) -> dict:
+    """
+    Up to max_bytes of the output from `offset`. `segments` are
+    BotExecutionLogSegment rows in seq order. Raises LogSegmentGone.
+    """
+    total = sum(segment.length for segment in segments)
+    offset = min(max(offset, 0), total)
+    chunks = []
+    wanted = max_bytes
+    position = 0  # start of the current segment within the output
+    sources = {}  # (path, inode) -> the file or archive
+    try:
+        for segment in segments:
+            end = position + segment.length
+            if wanted <= 0 or end <= offset:
+                position = end
+                continue
+            key = (segment.log_file_path, segment.log_inode)
+            if key not in sources:
+                sources[key] = open_source(segment.log_file_path, segment.log_inode)
+            source = sources[key]
+            if source.size < segment.offset + segment.length:
+                raise LogSegmentGone(segment.log_file_path)
+
+            skip = max(offset - position, 0)
+            size = min(segment.length - skip, wanted)
+            data = source.read(segment.offset + skip, size)
+            chunks.append(data)
+            wanted -= len(data)
+            position = end
+    finally:
+        for source in sources.values():
+            source.close()
+
+    data = b"".join(chunks)
+    more = offset + len(data) < total
+    if more:
+        # The cut-off character comes with the next page
+        data = data[:_utf8_safe_end(data)]
+    return {
+        'text': data.decode('utf-8', errors='replace'),
+        'offset': offset,
+        'next_offset': offset + len(data),
+        'total_bytes': total,
+        'more': more
+    }
@@ -0,0 +1,336 @@
+"""
+stream.py - Push bot log output and execution status to viewers (SSE)
+
+A viewer opens one Server-Sent Events stream per bot instead of polling
+/bot-wise-logs. However many viewers watch a bot, its log file is tailed
+once: a single hub thread reads what was appended to each watched bot's
+log (tail.read_since) and checks the bots' latest executions, and hands
+the chunks and status changes to every subscriber's queue.
+
+Each log event's id is the tail cursor after it ("<inode>:<offset>"), so a
+reconnecting EventSource resumes from Last-Event-ID by reading the file
+from that cursor - nothing is buffered for clients that went away, and a
+resume works after a server restart too. A subscriber that falls behind
+(its queue fills up) catches up from the file the same way. Status events
+carry no id so they don't move the cursor.
+
+Every open stream holds a server thread, so streams are capped
+(LOG_STREAM_MAX_CLIENTS); a stream also ends after LOG_STREAM_MAX_SECONDS
+and the browser reconnects, which keeps dead connections from piling up.
+"""
+
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+import json, logging, os, time
+
+from automation_platform.bot_logs.tail import DEFAULT_TAIL_LINES, read_since, tail_lines
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CLIENTS = 32
+DEFAULT_MAX_SECONDS = 1800  # then the browser reconnects with Last-Event-ID
+
+POLL_INTERVAL = 0.5  # seconds between log reads
+STATUS_INTERVAL = 2.0  # seconds between execution status checks
+HEARTBEAT_INTERVAL = 15  # seconds of silence before a keepalive comment
+RETRY_MS = 3000  # reconnect delay the browser is told to use
+
+# Events queued per subscriber before it is considered behind
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+def format_event(event: str, data: dict, event_id: str | None = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def cursor_to_event_id(cursor: dict) -> str:
+    return f"{cursor['inode']}:{cursor['offset']}"
+
+
+def event_id_to_cursor(event_id: str | None) -> dict | None:
+    """The cursor a Last-Event-ID stands for, None if it is not one of ours"""
+    try:
+        inode, offset = (event_id or "").split(":")
+        return {'inode': int(inode), 'offset': int(offset)}
+    except ValueError:
+        return None
+
+
+class Subscriber:
+    def __init__(self, bot_id: int):
+        self.bot_id = bot_id
+        self.queue = Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.behind = False  # set when the queue overflowed
+
+    def put(self, item):
+        if self.behind:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except Full:
+            self.behind = True
+
+    def resync(self):
+        """Drop what is queued; the stream reads the file from its cursor instead"""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
+        self.behind = False
+
+
+class LogStreamHub:
+    def __init__(self):
+        self.app = None
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = None
+        self._subscribers = {}  # bot_id -> set of Subscriber
+        self._paths = {}  # bot_id -> log file path
+        self._cursors = {}  # bot_id -> shared tail cursor
+        self._statuses = {}  # bot_id -> latest status event data
+        self._next_status_check = 0
+        self._chunks = 0
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def max_clients(self) -> int:
+        return self.app.config.get("LOG_STREAM_MAX_CLIENTS", DEFAULT_MAX_CLIENTS)
+
+    # -------------------
+    # Subscriptions
+    # -------------------
+    def subscribe(self, bot_id: int, log_path: str | None) -> Subscriber:
+        """Raises StreamLimitReached when max_clients streams are open"""
+        subscriber = Subscriber(bot_id)
+        with self._lock:
+            if self.client_count() >= self.max_clients:
+                raise StreamLimitReached()
+            self._subscribers.setdefault(bot_id, set()).add(subscriber)
+            if self._paths.get(bot_id) != log_path:
+                self._paths[bot_id] = log_path
+                self._cursors.pop(bot_id, None)
+            self._next_status_check = 0
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="log-stream", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.bot_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                # Last viewer left: stop tailing this bot
+                del self._subscribers[subscriber.bot_id]
+                self._paths.pop(subscriber.bot_id, None)
+                self._cursors.pop(subscriber.bot_id, None)
+                self._statuses.pop(subscriber.bot_id, None)
+
+    def client_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def current_status(self, bot_id: int) -> dict | None:
+        with self._lock:
+            return self._statuses.get(bot_id)
+
+    def _publish(self, bot_id: int, item):
+        with self._lock:
+            subscribers = list(self._subscribers.get(bot_id, ()))
+        for subscriber in subscribers:
+            subscriber.put(item)
+
+    # -------------------
+    # Hub thread
+    # -------------------
+    def _run(self):
+        while True:
+            with self._lock:
+                watched = dict(self._paths)
+            if not watched:
+                # Nobody is watching; sleep until someone subscribes
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            for bot_id, path in watched.items():
+                try:
+                    self._poll_log(bot_id, path)
+                except Exception as e:
+                    logger.error(f"Error tailing log of bot {bot_id}: {e}", exc_info=True)
+
+            if time.monotonic() >= self._next_status_check:
+                self._next_status_check = time.monotonic() + STATUS_INTERVAL
+                try:
+                    self._poll_statuses(list(watched))
+                except Exception as e:
+                    logger.error(f"Error checking execution status for log streams: {e}", exc_info=True)
+
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def _poll_log(self, bot_id: int, path: str | None):
+        if not path:
+            return
+        with self._lock:
+            cursor = self._cursors.get(bot_id)
+        if cursor is None:
+            # Subscribers read what is already there themselves; the shared
+            # tail starts at the end of the file
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            cursor = {'offset': stat.st_size, 'inode': stat.st_ino}
+        while True:
+            try:
+                chunk = read_since(path, cursor)
+            except (FileNotFoundError, IsADirectoryError):
+                return
+            if chunk['text'] or chunk['reset']:
+                self._chunks += 1
+                self._publish(bot_id, ('log', cursor, chunk))
+            cursor = chunk['cursor']
+            if not chunk['more']:
+                break
+        with self._lock:
+            if self._paths.get(bot_id) == path:
+                self._cursors[bot_id] = cursor
+
+    def _poll_statuses(self, bot_ids: list):
+        from automation_platform.database.database import db
+        from automation_platform.database.models import Bot, BotExecution
+        from sqlalchemy import func
+
+        with self.app.app_context():
+            latest = (
+                db.session.query(BotExecution.bot_id, func.max(BotExecution.execution_id).label('execution_id'))
+                .filter(BotExecution.bot_id.in_(bot_ids))
+                .group_by(BotExecution.bot_id)
+                .subquery()
+            )
+            rows = (
+                db.session.query(Bot.bot_id, Bot.is_active, BotExecution)
+                .outerjoin(latest, latest.c.bot_id == Bot.bot_id)
+                .outerjoin(BotExecution, BotExecution.execution_id == latest.c.execution_id)
+                .filter(Bot.bot_id.in_(bot_ids))
+                .all()
+            )
+            statuses = {
+                bot_id: {
+                    'bot_id': bot_id,
+                    'is_active': is_active,
+                    'execution_id': execution.execution_id if execution else None,
+                    'status': execution.status.value if execution else None,
+                    'started_at': execution.started_at if execution else None,
+                    'completed_at': execution.completed_at if execution else None
+                }
+                for bot_id, is_active, execution in rows
+            }
+            db.session.remove()
+
+        for bot_id, status in statuses.items():
+            with self._lock:
+                if bot_id not in self._subscribers or self._statuses.get(bot_id) == status:
+                    continue
+                self._statuses[bot_id] = status
+            self._publish(bot_id, ('status', status))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'clients': self.client_count(),
+                'max_clients': self.max_clients,
+                'bots': len(self._subscribers),
+                'chunks': self._chunks
+            }
+
+
+# -------------------
+# Per-client stream
+# -------------------
+def _catch_up(path: str | None, cursor: dict | None, lines: int):
+    """Send what the client is missing from the file; returns the new cursor"""
+    try:
+        if not path:
+            raise FileNotFoundError(path)
+        if cursor is None:
+            chunk = tail_lines(path, lines)
+            yield format_event('log', {'logs': chunk['text'], 'reset': True}, cursor_to_event_id(chunk['cursor']))
+            return chunk['cursor']
+        while True:
+            chunk = read_since(path, cursor)
+            if chunk['text'] or chunk['reset']:
+                yield format_event('log', {'logs': chunk['text'], 'reset': chunk['reset']}, cursor_to_event_id(chunk['cursor']))
+            cursor = chunk['cursor']
+            if not chunk['more']:
+                return cursor
+    except (FileNotFoundError, IsADirectoryError):
+        yield format_event('log', {'logs': "Log file not found", 'reset': True})
+        return None
+
+
+def log_event_stream(hub: LogStreamHub, subscriber: Subscriber, path: str | None, cursor: dict | None = None,
+                     lines: int = DEFAULT_TAIL_LINES, max_seconds: float = DEFAULT_MAX_SECONDS):
+    """
+    SSE text for one client: its backlog from `cursor` (or the last `lines`
+    lines), then what the hub publishes. Unsubscribes when the client goes.
+    """
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        cursor = yield from _catch_up(path, cursor, lines)
+        status = hub.current_status(subscriber.bot_id)
+        if status is not None:
+            yield format_event('status', status)
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            if subscriber.behind:
+                subscriber.resync()
+                cursor = yield from _catch_up(path, cursor, lines)
+            try:
+                item = subscriber.queue.get(timeout=HEARTBEAT_INTERVAL)
+            except Empty:
+                yield ": keepalive\n\n"
+                continue
+
+            if item[0] == 'status':
+                if item[1] != status:  # may have been sent as the initial status
+                    status = item[1]
+                    yield format_event('status', status)
+                continue
+
+            _, start, chunk = item
+            end = chunk['cursor']
+            if cursor is not None and cursor['inode'] == end['inode'] and cursor['offset'] >= end['offset']:
+                continue  # already sent while catching up
+            contiguous = cursor is not None and start['inode'] == cursor['inode'] and start['offset'] == cursor['offset']
+            rotated = chunk['reset'] and (cursor is None or cursor['inode'] != end['inode'])
+            if not (contiguous or rotated):
+                # Gap or overlap with what this client has: read it from the file
+                cursor = yield from _catch_up(path, cursor, lines)
+                continue
+            yield format_event('log', {'logs': chunk['text'], 'reset': chunk['reset']}, cursor_to_event_id(end))
+            cursor = end
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+# -------------------
+# Global hub instance
+# -------------------
+log_stream_hub = LogStreamHub()
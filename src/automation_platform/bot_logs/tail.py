@@ -0,0 +1,171 @@
+"""
+tail.py - Read bot log files incrementally for the log viewer
+
+The viewer polls a log that only ever grows while bots run, so each poll
+reads only what was appended since the last one: the client sends back
+the cursor it was given (byte offset plus the file's inode) and gets the
+new bytes and the next cursor. The first request reads the last N lines
+by scanning backwards from the end of the file, never the whole file.
+
+The cursor names the file by inode. After a rotation (rotation.py) the
+rest of the old file is read from its archive, then reading goes on with
+the new file. A log truncated in place (size below the offset), or
+rotated away without an archive, restarts at the beginning of the
+current file and the response says so (reset), so the viewer can drop
+what it shows.
+"""
+
+from pathlib import Path
+import os
+
+from automation_platform.bot_logs.rotation import find_archive, list_archives
+
+DEFAULT_TAIL_LINES = 500
+MAX_TAIL_LINES = 10000
+
+# Most bytes one response carries; a client further behind gets "more"
+# and asks again straight away
+MAX_READ_BYTES = 1024 * 1024
+
+# Block size when scanning backwards for line starts
+BACKWARD_BLOCK = 64 * 1024
+
+
+def _utf8_safe_end(data: bytes) -> int:
+    """Length of `data` without a UTF-8 sequence cut off at its end"""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # continuation byte, keep looking for the lead byte
+        if byte & 0x80 == 0:
+            return len(data)  # ASCII
+        needed = 2 if byte & 0xE0 == 0xC0 else 3 if byte & 0xF0 == 0xE0 else 4
+        return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+
+def _cursor(stat: os.stat_result, offset: int) -> dict:
+    return {'offset': offset, 'inode': stat.st_ino}
+
+
+def _scan_back(read, end: int, lines: int, max_bytes: int) -> tuple:
+    """
+    Where the last `lines` lines of a file of `end` bytes start (reading
+    through read(offset, size), at most max_bytes back), and how many
+    lines that covers.
+    """
+    start = end
+    newlines = 0
+    # A trailing newline ends the last line, it does not start a new one
+    if end and read(end - 1, 1) == b"\n":
+        newlines = -1
+
+    while start > 0 and end - start < max_bytes:
+        size = min(BACKWARD_BLOCK, start, max_bytes - (end - start))
+        block = read(start - size, size)
+        start -= size
+        count = block.count(b"\n")
+        if newlines + count >= lines:
+            # Start right after the newline that precedes the wanted lines
+            position = len(block)
+            for _ in range(lines - newlines):
+                position = block.rindex(b"\n", 0, position)
+            return start + position + 1, lines
+        newlines += count
+    return start, newlines + 1
+
+
+def tail_lines(path: str | Path, lines: int = DEFAULT_TAIL_LINES, max_bytes: int = MAX_READ_BYTES) -> dict:
+    """
+    The last `lines` lines of the file (at most max_bytes of them) and the
+    cursor to continue from. A log rotated not long ago has fewer lines
+    than asked for; the rest come from its newest archive. Raises
+    FileNotFoundError.
+    """
+    lines = min(max(lines, 1), MAX_TAIL_LINES)
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+
+        def read(offset, size):
+            f.seek(offset)
+            return f.read(size)
+
+        end = stat.st_size
+        start, found = _scan_back(read, end, lines, max_bytes)
+        data = read(start, end - start)
+
+    truncated = start > 0
+    if not truncated and found < lines and len(data) < max_bytes:
+        archives = list_archives(str(path))
+        if archives:
+            archive = archives[0]
+            wanted = lines - found if data else lines
+            archive_start, _ = _scan_back(archive.read, archive.size, wanted, max_bytes - len(data))
+            data = archive.read(archive_start, archive.size - archive_start) + data
+            truncated = archive_start > 0 or len(archives) > 1
+
+    return {
+        'text': data.decode('utf-8', errors='replace'),
+        'cursor': _cursor(stat, end),
+        'reset': True,
+        'more': False,
+        'truncated_head': truncated
+    }
+
+
+def read_since(path: str | Path, cursor: dict, max_bytes: int = MAX_READ_BYTES) -> dict:
+    """
+    What was appended to the file since `cursor` (at most max_bytes) and
+    the cursor to continue from. Raises FileNotFoundError, and ValueError
+    for a malformed cursor.
+    """
+    try:
+        offset = int(cursor['offset'])
+        inode = int(cursor['inode'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("cursor must have an integer offset and inode")
+    if offset < 0:
+        raise ValueError("cursor offset must not be negative")
+
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        reset = False
+        if stat.st_ino != inode:
+            # Rotated since the cursor was handed out: finish the old file
+            # from its archive, then go on with the new one
+            archive = find_archive(str(path), inode)
+            if archive is not None and offset < archive.size:
+                data = archive.read(offset, max_bytes)
+                data = data[:_utf8_safe_end(data)]
+                return {
+                    'text': data.decode('utf-8', errors='replace'),
+                    'cursor': {'offset': offset + len(data), 'inode': inode},
+                    'reset': False,
+                    'more': True
+                }
+            # No archive to finish from (deleted, or not ours): start over
+            reset = archive is None or offset > archive.size
+            offset = 0
+        elif stat.st_size < offset:
+            # Truncated in place: start over
+            reset = True
+            offset = 0
+
+        available = stat.st_size - offset
+        if available <= 0:
+            return {'text': '', 'cursor': _cursor(stat, offset), 'reset': reset, 'more': False}
+
+        f.seek(offset)
+        data = f.read(min(available, max_bytes))
+
+    # Don't split a character between two responses (or a bot's two writes);
+    # the cut-off bytes come with the next read
+    read = len(data)
+    data = data[:_utf8_safe_end(data)]
+    more = read < available
+    return {
+        'text': data.decode('utf-8', errors='replace'),
+        'cursor': _cursor(stat, offset + len(data)),
+        'reset': reset,
+        'more': more
+    }
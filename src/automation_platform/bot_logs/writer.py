@@ -0,0 +1,357 @@
+"""
+writer.py - Background writer for bot log output
+
+Bot output is written by one thread instead of the supervisor's event
+loop: captures enqueue their opens, chunks and closes, and the writer
+drains the queue in batches, appending everything queued for a file with
+a single write. It keeps the log files open, least recently used closed
+past max_open_files, and fsyncs the files it wrote every fsync_interval
+seconds (0 leaves it to the OS).
+
+The queue is bounded in bytes. When the disk falls behind, producers
+wait for room: the supervisor's pumps await it (wait_for_room), which
+stops them reading the pipes so the bots block on their own writes
+instead of output piling up in memory. Calls made on an event loop never
+block; having awaited room, they may overshoot the bound by their chunk.
+
+A cached descriptor is only reused while the path still names its file,
+so a log rotated by another process on the host is reopened, not
+written to in its archive.
+
+Rotation runs on the writer too, when a run opens a log no other run is
+writing to (see rotation.py), as does the recording of the byte ranges
+each run wrote (BotOutputCapture.segments()).
+
+Must be started with the scheduler; until then, and after stop(), each
+call writes synchronously in the caller's thread.
+"""
+
+from collections import OrderedDict, defaultdict, deque
+from pathlib import Path
+from threading import Condition, Event, Lock, Thread
+import asyncio, logging, os, time
+
+from automation_platform.bot_logs.rotation import rotate
+
+logger = logging.getLogger("automation_platform.scheduler.capture")
+
+DEFAULT_QUEUE_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_OPEN_FILES = 256
+DEFAULT_FSYNC_INTERVAL = 5  # seconds
+
+# Seconds a closing run waits for its output to be written
+CLOSE_TIMEOUT = 30
+
+# Batch latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 256
+
+OPEN = "open"
+WRITE = "write"
+CLOSE = "close"
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class LogWriter:
+    def __init__(self):
+        self.queue_bytes = DEFAULT_QUEUE_BYTES
+        self.max_open_files = DEFAULT_MAX_OPEN_FILES
+        self.fsync_interval = DEFAULT_FSYNC_INTERVAL
+        self._queue = deque()  # (op, capture, payload)
+        self._queued_bytes = 0
+        self._cond = Condition()
+        self._write_lock = Lock()  # whoever is writing: the thread, or callers while it is not running
+        self._thread = None
+        self._stopping = False
+
+        # Writer-side state, under _write_lock
+        self._files = OrderedDict()  # path -> fd, least recently used first
+        self._writers = defaultdict(int)  # path -> runs writing to it
+        self._dirty = set()  # paths written since their last fsync
+        self._next_fsync = 0
+
+        self._batches = 0
+        self._bytes = 0
+        self._errors = 0
+        self._fsyncs = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._max_latency = 0.0
+        self._producer_waits = 0
+        self._producer_wait_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _has_room(self, size: int) -> bool:
+        # An empty queue takes a chunk of any size
+        return self._queued_bytes + size <= self.queue_bytes or not self._queue
+
+    @property
+    def full(self) -> bool:
+        return self.running and not self._has_room(1)
+
+    def start(self, queue_bytes: int = DEFAULT_QUEUE_BYTES, max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+              fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        self.queue_bytes = max(queue_bytes, 1)
+        self.max_open_files = max(max_open_files, 1)
+        self.fsync_interval = fsync_interval
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Log writer started (queue {self.queue_bytes} bytes, {self.max_open_files} open files)")
+
+    def stop(self):
+        """Write everything still queued, fsync and close the files"""
+        was_running = self.running
+        if was_running:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            self._thread.join()
+            self._thread = None
+        with self._write_lock:
+            self._sync(force=True)
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
+        if was_running:
+            logger.info("Log writer stopped")
+
+    # -------------------
+    # Producers
+    # -------------------
+    def open(self, capture):
+        self._submit(OPEN, capture, None)
+
+    def write(self, capture, data: bytes):
+        self._submit(WRITE, capture, data)
+
+    def close(self, capture, timeout: float = CLOSE_TIMEOUT) -> bool:
+        """Queue the end of a run and wait until its output is written"""
+        done = Event()
+        self._submit(CLOSE, capture, done)
+        return done.wait(timeout)
+
+    async def wait_for_room(self, size: int):
+        """For producers on an event loop: wait until `size` more bytes fit"""
+        if not self.running or self._has_room(size):
+            return
+        started = time.perf_counter()
+        while self.running and not self._has_room(size):
+            await asyncio.sleep(0.01)
+        self._waited(started)
+
+    def _submit(self, op, capture, payload):
+        size = len(payload) if op == WRITE else 0
+        with self._cond:
+            if self.running:
+                # Only writes wait, and never on an event loop: the loop waits in wait_for_room
+                if op == WRITE and not self._has_room(size) and not _on_event_loop():
+                    started = time.perf_counter()
+                    while self.running and not self._has_room(size):
+                        self._cond.wait(0.1)
+                    self._waited(started)
+                if self.running:
+                    self._queue.append((op, capture, payload))
+                    self._queued_bytes += size
+                    self._cond.notify_all()
+                    return
+        with self._write_lock:
+            self._write_batch([(op, capture, payload)])
+
+    def _waited(self, started):
+        self._producer_waits += 1
+        self._producer_wait_ms += (time.perf_counter() - started) * 1000
+
+    # -------------------
+    # Writing
+    # -------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait(self._fsync_wait())
+                    if not self._queue:
+                        break
+                batch = list(self._queue)
+                self._queue.clear()
+                self._queued_bytes = 0
+                self._cond.notify_all()
+                stopping = self._stopping
+            with self._write_lock:
+                if batch:
+                    self._write_batch(batch)
+                self._sync()
+            if stopping and not batch:
+                return
+
+    def _fsync_wait(self) -> float | None:
+        if not self.fsync_interval or not self._dirty:
+            return None
+        return max(self._next_fsync - time.monotonic(), 0.01)
+
+    def _write_batch(self, batch: list):
+        """Apply queued ops in order; consecutive writes to a file go out as one"""
+        started = time.perf_counter()
+        pending = OrderedDict()  # path -> [(capture, data)]
+        for op, capture, payload in batch:
+            path = capture.key
+            if op == WRITE:
+                if not capture.failed:
+                    pending.setdefault(path, []).append((capture, payload))
+                continue
+            # Earlier writes to the file go first: a rotation or close comes after them
+            if path in pending:
+                self._append(path, pending.pop(path))
+            if op == OPEN:
+                self._open(capture)
+            else:
+                self._close(capture)
+                payload.set()
+        for path, writes in pending.items():
+            self._append(path, writes)
+
+        latency = (time.perf_counter() - started) * 1000
+        self._batches += 1
+        self._latencies.append(latency)
+        self._max_latency = max(self._max_latency, latency)
+
+    def _open(self, capture):
+        path = capture.key
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            if capture.log_policy and not self._writers[path]:
+                if rotate(path, capture.log_policy):
+                    self._release(path)  # the cached descriptor is the rotated file
+            self._fd(path)
+        except Exception as e:
+            logger.error(f"Error opening log {path}: {e}", exc_info=True)
+            capture.failed = True
+            return
+        self._writers[path] += 1
+
+    def _close(self, capture):
+        path = capture.key
+        if capture.failed or not self._writers.get(path):
+            return
+        self._writers[path] -= 1
+        if not self._writers[path]:
+            del self._writers[path]
+
+    def _append(self, path: str, writes: list):
+        data = b"".join(chunk for _, chunk in writes)
+        try:
+            fd = self._fd(path)
+            stat = os.fstat(fd)
+            # Only this writer appends to the file, so its size is where the data lands
+            offset = stat.st_size
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except Exception as e:
+            self._errors += 1
+            logger.error(f"Error writing log to {path}: {e}", exc_info=True)
+            self._release(path)
+            return
+        self._bytes += len(data)
+        self._dirty.add(path)
+        for capture, chunk in writes:
+            capture.add_segment(stat.st_ino, offset, len(chunk))
+            offset += len(chunk)
+
+    def _fd(self, path: str) -> int:
+        fd = self._files.get(path)
+        if fd is not None:
+            try:
+                current = os.stat(path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                self._files.move_to_end(path)
+                return fd
+            # Rotated or removed behind our back (e.g. by another worker on the host)
+            self._release(path)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._files[path] = fd
+        while len(self._files) > self.max_open_files:
+            self._release(next(iter(self._files)))
+        return fd
+
+    def _release(self, path: str):
+        fd = self._files.pop(path, None)
+        if fd is None:
+            return
+        try:
+            if path in self._dirty:
+                self._fsync(fd)
+            os.close(fd)
+        except OSError as e:
+            logger.error(f"Error closing log {path}: {e}")
+        self._dirty.discard(path)
+
+    def _sync(self, force: bool = False):
+        if not force and (not self.fsync_interval or time.monotonic() < self._next_fsync):
+            return
+        for path in list(self._dirty):
+            fd = self._files.get(path)
+            try:
+                if fd is not None:
+                    self._fsync(fd)
+            except OSError as e:
+                logger.error(f"Error syncing log {path}: {e}")
+        self._dirty.clear()
+        self._next_fsync = time.monotonic() + (self.fsync_interval or 0)
+
+    def _fsync(self, fd: int):
+        if self.fsync_interval:
+            os.fsync(fd)
+            self._fsyncs += 1
+
+    # -------------------
+    # Metrics
+    # -------------------
+    def stats(self) -> dict:
+        with self._cond:
+            queued, queued_bytes = len(self._queue), self._queued_bytes
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            'running': self.running,
+            'queued': queued,
+            'queued_bytes': queued_bytes,
+            'queue_bytes': self.queue_bytes,
+            'open_files': len(self._files),
+            'max_open_files': self.max_open_files,
+            'batches': self._batches,
+            'bytes_written': self._bytes,
+            'write_errors': self._errors,
+            'fsyncs': self._fsyncs,
+            'producer_waits': self._producer_waits,
+            'producer_wait_ms': round(self._producer_wait_ms, 2),
+            'write_latency_ms': {
+                'last': round(self._latencies[-1], 2) if self._latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(self._max_latency, 2)
+            }
+        }
+
+
+# -------------------
+# Global writer instance
+# -------------------
+log_writer = LogWriter()
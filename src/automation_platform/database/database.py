@@ -14,6 +14,9 @@ def init_db(app):
     with app.app_context():
         # Import all models here to register them
         from automation_platform.database import models  # noqa
+        from automation_platform.database.migrations import upgrade_schema
         db.create_all()
+        # create_all leaves existing tables alone; add what older installs lack
+        upgrade_schema(db.engine)
     
     return db
\ No newline at end of file
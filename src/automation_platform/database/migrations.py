@@ -0,0 +1,162 @@
+"""
+migrations.py - Bring an existing database up to the current models
+
+db.create_all() creates missing tables but never changes existing ones,
+so an install created by an older version lacks the columns, indexes and
+enum values added since. upgrade_schema() compares the database with the
+models and applies what is missing:
+
+- columns are added; NOT NULL ones get their model default so existing
+  rows are filled, and their foreign keys are added with them
+- missing tables, indexes and unique keys are created
+- ENUM columns are extended with new values and columns the models now
+  allow to be NULL are made nullable (MySQL, PostgreSQL)
+- keys the models no longer have (OBSOLETE_KEYS) are dropped
+
+It only adds or relaxes, never drops a column or narrows a type, and
+each step is checked against the live schema first, so running it again
+(or from the web app and a worker starting together) changes nothing.
+It runs from init_db at startup. To review the SQL first, or run it by
+hand:
+
+    python -m automation_platform.database.migrations --dry-run
+    python -m automation_platform.database.migrations
+"""
+
+import logging, sys
+
+from sqlalchemy import Enum, inspect, literal
+from sqlalchemy.schema import (
+    AddConstraint, CreateColumn, CreateIndex, CreateTable, ForeignKeyConstraint, UniqueConstraint
+)
+
+logger = logging.getLogger(__name__)
+
+# Unique keys the models dropped or replaced: {table: [key name]}
+OBSOLETE_KEYS = {
+    # Replaced by uq_botexecution_cron_slot, which leaves event runs out
+    "BotExecution": ["uq_botexecution_schedule_slot"]
+}
+
+
+def _column_spec(column, dialect) -> str:
+    spec = str(CreateColumn(column).compile(dialect=dialect))
+    default = column.default
+    # Python-side defaults don't fill existing rows; a NOT NULL column needs one in the DDL
+    if column.server_default is None and not column.nullable and default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        spec += f" DEFAULT {value}"
+    return spec
+
+
+def _plan(connection, metadata) -> list:
+    """SQL statements that bring the database to `metadata`, in order"""
+    dialect = connection.dialect
+    inspector = inspect(connection)
+    quote = dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            statements.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+            statements += [str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes]
+            continue
+        name = quote.format_table(table)
+        columns = {column['name']: column for column in inspector.get_columns(table.name)}
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        keys = indexes | {key['name'] for key in inspector.get_unique_constraints(table.name)}
+
+        for column in table.columns:
+            found = columns.get(column.name)
+            if found is None:
+                statements.append(f"ALTER TABLE {name} ADD COLUMN {_column_spec(column, dialect)}")
+                if dialect.name != 'sqlite':
+                    statements += [
+                        str(AddConstraint(fk.constraint).compile(dialect=dialect))
+                        for fk in column.foreign_keys
+                        if isinstance(fk.constraint, ForeignKeyConstraint)
+                    ]
+                continue
+
+            missing_values = (
+                set(column.type.enums) - set(getattr(found['type'], 'enums', None) or column.type.enums)
+                if isinstance(column.type, Enum) else set()
+            )
+            relaxed = column.nullable and not found['nullable'] and not column.primary_key
+            if not (missing_values or relaxed):
+                continue
+            if dialect.name == 'mysql':
+                statements.append(f"ALTER TABLE {name} MODIFY COLUMN {_column_spec(column, dialect)}")
+            elif dialect.name == 'postgresql':
+                statements += [
+                    f"ALTER TYPE {quote.quote(column.type.name)} ADD VALUE IF NOT EXISTS '{value}'"
+                    for value in sorted(missing_values)
+                ]
+                if relaxed:
+                    statements.append(f"ALTER TABLE {name} ALTER COLUMN {quote.quote(column.name)} DROP NOT NULL")
+            elif relaxed:
+                logger.warning(f"{table.name}.{column.name} should allow NULL but {dialect.name} cannot alter it")
+
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in keys:
+                statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+        for key in table.constraints:
+            if isinstance(key, UniqueConstraint) and key.name and key.name not in keys:
+                key_columns = ", ".join(quote.quote(column.name) for column in key.columns)
+                statements.append(f"CREATE UNIQUE INDEX {quote.quote(key.name)} ON {name} ({key_columns})")
+
+        # Dropped last: on MySQL a foreign key may need the replacement index first
+        for key in OBSOLETE_KEYS.get(table.name, ()):
+            if key not in keys:
+                continue
+            if dialect.name == 'mysql':
+                statements.append(f"ALTER TABLE {name} DROP INDEX {quote.quote(key)}")
+            elif dialect.name == 'sqlite':
+                if key in indexes:
+                    statements.append(f"DROP INDEX {quote.quote(key)}")
+                else:
+                    logger.warning(f"{table.name}.{key} is obsolete but SQLite cannot drop it; recreate the table")
+            else:
+                statements.append(f"ALTER TABLE {name} DROP CONSTRAINT {quote.quote(key)}")
+
+    return statements
+
+
+def upgrade_schema(engine, metadata=None, dry_run: bool = False) -> list:
+    """
+    Apply the missing schema changes; returns the statements (only listed
+    with dry_run). A statement that fails is logged and skipped, e.g. when
+    another process applied it first.
+    """
+    if metadata is None:
+        from automation_platform.database.database import db
+        from automation_platform.database import models  # noqa
+        metadata = db.metadata
+
+    with engine.connect() as connection:
+        statements = _plan(connection, metadata)
+    if dry_run:
+        return statements
+
+    for statement in statements:
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(statement)
+            logger.info(f"Schema upgrade: {statement}")
+        except Exception as e:
+            logger.error(f"Schema upgrade step failed: {statement}: {e}")
+    return statements
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from automation_platform.settings import settings
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    dry_run = "--dry-run" in sys.argv[1:]
+    applied = upgrade_schema(create_engine(settings.SQLALCHEMY_DATABASE_URI), dry_run=dry_run)
+    for statement in applied if dry_run else ():
+        print(f"{statement};")
+    if not applied:
+        print("Schema is up to date")
@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Text, TIMESTAMP,
-    ForeignKey, Enum, text
+    Column, Integer, BigInteger, Float, String, Boolean, Text, TIMESTAMP,
+    ForeignKey, Enum, Index, UniqueConstraint, text
 )
 from sqlalchemy.orm import relationship
 from automation_platform.database.database import db
@@ -18,6 +18,44 @@ class ExecutionStatus(enum.Enum):
     FAILED = "FAILED"
     CANCELLED = "CANCELLED"
     TIMEOUT = "TIMEOUT"
+    SKIPPED = "SKIPPED"
+
+
+# ===========================
+# ENUM for what a trigger does while the bot is busy
+# ===========================
+class OverlapPolicy(enum.Enum):
+    SKIP = "SKIP"          # record the run as skipped
+    QUEUE = "QUEUE"        # queue it, up to Bot.max_queued_runs waiting runs
+    COALESCE = "COALESCE"  # fold it into the one waiting follow-up run
+    REPLACE = "REPLACE"    # cancel the running/waiting runs and start this one
+
+
+# ===========================
+# ENUM for what fires a schedule
+# ===========================
+class TriggerType(enum.Enum):
+    CRON = "CRON"        # cron_expression
+    FILE = "FILE"        # a file matching watch_pattern lands in watch_path
+    WEBHOOK = "WEBHOOK"  # an authenticated POST to /api/triggers/webhook/<schedule_id>
+
+
+# ===========================
+# ENUM for when a pipeline edge lets its downstream bot run
+# ===========================
+class EdgeCondition(enum.Enum):
+    SUCCESS = "SUCCESS"  # the upstream run succeeded
+    FAILED = "FAILED"    # the upstream run failed, timed out or was cancelled
+    ALWAYS = "ALWAYS"    # the upstream run ended, however it went
+
+
+# ===========================
+# ENUM for Pipeline Run Status
+# ===========================
+class PipelineRunStatus(enum.Enum):
+    RUNNING = "RUNNING"
+    SUCCESS = "SUCCESS"
+    FAILED = "FAILED"
 
 
 # ===========================
@@ -31,6 +69,12 @@ class Organization(db.Model):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
+    # Dispatch: bots allowed to run at once across all workers (NULL = no limit)
+    max_concurrent_bots = Column(Integer, nullable=True)
+
+    # Dispatch: share of free slots relative to other organizations
+    dispatch_weight = Column(Integer, default=1, nullable=False)
+
     users = relationship("User", back_populates="organization", cascade="all, delete")
     categories = relationship("BotCategory", back_populates="organization", cascade="all, delete")
     bots = relationship("Bot", back_populates="organization", cascade="all, delete")
@@ -125,6 +169,20 @@ class Bot(db.Model):
     # Bot custom URL
     bot_custom_url = Column(Text, nullable=True)
 
+    # Log rotation and retention; NULL uses the platform default (BOT_LOG_*
+    # settings), 0 turns the limit off
+    log_rotate_mb = Column(Integer, nullable=True)
+    log_rotate_days = Column(Integer, nullable=True)
+    log_keep_files = Column(Integer, nullable=True)
+    log_keep_days = Column(Integer, nullable=True)
+
+    # Dispatch priority of scheduled runs (higher runs first)
+    priority = Column(Integer, default=0, nullable=False)
+
+    # What to do with a new run while the bot is running or has runs waiting
+    overlap_policy = Column(Enum(OverlapPolicy), default=OverlapPolicy.QUEUE, nullable=False)
+    max_queued_runs = Column(Integer, default=1, nullable=False)
+
     created_by = Column(Integer, ForeignKey("User.user_id"), nullable=False)
 
     created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
@@ -176,19 +234,52 @@ class BotSchedule(db.Model):
     schedule_id = Column(Integer, primary_key=True, autoincrement=True)
     bot_id = Column(Integer, ForeignKey("Bot.bot_id", ondelete="CASCADE"), nullable=False)
 
-    name = Column(String(255), nullable=False)
-    cron_expression = Column(String(100), nullable=False)
+    name = Column(String(255), nullable=False, index=True)
+    trigger_type = Column(
+        Enum(TriggerType), nullable=False, default=TriggerType.CRON, server_default=TriggerType.CRON.value
+    )
+    cron_expression = Column(String(100), nullable=True)  # CRON schedules only
     timezone = Column(String(50), nullable=False, default="UTC")
 
+    # FILE schedules: the directory watched and the file name glob
+    watch_path = Column(String(1024), nullable=True)
+    watch_pattern = Column(String(255), nullable=True)
+
+    # WEBHOOK schedules: SHA-256 of the token callers must present
+    webhook_token_hash = Column(String(64), nullable=True)
+
+    # FILE / WEBHOOK schedules: quiet period before a run, events meanwhile join it
+    debounce_seconds = Column(Integer, nullable=True)
+
+    # Overrides the bot priority for runs of this schedule (NULL = use bot priority)
+    priority = Column(Integer, nullable=True)
+
     is_active = Column(Boolean, default=True, nullable=False)
     created_by = Column(Integer, ForeignKey("User.user_id"), nullable=False)
 
     created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
+    # Next fire time, kept by the scheduler's job store (NULL = not scheduled)
+    next_run_at = Column(TIMESTAMP, nullable=True, index=True)
+
+    # Last change to the schedule itself (not to next_run_at); read by the reconciler
+    updated_at = Column(
+        TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), onupdate=text("CURRENT_TIMESTAMP"), index=True
+    )
+
+    # Latest run, kept by the scheduler: when it fired and how it went
+    last_run_at = Column(TIMESTAMP, nullable=True, index=True)
+    last_status = Column(String(20), nullable=True)
+    last_execution_id = Column(Integer, nullable=True, index=True)
+
     bot = relationship("Bot", back_populates="schedules")
     creator = relationship("User")
     executions = relationship("BotExecution", back_populates="schedule", passive_deletes=True)
 
+    __table_args__ = (
+        Index("ix_botschedule_active_next_run", "is_active", "next_run_at"),
+    )
+
 
 # ===========================
 # Bot Execution
@@ -208,11 +299,240 @@ class BotExecution(db.Model):
     started_at = Column(TIMESTAMP, nullable=True)
     completed_at = Column(TIMESTAMP, nullable=True)
 
+    # Cron slot the run fills (NULL = not a cron firing: manual, event or pipeline runs)
+    schedule_slot = Column(TIMESTAMP, nullable=True)
+
     created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
+    # Execution queue lease: worker that claimed the row and until when
+    claimed_by = Column(String(255), nullable=True)
+    lease_expires_at = Column(TIMESTAMP, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)
+
+    # Dispatch priority, fixed when the execution is queued
+    priority = Column(Integer, default=0, nullable=False)
+
+    # Why the execution was skipped or cancelled
+    status_reason = Column(String(255), nullable=True)
+
+    # Start-up time a warm pool saved this run (NULL = cold start)
+    warm_start_saved_ms = Column(Integer, nullable=True)
+
+    # Delay launch smoothing added: schedule jitter plus launch rate wait (NULL = smoothing off)
+    admission_delay_ms = Column(Integer, nullable=True)
+
+    # Event-triggered runs: not dispatched before this (debounce), and the events folded into the run
+    not_before = Column(TIMESTAMP, nullable=True)
+    trigger_events = Column(Integer, nullable=True)
+
+    # Processes the run left behind that were reaped when it ended (NULL = not swept)
+    stray_processes = Column(Integer, nullable=True)
+    reclaimed_rss_kb = Column(Integer, nullable=True)
+
+    # Pipeline run and node this execution is the run of (NULL = not part of a pipeline)
+    pipeline_run_id = Column(Integer, ForeignKey("PipelineRun.run_id", ondelete="SET NULL"), nullable=True, index=True)
+    pipeline_node_id = Column(Integer, ForeignKey("PipelineNode.node_id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        # One execution per cron slot, even with several workers firing it
+        UniqueConstraint("schedule_id", "schedule_slot", name="uq_botexecution_cron_slot"),
+        # One execution per pipeline node and run, even with several workers advancing it
+        UniqueConstraint("pipeline_run_id", "pipeline_node_id", name="uq_botexecution_pipeline_node"),
+        Index("ix_botexecution_status_lease", "status", "lease_expires_at"),
+        Index("ix_botexecution_bot_status", "bot_id", "status"),
+        Index("ix_botexecution_status_priority", "status", "priority", "execution_id"),
+    )
+
     bot = relationship("Bot", back_populates="executions")
     schedule = relationship("BotSchedule", back_populates="executions")
     triggered_by_user = relationship("User", back_populates="executions_triggered")
+    usage = relationship("BotExecutionUsage", back_populates="execution", uselist=False, passive_deletes=True)
+    log_segments = relationship(
+        "BotExecutionLogSegment", back_populates="execution",
+        order_by="BotExecutionLogSegment.seq", passive_deletes=True
+    )
+    metrics = relationship("BotExecutionMetric", back_populates="execution", passive_deletes=True)
+    events = relationship(
+        "BotExecutionEvent", back_populates="execution",
+        order_by="BotExecutionEvent.event_id", passive_deletes=True
+    )
+    pipeline_run = relationship("PipelineRun", back_populates="executions")
+    pipeline_node = relationship("PipelineNode")
+
+
+# ===========================
+# Bot Execution Resource Usage
+# ===========================
+class BotExecutionUsage(db.Model):
+    __tablename__ = "BotExecutionUsage"
+
+    # Resource usage of the bot process (and the children it waited for), from wait4
+    execution_id = Column(Integer, ForeignKey("BotExecution.execution_id", ondelete="CASCADE"), primary_key=True)
+
+    user_cpu_ms = Column(Integer, nullable=False, default=0)
+    sys_cpu_ms = Column(Integer, nullable=False, default=0)
+    max_rss_kb = Column(Integer, nullable=False, default=0)
+    block_input_ops = Column(Integer, nullable=False, default=0)
+    block_output_ops = Column(Integer, nullable=False, default=0)
+    voluntary_ctx_switches = Column(Integer, nullable=False, default=0)
+    involuntary_ctx_switches = Column(Integer, nullable=False, default=0)
+
+    execution = relationship("BotExecution", back_populates="usage")
+
+
+# ===========================
+# Bot Execution Log Segments
+# ===========================
+class BotExecutionLogSegment(db.Model):
+    __tablename__ = "BotExecutionLogSegment"
+
+    # Where a run's output sits in the bot's (shared) log file: one row per
+    # contiguous byte range, more than one only when runs wrote concurrently
+    execution_id = Column(Integer, ForeignKey("BotExecution.execution_id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+
+    log_file_path = Column(Text, nullable=False)
+    log_inode = Column(BigInteger, nullable=False)  # a different inode means the file was rotated away
+    offset = Column(BigInteger, nullable=False)
+    length = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        # Which run wrote a byte of a log file (log search hits)
+        Index("ix_botexecutionlogsegment_inode_offset", "log_inode", "offset"),
+    )
+
+    execution = relationship("BotExecution", back_populates="log_segments")
+
+
+# ===========================
+# Bot Execution Metrics and Events
+# ===========================
+class BotExecutionMetric(db.Model):
+    __tablename__ = "BotExecutionMetric"
+
+    # One row per metric a run reported (::ap::{"metric": ...} lines),
+    # folded over all its reports of that metric
+    execution_id = Column(Integer, ForeignKey("BotExecution.execution_id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String(100), primary_key=True)
+
+    total = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Aggregating one metric across runs and bots
+        Index("ix_botexecutionmetric_name", "name", "execution_id"),
+    )
+
+    execution = relationship("BotExecution", back_populates="metrics")
+
+
+class BotExecutionEvent(db.Model):
+    __tablename__ = "BotExecutionEvent"
+
+    # Events a run reported (::ap::{"event": ...} lines), in order
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    execution_id = Column(
+        Integer, ForeignKey("BotExecution.execution_id", ondelete="CASCADE"), nullable=False, index=True
+    )
+
+    name = Column(String(100), nullable=False)
+    data = Column(Text)  # JSON
+    emitted_at = Column(TIMESTAMP, nullable=False)
+
+    execution = relationship("BotExecution", back_populates="events")
+
+
+# ===========================
+# Pipeline (a DAG of bots)
+# ===========================
+class Pipeline(db.Model):
+    __tablename__ = "Pipeline"
+
+    pipeline_id = Column(Integer, primary_key=True, autoincrement=True)
+    organization_id = Column(Integer, ForeignKey("Organization.organization_id", ondelete="CASCADE"), nullable=False)
+
+    name = Column(String(255), nullable=False)
+    description = Column(Text)
+
+    # Runs of this schedule start the pipeline; its bot must be a root node (NULL = manual runs only)
+    trigger_schedule_id = Column(
+        Integer, ForeignKey("BotSchedule.schedule_id", ondelete="SET NULL"), nullable=True, unique=True
+    )
+
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_by = Column(Integer, ForeignKey("User.user_id"), nullable=False)
+
+    created_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
+    updated_at = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), onupdate=text("CURRENT_TIMESTAMP"))
+
+    trigger_schedule = relationship("BotSchedule")
+    creator = relationship("User")
+    nodes = relationship("PipelineNode", back_populates="pipeline", cascade="all, delete-orphan")
+    edges = relationship("PipelineEdge", back_populates="pipeline", cascade="all, delete-orphan")
+    runs = relationship("PipelineRun", back_populates="pipeline", passive_deletes=True)
+
+
+class PipelineNode(db.Model):
+    __tablename__ = "PipelineNode"
+
+    node_id = Column(Integer, primary_key=True, autoincrement=True)
+    pipeline_id = Column(Integer, ForeignKey("Pipeline.pipeline_id", ondelete="CASCADE"), nullable=False)
+    bot_id = Column(Integer, ForeignKey("Bot.bot_id", ondelete="CASCADE"), nullable=False)
+
+    pipeline = relationship("Pipeline", back_populates="nodes")
+    bot = relationship("Bot")
+
+    __table_args__ = (
+        UniqueConstraint("pipeline_id", "bot_id", name="uq_pipelinenode_bot"),
+    )
+
+
+class PipelineEdge(db.Model):
+    __tablename__ = "PipelineEdge"
+
+    edge_id = Column(Integer, primary_key=True, autoincrement=True)
+    pipeline_id = Column(Integer, ForeignKey("Pipeline.pipeline_id", ondelete="CASCADE"), nullable=False)
+    upstream_node_id = Column(Integer, ForeignKey("PipelineNode.node_id", ondelete="CASCADE"), nullable=False)
+    downstream_node_id = Column(Integer, ForeignKey("PipelineNode.node_id", ondelete="CASCADE"), nullable=False)
+
+    # The downstream bot runs once every incoming edge's condition holds
+    condition = Column(Enum(EdgeCondition), default=EdgeCondition.SUCCESS, nullable=False)
+
+    pipeline = relationship("Pipeline", back_populates="edges")
+    upstream = relationship("PipelineNode", foreign_keys=[upstream_node_id])
+    downstream = relationship("PipelineNode", foreign_keys=[downstream_node_id])
+
+    __table_args__ = (
+        UniqueConstraint("upstream_node_id", "downstream_node_id", name="uq_pipelineedge_nodes"),
+    )
+
+
+class PipelineRun(db.Model):
+    __tablename__ = "PipelineRun"
+
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    pipeline_id = Column(Integer, ForeignKey("Pipeline.pipeline_id", ondelete="CASCADE"), nullable=False)
+
+    status = Column(Enum(PipelineRunStatus), default=PipelineRunStatus.RUNNING, nullable=False)
+
+    # Who or what started it: a user, or a run of the trigger schedule
+    triggered_by_user_id = Column(Integer, ForeignKey("User.user_id", ondelete="SET NULL"), nullable=True)
+    schedule_id = Column(Integer, ForeignKey("BotSchedule.schedule_id", ondelete="SET NULL"), nullable=True)
+
+    started_at = Column(TIMESTAMP, nullable=False)
+    completed_at = Column(TIMESTAMP, nullable=True)
+
+    pipeline = relationship("Pipeline", back_populates="runs")
+    triggered_by_user = relationship("User")
+    executions = relationship("BotExecution", back_populates="pipeline_run", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_pipelinerun_status", "status"),
+        Index("ix_pipelinerun_pipeline_started", "pipeline_id", "started_at"),
+    )
 
 
 # ===========================
@@ -0,0 +1,324 @@
+"""
+dispatch.py - Decide which queued executions run next
+
+Queued executions are dispatched by priority class first: a higher
+BotExecution.priority always goes before a lower one. Scheduled runs take
+the schedule priority (or the bot priority), and manual "Run now" requests
+are lifted into a class above every scheduled run.
+
+Within a priority class organizations share the free slots by weighted
+fair queuing (start-time fair queuing over Organization.dispatch_weight),
+so one tenant's burst of cron jobs cannot starve the others.
+Organization.max_concurrent_bots caps how many bots of an organization run
+at once across all workers.
+"""
+
+from collections import defaultdict, deque
+from datetime import datetime
+from threading import Lock
+import logging, pytz
+
+from sqlalchemy import func, or_
+
+from automation_platform.database.database import db
+from automation_platform.database.models import (
+    Bot, BotExecution, BotSchedule, ExecutionStatus, Organization
+)
+from automation_platform.scheduler.execution_queue import (
+    DEFAULT_LEASE_SECONDS, live_execution_filter, try_claim, track_claims
+)
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+# Priorities users can give bots and schedules
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+
+# Added to the bot priority for manual runs, so they rank above any scheduled run
+MANUAL_PRIORITY_BOOST = MAX_PRIORITY + 1
+
+# Candidates fetched per organization for each slot it may fill
+CANDIDATES_PER_SLOT = 4
+
+
+def normalize_priority(value) -> int:
+    """Validate a bot/schedule priority from user input"""
+    if isinstance(value, bool):
+        raise ValueError("Priority must be an integer")
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Priority must be an integer")
+    if not MIN_PRIORITY <= priority <= MAX_PRIORITY:
+        raise ValueError(f"Priority must be between {MIN_PRIORITY} and {MAX_PRIORITY}")
+    return priority
+
+
+def execution_priority(bot: Bot, schedule: BotSchedule = None, manual: bool = False) -> int:
+    """Priority a new execution is queued with"""
+    priority = bot.priority or 0
+    if schedule is not None and schedule.priority is not None:
+        priority = schedule.priority
+    if manual:
+        priority += MANUAL_PRIORITY_BOOST
+    return priority
+
+
+def _pending_filter(now: datetime = None):
+    """Queued executions; with `now`, only those whose debounce is over"""
+    conditions = (
+        BotExecution.status == ExecutionStatus.PENDING,
+        BotExecution.claimed_by.is_(None),
+        BotExecution.bot_id.isnot(None)
+    )
+    if now is not None:
+        conditions += (or_(BotExecution.not_before.is_(None), BotExecution.not_before <= now),)
+    return conditions
+
+
+class FairDispatcher:
+    """
+    Weighted fair queuing state shared by dispatch rounds.
+
+    Each organization has a virtual finish time that advances by 1/weight
+    per dispatched execution; the organization with the smallest virtual
+    time goes next. An organization that comes back from idle starts at
+    the current virtual clock, so it cannot bank credit while idle.
+    """
+
+    def __init__(self):
+        self._virtual_time = {}
+        self._clock = 0.0
+        self._lock = Lock()
+
+    def round(self, candidates, running: dict, quotas: dict, weights: dict):
+        """Start a dispatch round over candidate rows (oldest first per organization)"""
+        with self._lock:
+            for organization_id in {row.organization_id for row in candidates}:
+                self._virtual_time[organization_id] = max(
+                    self._virtual_time.get(organization_id, 0.0), self._clock
+                )
+        return _DispatchRound(self, candidates, running, quotas, weights)
+
+    def virtual_time(self, organization_id: int) -> float:
+        with self._lock:
+            return self._virtual_time.get(organization_id, self._clock)
+
+    def charge(self, organization_id: int, weight: int):
+        """Account one dispatched execution to an organization"""
+        with self._lock:
+            start = max(self._virtual_time.get(organization_id, 0.0), self._clock)
+            self._clock = start
+            self._virtual_time[organization_id] = start + 1.0 / max(weight, 1)
+
+
+class _DispatchRound:
+    """Iterates candidates in dispatch order; call charge() for each row actually claimed"""
+
+    def __init__(self, dispatcher: FairDispatcher, candidates, running, quotas, weights):
+        self._dispatcher = dispatcher
+        self._running = dict(running)
+        self._quotas = quotas
+        self._weights = weights
+        self._queues = defaultdict(lambda: defaultdict(deque))  # priority -> org -> rows
+        for row in candidates:
+            self._queues[row.priority][row.organization_id].append(row)
+
+    def __iter__(self):
+        while True:
+            row = self._next()
+            if row is None:
+                return
+            yield row
+
+    def _at_quota(self, organization_id: int) -> bool:
+        quota = self._quotas.get(organization_id)
+        return quota is not None and self._running.get(organization_id, 0) >= quota
+
+    def _next(self):
+        for priority in sorted(self._queues, reverse=True):
+            queues = self._queues[priority]
+            eligible = [org for org, rows in queues.items() if rows and not self._at_quota(org)]
+            if eligible:
+                organization_id = min(eligible, key=lambda org: (self._dispatcher.virtual_time(org), org))
+                return queues[organization_id].popleft()
+        return None
+
+    def charge(self, row):
+        organization_id = row.organization_id
+        self._running[organization_id] = self._running.get(organization_id, 0) + 1
+        self._dispatcher.charge(organization_id, self._weights.get(organization_id, 1))
+
+
+def dispatch_next(limit: int, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> list:
+    """
+    Claim up to `limit` PENDING executions in dispatch order, at most one
+    per bot and within each organization's concurrency quota.
+    Returns the claimed execution ids. Must be called inside an app context.
+    """
+    if limit <= 0:
+        return []
+
+    now = datetime.now(ist)
+    claimed = []
+    try:
+        backlog = (
+            db.session.query(Bot.organization_id)
+            .join(BotExecution, BotExecution.bot_id == Bot.bot_id)
+            .filter(*_pending_filter(now))
+            .distinct()
+            .all()
+        )
+        if not backlog:
+            db.session.rollback()
+            return []
+
+        organizations = (
+            db.session.query(
+                Organization.organization_id,
+                Organization.max_concurrent_bots,
+                Organization.dispatch_weight
+            )
+            .filter(Organization.organization_id.in_([row.organization_id for row in backlog]))
+            .all()
+        )
+        quotas = {org.organization_id: org.max_concurrent_bots for org in organizations}
+        weights = {org.organization_id: org.dispatch_weight or 1 for org in organizations}
+
+        # Organizations with a quota are counted under a row lock, so two
+        # workers can't both fill the last slot; skip ones locked elsewhere
+        limited = [org_id for org_id, quota in quotas.items() if quota is not None]
+        locked = set()
+        if limited:
+            locked = {
+                row.organization_id for row in
+                db.session.query(Organization.organization_id)
+                .filter(Organization.organization_id.in_(limited))
+                .with_for_update(skip_locked=True)
+                .all()
+            }
+        eligible = [org_id for org_id in quotas if quotas[org_id] is None or org_id in locked]
+
+        running = dict(
+            db.session.query(Bot.organization_id, func.count(BotExecution.execution_id))
+            .join(BotExecution, BotExecution.bot_id == Bot.bot_id)
+            .filter(Bot.organization_id.in_(eligible), live_execution_filter(now))
+            .group_by(Bot.organization_id)
+            .all()
+        ) if eligible else {}
+
+        candidates = []
+        for organization_id in eligible:
+            slots = limit
+            if quotas[organization_id] is not None:
+                slots = min(limit, quotas[organization_id] - running.get(organization_id, 0))
+            if slots <= 0:
+                continue
+            candidates.extend(
+                db.session.query(
+                    BotExecution.execution_id,
+                    BotExecution.bot_id,
+                    BotExecution.priority,
+                    Bot.organization_id
+                )
+                .join(Bot, BotExecution.bot_id == Bot.bot_id)
+                .filter(*_pending_filter(now), Bot.organization_id == organization_id)
+                .order_by(BotExecution.priority.desc(), BotExecution.execution_id)
+                .limit(slots * CANDIDATES_PER_SLOT)
+                .with_for_update(of=BotExecution, skip_locked=True)
+                .all()
+            )
+        if not candidates:
+            db.session.rollback()
+            return []
+
+        # Lock the bots too, so two workers can't start the same bot at once
+        bot_ids = {row.bot_id for row in candidates}
+        locked_bots = {
+            row.bot_id for row in
+            db.session.query(Bot.bot_id)
+            .filter(Bot.bot_id.in_(bot_ids))
+            .with_for_update(skip_locked=True)
+            .all()
+        }
+        busy_bots = {
+            row.bot_id for row in
+            db.session.query(BotExecution.bot_id)
+            .filter(BotExecution.bot_id.in_(locked_bots), live_execution_filter(now))
+            .distinct()
+            .all()
+        }
+
+        dispatch_round = fair_dispatcher.round(candidates, running, quotas, weights)
+        seen_bots = set()
+        for row in dispatch_round:
+            if len(claimed) >= limit:
+                break
+            if row.bot_id not in locked_bots or row.bot_id in busy_bots or row.bot_id in seen_bots:
+                continue
+            if try_claim(row.execution_id, now, lease_seconds):
+                claimed.append(row.execution_id)
+                seen_bots.add(row.bot_id)
+                dispatch_round.charge(row)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    track_claims(claimed)
+    return claimed
+
+
+def queue_depths(organization_ids=None) -> list:
+    """
+    Pending and running executions per organization, with pending counts
+    per priority. organization_ids=None reports every organization.
+    Must be called inside an app context.
+    """
+    now = datetime.now(ist)
+
+    org_query = db.session.query(Organization).order_by(Organization.organization_id)
+    if organization_ids is not None:
+        org_query = org_query.filter(Organization.organization_id.in_(organization_ids))
+    organizations = org_query.all()
+    if not organizations:
+        return []
+    ids = [org.organization_id for org in organizations]
+
+    pending = defaultdict(dict)
+    for organization_id, priority, count in (
+        db.session.query(Bot.organization_id, BotExecution.priority, func.count(BotExecution.execution_id))
+        .join(Bot, BotExecution.bot_id == Bot.bot_id)
+        .filter(*_pending_filter(), Bot.organization_id.in_(ids))
+        .group_by(Bot.organization_id, BotExecution.priority)
+        .all()
+    ):
+        pending[organization_id][priority] = count
+
+    running = dict(
+        db.session.query(Bot.organization_id, func.count(BotExecution.execution_id))
+        .join(BotExecution, BotExecution.bot_id == Bot.bot_id)
+        .filter(Bot.organization_id.in_(ids), live_execution_filter(now))
+        .group_by(Bot.organization_id)
+        .all()
+    )
+
+    return [{
+        'organization_id': org.organization_id,
+        'organization_name': org.organization_name,
+        'max_concurrent_bots': org.max_concurrent_bots,
+        'dispatch_weight': org.dispatch_weight,
+        'running': running.get(org.organization_id, 0),
+        'pending': sum(pending[org.organization_id].values()),
+        'pending_by_priority': {
+            str(priority): count
+            for priority, count in sorted(pending[org.organization_id].items(), reverse=True)
+        }
+    } for org in organizations]
+
+
+# -------------------
+# Global dispatcher instance
+# -------------------
+fair_dispatcher = FairDispatcher()
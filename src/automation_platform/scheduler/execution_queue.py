@@ -0,0 +1,486 @@
+"""
+execution_queue.py - BotExecution rows as a durable, multi-worker queue
+
+A PENDING row is queued work. A worker claims it by setting claimed_by and
+a lease; the row becomes RUNNING when the bot process starts. The owning
+worker renews the lease while the row is claimed, and rows whose lease
+expired (worker crashed or hung) are put back to PENDING for another
+worker to pick up.
+
+A worker that crashed leaves its claims behind until their leases expire.
+On start-up, claims of earlier worker processes on the same host that no
+longer exist are recovered at once instead (dead_local_workers and
+requeue_worker_executions, run by BotSchedulerService.recover_executions).
+
+Claims are atomic on every backend: candidate rows are locked with
+SELECT ... FOR UPDATE SKIP LOCKED where the database supports it (MySQL 8),
+and the claim itself is a compare-and-set UPDATE on status/claimed_by,
+which is what keeps SQLite (no row locks) correct. Which rows to claim is
+decided by the dispatcher (dispatch.py).
+"""
+
+from datetime import datetime, timedelta
+from threading import Lock
+from uuid import uuid4
+import logging, os, socket, pytz
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from automation_platform.database.database import db
+from automation_platform.database.models import Bot, BotExecution, ExecutionStatus, OverlapPolicy
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+# Identity of this process in claimed_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+DEFAULT_LEASE_SECONDS = 60
+
+# A debounced run starts at most this many debounce periods after its first event
+MAX_DEBOUNCE_PERIODS = 6
+
+# Executions claimed by this worker and not yet finished
+local_claims = set()
+local_claims_lock = Lock()
+
+
+def _track_claim(execution_id: int):
+    with local_claims_lock:
+        local_claims.add(execution_id)
+
+
+def _untrack_claim(execution_id: int):
+    with local_claims_lock:
+        local_claims.discard(execution_id)
+
+
+def get_local_claims() -> set:
+    """Thread-safe copy of the executions this worker holds leases on"""
+    with local_claims_lock:
+        return set(local_claims)
+
+
+def live_execution_filter(now: datetime):
+    """Rows that currently occupy their bot: running, or claimed with a valid lease"""
+    return or_(
+        BotExecution.status == ExecutionStatus.RUNNING,
+        and_(
+            BotExecution.status == ExecutionStatus.PENDING,
+            BotExecution.claimed_by.isnot(None),
+            BotExecution.lease_expires_at > now
+        )
+    )
+
+
+def enqueue_execution(bot: Bot, schedule_id: int = None, user_id: int = None,
+                      scheduled_at: datetime = None, schedule_slot: datetime = None, priority: int = 0,
+                      not_before: datetime = None, trigger_events: int = None,
+                      pipeline_run_id: int = None, pipeline_node_id: int = None):
+    """
+    Queue an execution of `bot`, applying its overlap policy when the bot is
+    running or already has runs waiting. Skipped runs are recorded as
+    SKIPPED rows with the reason, so every trigger leaves an outcome.
+    Pipeline nodes are never skipped or coalesced (their run waits on this
+    execution): they queue behind the bot's other runs, or replace them.
+    not_before holds the run back from dispatch until then. schedule_slot
+    is the cron slot a scheduled firing fills; other runs leave it None.
+
+    Returns (execution, replaced): replaced lists the running executions a
+    REPLACE run supersedes, which the caller must stop. execution is None
+    if the cron slot (or pipeline node) was already enqueued by another
+    worker.
+    Must be called inside an app context.
+    """
+    now = datetime.now(ist)
+    policy = bot.overlap_policy or OverlapPolicy.QUEUE
+    execution = BotExecution(
+        bot_id=bot.bot_id,
+        schedule_id=schedule_id,
+        triggered_by_user_id=user_id,
+        status=ExecutionStatus.PENDING,
+        scheduled_at=scheduled_at or now,
+        schedule_slot=schedule_slot,
+        priority=priority,
+        not_before=not_before,
+        trigger_events=trigger_events,
+        pipeline_run_id=pipeline_run_id,
+        pipeline_node_id=pipeline_node_id
+    )
+    replaced = []
+    try:
+        # Serialize admissions per bot across workers (no-op on SQLite)
+        db.session.query(Bot.bot_id).filter(Bot.bot_id == bot.bot_id).with_for_update().first()
+
+        live = [
+            row.execution_id for row in
+            db.session.query(BotExecution.execution_id)
+            .filter(BotExecution.bot_id == bot.bot_id, live_execution_filter(now))
+            .all()
+        ]
+        waiting = [
+            row.execution_id for row in
+            db.session.query(BotExecution.execution_id)
+            .filter(
+                BotExecution.bot_id == bot.bot_id,
+                BotExecution.status == ExecutionStatus.PENDING,
+                BotExecution.claimed_by.is_(None)
+            )
+            .order_by(BotExecution.execution_id)
+            .all()
+        ]
+
+        may_skip = pipeline_run_id is None
+        if live or waiting:
+            if policy == OverlapPolicy.SKIP and may_skip:
+                _mark_skipped(execution, now, "Bot already running")
+            elif policy == OverlapPolicy.QUEUE and may_skip and len(waiting) >= max(bot.max_queued_runs or 0, 0):
+                _mark_skipped(execution, now, f"Run queue full ({len(waiting)} waiting)")
+            elif policy == OverlapPolicy.COALESCE and may_skip and waiting:
+                _mark_skipped(execution, now, f"Coalesced into execution {waiting[0]}")
+            elif policy == OverlapPolicy.REPLACE:
+                replaced = live
+
+        db.session.add(execution)
+        db.session.flush()
+
+        if policy == OverlapPolicy.REPLACE and waiting:
+            db.session.execute(
+                update(BotExecution)
+                .where(
+                    BotExecution.execution_id.in_(waiting),
+                    BotExecution.status == ExecutionStatus.PENDING,
+                    BotExecution.claimed_by.is_(None)
+                )
+                .values(
+                    status=ExecutionStatus.CANCELLED,
+                    completed_at=now,
+                    status_reason=f"Replaced by execution {execution.execution_id}"
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if pipeline_run_id is not None:
+            logger.info(f"Node {pipeline_node_id} of pipeline run {pipeline_run_id} already enqueued, skipping")
+        else:
+            logger.info(f"Schedule {schedule_id} slot {schedule_slot} already enqueued, skipping")
+        return None, []
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if execution.status == ExecutionStatus.SKIPPED:
+        logger.info(f"Execution {execution.execution_id} for bot {bot.bot_id} skipped: {execution.status_reason}")
+    return execution, replaced
+
+
+def enqueue_event(bot: Bot, schedule_id: int, debounce_seconds: int, events: int = 1, priority: int = 0):
+    """
+    Queue a run for events of an event-triggered schedule, debounced: the
+    run is dispatched debounce_seconds after the latest event, but no later
+    than MAX_DEBOUNCE_PERIODS debounce periods after the first. Events
+    arriving while a run of the schedule is still waiting to start join
+    that run instead (trigger_events counts them).
+
+    Returns (execution, replaced, coalesced); see enqueue_execution.
+    Must be called inside an app context.
+    """
+    now = datetime.now(ist).replace(tzinfo=None)
+    debounce = timedelta(seconds=max(debounce_seconds or 0, 0))
+    try:
+        # Same per-bot admission lock as enqueue_execution, held until it commits
+        db.session.query(Bot.bot_id).filter(Bot.bot_id == bot.bot_id).with_for_update().first()
+
+        waiting = (
+            db.session.query(BotExecution)
+            .filter(
+                BotExecution.schedule_id == schedule_id,
+                BotExecution.status == ExecutionStatus.PENDING,
+                BotExecution.claimed_by.is_(None)
+            )
+            .order_by(BotExecution.execution_id)
+            .first()
+        )
+        if waiting:
+            waiting.trigger_events = (waiting.trigger_events or 1) + events
+            # Still in its quiet period: start it over, up to the cap
+            if waiting.not_before is not None and waiting.not_before > now:
+                waiting.not_before = min(now + debounce, waiting.scheduled_at + debounce * MAX_DEBOUNCE_PERIODS)
+            db.session.commit()
+            return waiting, [], True
+    except Exception:
+        db.session.rollback()
+        raise
+
+    execution, replaced = enqueue_execution(
+        bot,
+        schedule_id=schedule_id,
+        scheduled_at=now,
+        priority=priority,
+        not_before=now + debounce,
+        trigger_events=events
+    )
+    return execution, replaced, False
+
+
+def _mark_skipped(execution: BotExecution, now: datetime, reason: str):
+    execution.status = ExecutionStatus.SKIPPED
+    execution.completed_at = now
+    execution.status_reason = reason
+
+
+def cancel_execution(execution_id: int, reason: str) -> bool:
+    """
+    Mark a pending or running execution CANCELLED. The process, if any, is
+    stopped by the worker that runs it. Returns False if it already ended.
+    """
+    try:
+        result = db.session.execute(
+            update(BotExecution)
+            .where(
+                BotExecution.execution_id == execution_id,
+                BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING])
+            )
+            .values(status=ExecutionStatus.CANCELLED, completed_at=datetime.now(ist), status_reason=reason)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount == 1
+
+
+def cancel_orphaned_executions() -> int:
+    """Cancel queued executions whose bot was deleted; nothing can run them"""
+    try:
+        result = db.session.execute(
+            update(BotExecution)
+            .where(
+                BotExecution.status == ExecutionStatus.PENDING,
+                BotExecution.bot_id.is_(None)
+            )
+            .values(status=ExecutionStatus.CANCELLED, completed_at=datetime.now(ist), status_reason="Bot deleted")
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if result.rowcount:
+        logger.info(f"Cancelled {result.rowcount} queued executions of deleted bots")
+    return result.rowcount
+
+
+def try_claim(execution_id: int, now: datetime, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+    """
+    Compare-and-set claim of one PENDING row for this worker, inside the
+    caller's transaction. After committing, pass the claimed ids to
+    track_claims so their leases are renewed.
+    """
+    result = db.session.execute(
+        update(BotExecution)
+        .where(
+            BotExecution.execution_id == execution_id,
+            BotExecution.status == ExecutionStatus.PENDING,
+            BotExecution.claimed_by.is_(None)
+        )
+        .values(
+            claimed_by=WORKER_ID,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def track_claims(execution_ids):
+    """Register committed claims as held by this worker"""
+    for execution_id in execution_ids:
+        _track_claim(execution_id)
+
+
+def release_claim(execution_id: int):
+    """Give a claimed, not yet started execution back to the queue"""
+    try:
+        db.session.execute(
+            update(BotExecution)
+            .where(
+                BotExecution.execution_id == execution_id,
+                BotExecution.status == ExecutionStatus.PENDING,
+                BotExecution.claimed_by == WORKER_ID
+            )
+            .values(claimed_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        _untrack_claim(execution_id)
+
+
+def release_local_claims(execution_ids):
+    """Stop renewing leases of executions whose final status is written"""
+    for execution_id in execution_ids:
+        _untrack_claim(execution_id)
+
+
+def renew_leases(lease_seconds: int = DEFAULT_LEASE_SECONDS) -> set:
+    """
+    Heartbeat: extend the leases of every execution this worker holds.
+    Returns the ids whose lease could not be renewed (reclaimed elsewhere).
+    """
+    held = get_local_claims()
+    if not held:
+        return set()
+
+    now = datetime.now(ist)
+    try:
+        db.session.execute(
+            update(BotExecution)
+            .where(
+                BotExecution.execution_id.in_(held),
+                BotExecution.claimed_by == WORKER_ID,
+                BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING])
+            )
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        still_held = {
+            row.execution_id for row in
+            db.session.query(BotExecution.execution_id)
+            .filter(BotExecution.execution_id.in_(held), BotExecution.claimed_by == WORKER_ID)
+            .all()
+        }
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    lost = held - still_held
+    for execution_id in lost:
+        logger.warning(f"Lease on execution {execution_id} was lost")
+    return lost
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+def dead_local_workers() -> set:
+    """
+    Worker ids on this host that still hold claims but whose process is
+    gone: its pid no longer exists, or it is ours (a restart that got the
+    same pid, as in containers). A reused pid keeps the claims until their
+    leases expire.
+    """
+    host = socket.gethostname()
+    own_pid = os.getpid()
+    claimants = (
+        db.session.query(BotExecution.claimed_by)
+        .filter(
+            BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]),
+            BotExecution.claimed_by.like(f"{host}:%")
+        )
+        .distinct()
+        .all()
+    )
+    db.session.rollback()
+
+    dead = set()
+    for (worker_id,) in claimants:
+        worker_host, _, rest = worker_id.partition(":")
+        pid, _, _ = rest.partition(":")
+        if worker_id == WORKER_ID or worker_host != host or not pid.isdigit():
+            continue
+        if int(pid) == own_pid or not _process_exists(int(pid)):
+            dead.add(worker_id)
+    return dead
+
+
+def requeue_worker_executions(worker_ids) -> list:
+    """
+    Put the executions claimed by the given (dead) workers back to PENDING,
+    as an expired lease would. Returns the requeued ids.
+    """
+    if not worker_ids:
+        return []
+    try:
+        execution_ids = [
+            row.execution_id for row in
+            db.session.query(BotExecution.execution_id)
+            .filter(
+                BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]),
+                BotExecution.claimed_by.in_(list(worker_ids))
+            )
+            .all()
+        ]
+        if execution_ids:
+            db.session.execute(
+                update(BotExecution)
+                .where(
+                    BotExecution.execution_id.in_(execution_ids),
+                    BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]),
+                    BotExecution.claimed_by.in_(list(worker_ids))
+                )
+                .values(
+                    status=ExecutionStatus.PENDING,
+                    claimed_by=None,
+                    lease_expires_at=None,
+                    started_at=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if execution_ids:
+        logger.warning(f"Requeued {len(execution_ids)} executions of stopped workers {sorted(worker_ids)}")
+    return execution_ids
+
+
+def reclaim_expired_leases() -> int:
+    """
+    Put executions whose lease expired back to PENDING so another worker
+    can run them. Returns the number of reclaimed rows.
+    """
+    now = datetime.now(ist)
+    try:
+        result = db.session.execute(
+            update(BotExecution)
+            .where(
+                BotExecution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]),
+                BotExecution.claimed_by.isnot(None),
+                BotExecution.lease_expires_at < now
+            )
+            .values(
+                status=ExecutionStatus.PENDING,
+                claimed_by=None,
+                lease_expires_at=None,
+                started_at=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if result.rowcount:
+        logger.warning(f"Reclaimed {result.rowcount} executions with expired leases")
+    return result.rowcount
@@ -0,0 +1,261 @@
+"""
+file_watch.py - Fire FILE schedules when files land in watched directories
+
+One thread watches the directories of all active FILE schedules. A file
+"lands" when it is closed after writing or moved into the directory (the
+usual write-then-rename), so half-written files do not fire. Files present
+before a directory is watched do not fire either.
+
+On Linux the watches are inotify watches (through libc, no extra
+dependency): one per directory, however many schedules share it.
+Elsewhere, or if inotify is unavailable, directories are rescanned every
+poll interval and new or changed files count as landed.
+
+Events are counted per schedule for each batch read and handed to the
+callback as {schedule_id: events}; debouncing and coalescing happen when
+the run is queued (execution_queue.enqueue_event). A directory that does
+not exist yet is retried on the next update().
+"""
+
+from collections import Counter
+from threading import Event, Lock, Thread
+import ctypes, ctypes.util, logging, os, select, struct, sys
+
+from automation_platform.scheduler.triggers import matches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5  # seconds, polling backend only
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+READ_SIZE = 64 * 1024
+
+# How long the watch thread waits for events before checking for stop
+WAIT_TIMEOUT = 1.0
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    def __init__(self):
+        self.backend = None  # "inotify" or "polling" once started
+        self.poll_interval = DEFAULT_POLL_INTERVAL
+        self._callback = None
+        self._thread = None
+        self._stopping = Event()
+        self._lock = Lock()
+        self._watches = {}  # schedule_id -> (directory, pattern)
+
+        # inotify backend
+        self._libc = None
+        self._fd = None
+        self._descriptors = {}  # directory -> watch descriptor
+        self._directories = {}  # watch descriptor -> directory
+
+        # polling backend
+        self._snapshots = {}  # directory -> {name: (mtime_ns, size)}
+
+        self._events = 0
+        self._overflows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, callback, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """callback({schedule_id: events}) is called on the watch thread"""
+        if self.running:
+            return
+        self._callback = callback
+        self.poll_interval = poll_interval
+        self._stopping.clear()
+
+        self._libc = _load_libc()
+        if self._libc:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                logger.warning(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), polling watched directories")
+                self._libc = None
+            else:
+                self._fd = fd
+        self.backend = "inotify" if self._fd is not None else "polling"
+
+        target = self._run_inotify if self._fd is not None else self._run_polling
+        self._thread = Thread(target=target, name="file-watch", daemon=True)
+        self._thread.start()
+        logger.info(f"File watcher started ({self.backend})")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._descriptors.clear()
+            self._directories.clear()
+            self._snapshots.clear()
+        logger.info("File watcher stopped")
+
+    # -------------------
+    # Watches
+    # -------------------
+    def update(self, watches: dict):
+        """Replace the watched schedules: {schedule_id: (directory, pattern)}"""
+        with self._lock:
+            self._watches = dict(watches)
+            wanted = {directory for directory, _ in self._watches.values()}
+            if self._fd is not None:
+                for directory in set(self._descriptors) - wanted:
+                    self._libc.inotify_rm_watch(self._fd, self._descriptors.pop(directory))
+                for directory in wanted - set(self._descriptors):
+                    wd = self._libc.inotify_add_watch(self._fd, directory.encode(), WATCH_MASK)
+                    if wd < 0:
+                        logger.warning(f"Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+                        continue
+                    self._descriptors[directory] = wd
+                    self._directories[wd] = directory
+            else:
+                for directory in set(self._snapshots) - wanted:
+                    del self._snapshots[directory]
+                for directory in wanted - set(self._snapshots):
+                    snapshot = self._scan(directory)
+                    if snapshot is not None:
+                        self._snapshots[directory] = snapshot
+
+    def _schedules_for(self, directory: str, name: str) -> list:
+        return [
+            schedule_id for schedule_id, (watched, pattern) in self._watches.items()
+            if watched == directory and matches(pattern, name)
+        ]
+
+    def _fire(self, hits: Counter):
+        if not hits:
+            return
+        self._events += sum(hits.values())
+        try:
+            self._callback(dict(hits))
+        except Exception as e:
+            logger.error(f"Error handling file events: {e}", exc_info=True)
+
+    # -------------------
+    # inotify backend
+    # -------------------
+    def _run_inotify(self):
+        while not self._stopping.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], WAIT_TIMEOUT)
+                if not ready:
+                    continue
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                continue
+            except (OSError, ValueError) as e:
+                if not self._stopping.is_set():
+                    logger.error(f"Error reading file events: {e}", exc_info=True)
+                    self._stopping.wait(WAIT_TIMEOUT)
+                continue
+            self._fire(self._parse(data))
+
+    def _parse(self, data: bytes) -> Counter:
+        hits = Counter()
+        offset = 0
+        with self._lock:
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                start = offset + EVENT_HEADER.size
+                name = data[start:start + length].split(b"\0", 1)[0].decode(errors="replace")
+                offset = start + length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped; fire everything rather than miss a file
+                    self._overflows += 1
+                    logger.warning("File event queue overflowed, firing all watched schedules")
+                    hits.update(self._watches.keys())
+                elif mask & IN_IGNORED:
+                    # The directory went away; update() watches it again once it is back
+                    directory = self._directories.pop(wd, None)
+                    if directory is not None and self._descriptors.get(directory) == wd:
+                        del self._descriptors[directory]
+                        logger.warning(f"Watched directory {directory} is gone")
+                elif name and wd in self._directories:
+                    hits.update(self._schedules_for(self._directories[wd], name))
+        return hits
+
+    # -------------------
+    # Polling backend
+    # -------------------
+    @staticmethod
+    def _scan(directory: str) -> dict | None:
+        try:
+            with os.scandir(directory) as entries:
+                snapshot = {}
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+                return snapshot
+        except OSError as e:
+            logger.warning(f"Cannot watch {directory}: {e}")
+            return None
+
+    def _run_polling(self):
+        while not self._stopping.wait(self.poll_interval):
+            with self._lock:
+                directories = list(self._snapshots)
+            hits = Counter()
+            for directory in directories:
+                snapshot = self._scan(directory)
+                if snapshot is None:
+                    continue
+                with self._lock:
+                    previous = self._snapshots.get(directory)
+                    if previous is None:
+                        continue  # no longer watched
+                    self._snapshots[directory] = snapshot
+                    for name, state in snapshot.items():
+                        if previous.get(name) != state:
+                            hits.update(self._schedules_for(directory, name))
+            self._fire(hits)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'backend': self.backend,
+                'schedules': len(self._watches),
+                'directories': len(self._descriptors) if self._fd is not None else len(self._snapshots),
+                'events': self._events,
+                'overflows': self._overflows
+            }
+
+
+# -------------------
+# Global watcher instance
+# -------------------
+file_watcher = FileWatcher()
@@ -0,0 +1,251 @@
+"""
+forecast.py - Projected bot concurrency from the active schedules
+
+Expands every active cron schedule over a time window into per-minute start
+counts and, with each bot's median run time from its recent executions,
+into the number of runs expected to be going at once in every minute.
+Crons that fire everything in the same minute ("0 9 * * *") show up as
+peaks before they saturate the supervisor.
+
+Expansion is done once per distinct cron expression, not per schedule:
+the minutes of the day come from croniter's expanded minute/hour fields
+and the days from the scheduler's own trigger, so day-of-week numbering
+matches what APScheduler actually fires (0 = Monday). Schedules sharing a
+cron expression, run time and jitter minute are counted together, and
+concurrency is a prefix sum over a per-minute difference array.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from statistics import median
+import logging, math, pytz
+
+from croniter import croniter
+from sqlalchemy import func
+
+from automation_platform.database.database import db
+from automation_platform.database.models import Bot, BotExecution, BotSchedule, ExecutionStatus, TriggerType
+from automation_platform.scheduler.jobstore import schedule_trigger
+from automation_platform.scheduler.smoothing import launch_smoother
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+MAX_WINDOW_HOURS = 7 * 24
+
+# Run time assumed for bots without finished runs
+DEFAULT_DURATION_MINUTES = 1
+
+# Runs considered for a bot's median run time; longer ones are capped
+HISTORY_RUNS = 20
+HISTORY_DAYS = 30
+MAX_DURATION_MINUTES = 24 * 60
+
+PEAKS = 10
+SCHEDULES_PER_PEAK = 20
+
+FINISHED_STATUSES = (ExecutionStatus.SUCCESS, ExecutionStatus.FAILED, ExecutionStatus.TIMEOUT)
+
+
+def _minutes_of_day(cron_expression: str) -> list:
+    """Minutes after midnight at which a cron expression fires on the days it fires"""
+    minutes, hours = croniter(cron_expression).expanded[:2]
+    minutes = range(60) if minutes == ['*'] else minutes
+    hours = range(24) if hours == ['*'] else hours
+    return sorted(hour * 60 + minute for hour in hours for minute in minutes)
+
+
+def _fire_times(cron_expression: str, start: datetime, end: datetime) -> list:
+    """Minute offsets from `start` at which the schedule fires before `end`"""
+    trigger = schedule_trigger(cron_expression)
+    day_minutes = _minutes_of_day(cron_expression)
+    plain = set(day_minutes)
+    fires = []
+    cursor = start
+    while cursor < end:
+        fire = trigger.get_next_fire_time(None, cursor)
+        if fire is None or fire >= end:
+            break
+        day = ist.localize(datetime(fire.year, fire.month, fire.day))
+        first = (fire - day).total_seconds() // 60
+        if first not in plain:
+            # Not a plain minute/hour cron; walk the trigger through this day
+            day_fires, probe = [], fire
+            while probe is not None and probe < min(end, day + timedelta(days=1)):
+                day_fires.append(probe)
+                probe = trigger.get_next_fire_time(probe, probe + timedelta(minutes=1))
+            fires.extend(int((t - start).total_seconds() // 60) for t in day_fires)
+        else:
+            base = int((day - start).total_seconds() // 60)
+            fires.extend(base + m for m in day_minutes if fire <= day + timedelta(minutes=m) < end)
+        cursor = day + timedelta(days=1)
+    return fires
+
+
+def median_durations(bot_ids) -> dict:
+    """Median run time in whole minutes of each bot's recent finished runs"""
+    if not bot_ids:
+        return {}
+    since = datetime.now(ist) - timedelta(days=HISTORY_DAYS)
+    recent = (
+        db.session.query(
+            BotExecution.bot_id,
+            BotExecution.started_at,
+            BotExecution.completed_at,
+            func.row_number().over(
+                partition_by=BotExecution.bot_id,
+                order_by=BotExecution.execution_id.desc()
+            ).label('recency')
+        )
+        .filter(
+            BotExecution.bot_id.in_(bot_ids),
+            BotExecution.status.in_(FINISHED_STATUSES),
+            BotExecution.started_at.isnot(None),
+            BotExecution.completed_at.isnot(None),
+            BotExecution.started_at >= since
+        )
+        .subquery()
+    )
+    durations = defaultdict(list)
+    for bot_id, started_at, completed_at in (
+        db.session.query(recent.c.bot_id, recent.c.started_at, recent.c.completed_at)
+        .filter(recent.c.recency <= HISTORY_RUNS)
+        .all()
+    ):
+        durations[bot_id].append(max((completed_at - started_at).total_seconds(), 0))
+    return {
+        bot_id: min(max(math.ceil(median(seconds) / 60), 1), MAX_DURATION_MINUTES)
+        for bot_id, seconds in durations.items()
+    }
+
+
+def forecast(start: datetime, hours: int, organization_id: int | None = None,
+             resolution: int = 1, capacity: int | None = None) -> dict:
+    """
+    Expected starts and concurrent runs per minute from `start` for `hours`
+    hours, bucketed by `resolution` minutes, plus the peak minutes and the
+    schedules behind them. Must be called inside an app context.
+    """
+    start = start.astimezone(ist).replace(second=0, microsecond=0)
+    hours = min(max(hours, 1), MAX_WINDOW_HOURS)
+    window = hours * 60
+    end = start + timedelta(minutes=window)
+
+    query = (
+        db.session.query(BotSchedule.schedule_id, BotSchedule.bot_id, BotSchedule.name, BotSchedule.cron_expression)
+        .join(Bot, Bot.bot_id == BotSchedule.bot_id)
+        .filter(
+            BotSchedule.is_active.is_(True),
+            BotSchedule.trigger_type == TriggerType.CRON,
+            Bot.is_active.is_(True)
+        )
+    )
+    if organization_id is not None:
+        query = query.filter(Bot.organization_id == organization_id)
+    schedules = query.all()
+
+    durations = median_durations({row.bot_id for row in schedules})
+
+    # Schedules sharing a cron expression, run time and jitter minute are one group
+    groups = defaultdict(list)
+    for row in schedules:
+        groups[(
+            row.cron_expression,
+            durations.get(row.bot_id, DEFAULT_DURATION_MINUTES),
+            launch_smoother.offset(row.schedule_id) // 60
+        )].append(row)
+
+    # Runs started before the window still count while they last
+    lookback = max((duration + shift for _, duration, shift in groups), default=0)
+    expansion_start = start - timedelta(minutes=lookback)
+
+    fires_by_cron = {}
+    invalid = []
+    for cron_expression in {cron for cron, _, _ in groups}:
+        try:
+            fires_by_cron[cron_expression] = [
+                t - lookback for t in _fire_times(cron_expression, expansion_start, end)
+            ]
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Cannot forecast cron expression {cron_expression!r}: {e}")
+            invalid.append(cron_expression)
+
+    starts = [0] * window
+    delta = [0] * (window + 1)
+    for (cron_expression, duration, shift), rows in groups.items():
+        weight = len(rows)
+        for t in fires_by_cron.get(cron_expression, ()):
+            t += shift
+            if 0 <= t < window:
+                starts[t] += weight
+            if t + duration > 0 and t < window:
+                delta[max(t, 0)] += weight
+                delta[min(t + duration, window)] -= weight
+
+    concurrent = []
+    running = 0
+    for minute in range(window):
+        running += delta[minute]
+        concurrent.append(running)
+
+    resolution = max(resolution, 1)
+    series = []
+    for bucket_start in range(0, window, resolution):
+        bucket = slice(bucket_start, bucket_start + resolution)
+        series.append({
+            'at': (start + timedelta(minutes=bucket_start)).isoformat(),
+            'starts': sum(starts[bucket]),
+            'max_concurrent': max(concurrent[bucket])
+        })
+
+    # Peaks are the highest stretches of constant concurrency, not single minutes
+    stretches = []
+    for minute in range(window):
+        if minute and concurrent[minute] == concurrent[minute - 1]:
+            stretches[-1][1] = minute + 1
+        else:
+            stretches.append([minute, minute + 1])
+    top = sorted(
+        (stretch for stretch in stretches if concurrent[stretch[0]]),
+        key=lambda stretch: (-concurrent[stretch[0]], stretch[0])
+    )[:PEAKS]
+
+    peaks = []
+    for first, last in sorted(top):
+        running_schedules = []
+        for (cron_expression, duration, shift), rows in groups.items():
+            fires = fires_by_cron.get(cron_expression, [])
+            # Running at `first`: fired in (first - duration, first]
+            index = bisect_left(fires, first - shift - duration + 1)
+            if index < len(fires) and fires[index] + shift <= first:
+                running_schedules.extend(rows)
+        peaks.append({
+            'from': (start + timedelta(minutes=first)).isoformat(),
+            'until': (start + timedelta(minutes=last)).isoformat(),
+            'concurrent': concurrent[first],
+            'starts': starts[first],
+            'schedules': [
+                {'schedule_id': row.schedule_id, 'name': row.name, 'bot_id': row.bot_id}
+                for row in running_schedules[:SCHEDULES_PER_PEAK]
+            ]
+        })
+
+    busiest = max(range(window), key=lambda m: starts[m]) if window else None
+    return {
+        'start': start.isoformat(),
+        'hours': hours,
+        'resolution_minutes': resolution,
+        'schedules': len(schedules),
+        'distinct_crons': len(fires_by_cron),
+        'invalid_crons': invalid,
+        'capacity': capacity,
+        'peak_concurrent': max(concurrent, default=0),
+        'minutes_over_capacity': sum(1 for c in concurrent if capacity and c > capacity),
+        'busiest_start_minute': {
+            'at': (start + timedelta(minutes=busiest)).isoformat(),
+            'starts': starts[busiest]
+        } if busiest is not None and starts[busiest] else None,
+        'peaks': peaks,
+        'series': series
+    }
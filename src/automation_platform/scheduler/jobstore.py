@@ -0,0 +1,254 @@
+"""
+jobstore.py - APScheduler job store backed by BotSchedule rows
+
+The schedule jobs (id "schedule_<schedule_id>") are not stored anywhere
+of their own: each one is rebuilt from its BotSchedule row, with the
+trigger derived from cron_expression. The only scheduler state kept is
+BotSchedule.next_run_at (NULL = not scheduled: paused, inactive or
+removed; it includes the schedule's jitter, see smoothing.py), so finding due jobs is one range query on its index and no job
+is ever pickled. Writes to next_run_at leave BotSchedule.updated_at alone,
+so the reconciler (reconciler.py) only sees changes to the schedules.
+
+Only CRON schedules have jobs; file and webhook schedules are fired by
+their events (see triggers.py). Only schedule jobs can be added; housekeeping jobs belong in the
+in-memory "internal" store. Removing a job only unschedules it - the
+BotSchedule row is owned by the API.
+
+The store also keeps each schedule's latest run (last_run_at,
+last_status, last_execution_id) from the scheduler's job events and the
+execution recorder, so schedule listings never touch the jobs.
+"""
+
+from datetime import datetime
+from threading import Lock
+import logging, pytz
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import func, select, update
+
+from automation_platform.database.database import db
+from automation_platform.database.models import Bot, BotExecution, BotSchedule, TriggerType
+from automation_platform.scheduler.smoothing import launch_smoother
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+JOB_ID_PREFIX = "schedule_"
+JOB_FUNC = "automation_platform.scheduler.scheduler:_execute_bot_wrapper"
+
+schedules = BotSchedule.__table__
+bots = Bot.__table__
+executions = BotExecution.__table__
+
+# last_status of runs that did not queue an execution
+MISSED = "MISSED"
+ERROR = "ERROR"
+NOT_QUEUED = "NOT_QUEUED"
+
+
+def schedule_job_id(schedule_id: int) -> str:
+    return f"{JOB_ID_PREFIX}{schedule_id}"
+
+
+def parse_job_id(job_id: str) -> int | None:
+    """The schedule id of a schedule job id, or None for any other job"""
+    if not job_id.startswith(JOB_ID_PREFIX):
+        return None
+    try:
+        return int(job_id[len(JOB_ID_PREFIX):])
+    except ValueError:
+        return None
+
+
+_triggers = {}
+_triggers_lock = Lock()
+
+
+def schedule_trigger(cron_expression: str) -> CronTrigger:
+    """The trigger of a cron expression; triggers are stateless, so they are shared"""
+    with _triggers_lock:
+        trigger = _triggers.get(cron_expression)
+        if trigger is None:
+            trigger = _triggers[cron_expression] = CronTrigger.from_crontab(cron_expression, timezone=ist)
+        return trigger
+
+
+def _to_column(value: datetime | None):
+    """Aware datetime -> the IST wall-clock time stored in TIMESTAMP columns"""
+    return value.astimezone(ist).replace(tzinfo=None) if value else None
+
+
+def _from_column(value: datetime | None):
+    return ist.localize(value) if value else None
+
+
+class BotScheduleJobStore(BaseJobStore):
+    def __init__(self, app, job_defaults: dict | None = None):
+        super().__init__()
+        self.app = app
+        self.job_defaults = job_defaults or {}
+
+    # -------------------
+    # Reading
+    # -------------------
+    def lookup_job(self, job_id):
+        schedule_id = parse_job_id(job_id)
+        if schedule_id is None:
+            return None
+        jobs = self._select(schedules.c.schedule_id == schedule_id)
+        return jobs[0] if jobs else None
+
+    def get_due_jobs(self, now):
+        return self._select(schedules.c.next_run_at <= _to_column(now), order=True)
+
+    def get_next_run_time(self):
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                next_run_at = connection.execute(
+                    select(func.min(schedules.c.next_run_at)).where(schedules.c.trigger_type == TriggerType.CRON)
+                ).scalar()
+        return _from_column(next_run_at)
+
+    def get_all_jobs(self):
+        # Scheduled jobs in run order, then the unscheduled ones (as APScheduler expects)
+        jobs = self._select(order=True)
+        return [job for job in jobs if job.next_run_time] + [job for job in jobs if not job.next_run_time]
+
+    def _select(self, *filters, order: bool = False) -> list:
+        query = (
+            select(
+                schedules.c.schedule_id,
+                schedules.c.bot_id,
+                schedules.c.name,
+                schedules.c.cron_expression,
+                schedules.c.next_run_at,
+                bots.c.bot_name
+            )
+            .join(bots, bots.c.bot_id == schedules.c.bot_id)
+            .where(schedules.c.trigger_type == TriggerType.CRON, *filters)
+        )
+        if order:
+            query = query.order_by(schedules.c.next_run_at, schedules.c.schedule_id)
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                rows = connection.execute(query).all()
+
+        jobs = []
+        for row in rows:
+            try:
+                jobs.append(self._job(row))
+            except ValueError as e:
+                logger.error(f"Schedule {row.schedule_id} has an invalid cron expression, skipping: {e}")
+        return jobs
+
+    def _job(self, row) -> Job:
+        job = Job.__new__(Job)
+        job.__setstate__({
+            'version': 1,
+            'id': schedule_job_id(row.schedule_id),
+            'func': JOB_FUNC,
+            'trigger': launch_smoother.jittered(row.schedule_id, schedule_trigger(row.cron_expression)),
+            'executor': self.job_defaults.get('executor', 'default'),
+            # The fire time goes along: it keys the run's cron slot
+            'args': (row.bot_id, row.schedule_id, _from_column(row.next_run_at)),
+            'kwargs': {},
+            'name': f"{row.name} (Bot: {row.bot_name})",
+            'misfire_grace_time': launch_smoother.misfire_grace_time(
+                row.schedule_id, self.job_defaults.get('misfire_grace_time', 1)
+            ),
+            'coalesce': self.job_defaults.get('coalesce', True),
+            'max_instances': self.job_defaults.get('max_instances', 1),
+            'next_run_time': _from_column(row.next_run_at)
+        })
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    # -------------------
+    # Writing
+    # -------------------
+    def add_job(self, job):
+        schedule_id = parse_job_id(job.id)
+        if schedule_id is None:
+            raise ValueError(f"Job {job.id} is not a bot schedule; use the 'internal' job store")
+        # The row exists already; adding the job schedules it
+        if not self._set_next_run(schedule_id, job.next_run_time, only_unscheduled=True):
+            if self.lookup_job(job.id):
+                raise ConflictingIdError(job.id)
+            raise ValueError(f"Schedule {schedule_id} does not exist")
+
+    def update_job(self, job):
+        schedule_id = parse_job_id(job.id)
+        if schedule_id is None or not self._set_next_run(schedule_id, job.next_run_time):
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        schedule_id = parse_job_id(job_id)
+        if schedule_id is None or not self._set_next_run(schedule_id, None):
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(update(schedules).values(next_run_at=None, updated_at=schedules.c.updated_at))
+
+    def _set_next_run(self, schedule_id: int, next_run_time, only_unscheduled: bool = False) -> bool:
+        statement = (
+            update(schedules)
+            .where(schedules.c.schedule_id == schedule_id)
+            .values(next_run_at=_to_column(next_run_time), updated_at=schedules.c.updated_at)
+        )
+        if only_unscheduled:
+            statement = statement.where(schedules.c.next_run_at.is_(None))
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                return connection.execute(statement).rowcount > 0
+
+    # -------------------
+    # Latest run
+    # -------------------
+    def record_run(self, schedule_id: int, run_time: datetime, execution_id: int | None = None,
+                   status: str | None = None):
+        """
+        A run of the schedule fired (or was missed). With an execution_id
+        the status is read from the execution, which may already be final.
+        """
+        last_status = (
+            select(executions.c.status)
+            .where(executions.c.execution_id == execution_id)
+            .scalar_subquery()
+        ) if execution_id is not None else status
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(schedules)
+                    .where(schedules.c.schedule_id == schedule_id)
+                    .values(
+                        last_run_at=_to_column(run_time),
+                        last_status=last_status,
+                        last_execution_id=execution_id,
+                        updated_at=schedules.c.updated_at
+                    )
+                )
+
+    def record_results(self, execution_ids):
+        """Recorder flush listener: copy final statuses to the schedules they are the latest run of"""
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(schedules)
+                    .where(schedules.c.last_execution_id.in_(list(execution_ids)))
+                    .values(
+                        last_status=(
+                            select(executions.c.status)
+                            .where(executions.c.execution_id == schedules.c.last_execution_id)
+                            .scalar_subquery()
+                        ),
+                        updated_at=schedules.c.updated_at
+                    )
+                )
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}>"
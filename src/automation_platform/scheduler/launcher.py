@@ -0,0 +1,66 @@
+"""
+launcher.py - Start a bot and report its resource usage
+
+    python launcher.py <report fd> <command> [args...]
+
+Runs the command as a child, waits for it with os.wait4 and writes the
+child's resource usage as one JSON line to the report descriptor (passed
+with pass_fds), then exits with the child's exit code. The supervisor
+starts it in a new session and signals the whole process group, so the
+launcher ignores SIGTERM/SIGINT/SIGHUP itself.
+
+Standard library only: it is started with -I -S to keep its own start-up
+cost negligible.
+"""
+
+import json, os, signal, sys
+
+
+def usage_from_rusage(rusage):
+    """The resource figures stored per execution"""
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return {
+        "user_cpu_ms": round(rusage.ru_utime * 1000),
+        "sys_cpu_ms": round(rusage.ru_stime * 1000),
+        "max_rss_kb": max_rss_kb,
+        "block_input_ops": rusage.ru_inblock,
+        "block_output_ops": rusage.ru_oublock,
+        "voluntary_ctx_switches": rusage.ru_nvcsw,
+        "involuntary_ctx_switches": rusage.ru_nivcsw,
+    }
+
+
+def main():
+    report_fd, cmd = int(sys.argv[1]), sys.argv[2:]
+    os.set_inheritable(report_fd, False)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.execvp(cmd[0], cmd)
+        except OSError as e:
+            print(f"Cannot start {cmd[0]}: {e}", file=sys.stderr, flush=True)
+        os._exit(127)
+
+    # Nothing is forwarded: stop requests go to the whole process group and
+    # reach the bot directly. The launcher ignores them so it outlives the
+    # bot and can still report its usage
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_IGN)
+
+    _, status, rusage = os.wait4(pid, 0)
+
+    try:
+        os.write(report_fd, (json.dumps(usage_from_rusage(rusage)) + "\n").encode("utf-8"))
+        os.close(report_fd)
+    except OSError:
+        pass
+
+    if os.WIFSIGNALED(status):
+        signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+        os.kill(os.getpid(), os.WTERMSIG(status))
+    os._exit(os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+pipelines.py - Runs of bot pipelines (DAGs of bots)
+
+A pipeline run starts by queueing its root nodes (no incoming edges); a
+run started by the pipeline's trigger schedule adopts that schedule's
+execution as its root instead. Whenever a node's execution ends, the
+nodes downstream of it whose upstream executions have all ended are
+resolved at once: queued if every incoming edge's condition holds,
+otherwise recorded as a SKIPPED execution with the reason, so skips
+propagate and every node of a run ends with an outcome. Independent
+branches are queued together and run in parallel like any other queued
+work. Node runs go through the execution queue and the dispatcher's
+fairness, but a busy bot never skips or coalesces them: they wait for
+it (or replace its run, for REPLACE bots), so a node only ends SKIPPED
+because of its edges or an inactive bot.
+
+Runs are advanced from the recorder's flush listener, right after the
+final statuses are written, and by the worker poll for executions that
+ended some other way (cancelled, replaced). Several workers may advance
+the same run: a node gets at most one execution per run (a unique
+constraint), and the run's final status is a compare-and-set. A run
+fails if any of its bot runs failed, timed out or was cancelled.
+
+Must be called inside an app context.
+"""
+
+from datetime import datetime
+import logging, pytz
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from automation_platform.database.database import db
+from automation_platform.database.models import (
+    Bot, BotExecution, EdgeCondition, ExecutionStatus, Pipeline, PipelineNode, PipelineRun, PipelineRunStatus
+)
+from automation_platform.scheduler.dispatch import execution_priority
+from automation_platform.scheduler.execution_queue import enqueue_execution
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+FINAL_STATUSES = {
+    ExecutionStatus.SUCCESS, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED,
+    ExecutionStatus.TIMEOUT, ExecutionStatus.SKIPPED
+}
+FAILED_STATUSES = {ExecutionStatus.FAILED, ExecutionStatus.CANCELLED, ExecutionStatus.TIMEOUT}
+
+
+def _now() -> datetime:
+    return datetime.now(ist).replace(tzinfo=None)
+
+
+def validate_graph(bot_ids: list, edges: list):
+    """
+    Check a pipeline graph: bot_ids are its nodes, edges are
+    (upstream bot_id, downstream bot_id) pairs. Raises ValueError unless it
+    is a DAG over those nodes.
+    """
+    if not bot_ids:
+        raise ValueError("A pipeline needs at least one bot")
+    if len(set(bot_ids)) != len(bot_ids):
+        raise ValueError("A bot can only appear once in a pipeline")
+
+    downstream = {bot_id: [] for bot_id in bot_ids}
+    incoming = {bot_id: 0 for bot_id in bot_ids}
+    for upstream_id, downstream_id in edges:
+        if upstream_id not in downstream or downstream_id not in downstream:
+            raise ValueError(f"Edge {upstream_id} -> {downstream_id} refers to a bot not in the pipeline")
+        if upstream_id == downstream_id:
+            raise ValueError(f"Bot {upstream_id} cannot depend on itself")
+        downstream[upstream_id].append(downstream_id)
+        incoming[downstream_id] += 1
+
+    # Kahn's algorithm: every node is reached only if there is no cycle
+    ready = [bot_id for bot_id, count in incoming.items() if count == 0]
+    reached = 0
+    while ready:
+        bot_id = ready.pop()
+        reached += 1
+        for child in downstream[bot_id]:
+            incoming[child] -= 1
+            if incoming[child] == 0:
+                ready.append(child)
+    if reached != len(bot_ids):
+        raise ValueError("Pipeline edges form a cycle")
+
+
+def root_node_ids(pipeline: Pipeline) -> set:
+    targets = {edge.downstream_node_id for edge in pipeline.edges}
+    return {node.node_id for node in pipeline.nodes if node.node_id not in targets}
+
+
+def _edge_holds(condition: EdgeCondition, status: ExecutionStatus) -> bool:
+    if condition == EdgeCondition.ALWAYS:
+        return True
+    if condition == EdgeCondition.FAILED:
+        return status in FAILED_STATUSES
+    return status == ExecutionStatus.SUCCESS
+
+
+def start_run(pipeline: Pipeline, user_id: int = None, schedule_id: int = None,
+              root_execution: BotExecution = None) -> tuple:
+    """
+    Start a run of `pipeline`. root_execution, a queued run of the trigger
+    schedule, becomes the run of its bot's node.
+
+    Returns (run, queued): queued lists (bot_id, execution_id, replaced)
+    for the executions queued, which the caller dispatches.
+    """
+    run = PipelineRun(
+        pipeline_id=pipeline.pipeline_id,
+        status=PipelineRunStatus.RUNNING,
+        triggered_by_user_id=user_id,
+        schedule_id=schedule_id,
+        started_at=root_execution.scheduled_at if root_execution else _now()
+    )
+    try:
+        db.session.add(run)
+        db.session.flush()
+        if root_execution is not None:
+            node = next((node for node in pipeline.nodes if node.bot_id == root_execution.bot_id), None)
+            if node is None or node.node_id not in root_node_ids(pipeline):
+                raise ValueError(f"Bot {root_execution.bot_id} is not a root of pipeline {pipeline.pipeline_id}")
+            db.session.execute(
+                update(BotExecution)
+                .where(BotExecution.execution_id == root_execution.execution_id, BotExecution.pipeline_run_id.is_(None))
+                .values(pipeline_run_id=run.run_id, pipeline_node_id=node.node_id)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Pipeline {pipeline.pipeline_id} run {run.run_id} started")
+    return run, advance_run(run.run_id)
+
+
+def advance_run(run_id: int) -> list:
+    """
+    Resolve the nodes of a run whose upstream runs have all ended, and end
+    the run once every node has. Returns (bot_id, execution_id, replaced)
+    for the executions queued.
+    """
+    run = db.session.get(PipelineRun, run_id)
+    if run is None or run.status != PipelineRunStatus.RUNNING:
+        return []
+    pipeline = run.pipeline
+    incoming = {node.node_id: [] for node in pipeline.nodes}
+    for edge in pipeline.edges:
+        incoming[edge.downstream_node_id].append(edge)
+
+    outcomes = {
+        row.pipeline_node_id: row for row in
+        db.session.query(BotExecution.pipeline_node_id, BotExecution.status, BotExecution.completed_at)
+        .filter(BotExecution.pipeline_run_id == run_id)
+        .all()
+    }
+
+    queued = []
+    progress = True
+    while progress:
+        progress = False
+        for node in pipeline.nodes:
+            if node.node_id in outcomes:
+                continue
+            upstream = [(edge, outcomes.get(edge.upstream_node_id)) for edge in incoming[node.node_id]]
+            if any(outcome is None or outcome.status not in FINAL_STATUSES for _, outcome in upstream):
+                continue
+
+            unmet = [
+                (edge, outcome) for edge, outcome in upstream
+                if not _edge_holds(edge.condition, outcome.status)
+            ]
+            try:
+                if unmet:
+                    execution = _skip_node(run, node, unmet)
+                else:
+                    execution, replaced = _queue_node(run, node)
+                    if execution is not None and execution.status == ExecutionStatus.PENDING:
+                        queued.append((node.bot_id, execution.execution_id, replaced))
+            except IntegrityError:
+                # Another worker is advancing this run; it resolves the rest
+                db.session.rollback()
+                return queued
+            if execution is None:
+                return queued
+            outcomes[node.node_id] = execution
+            progress = True
+
+    if len(outcomes) == len(pipeline.nodes) and all(o.status in FINAL_STATUSES for o in outcomes.values()):
+        _finish(run, outcomes.values())
+    return queued
+
+
+def _queue_node(run: PipelineRun, node: PipelineNode) -> tuple:
+    bot = db.session.get(Bot, node.bot_id)
+    if not bot.is_active:
+        return _skip(run, node, "Bot is inactive"), []
+    return enqueue_execution(
+        bot,
+        user_id=run.triggered_by_user_id,
+        priority=execution_priority(bot),
+        pipeline_run_id=run.run_id,
+        pipeline_node_id=node.node_id
+    )
+
+
+def _skip_node(run: PipelineRun, node: PipelineNode, unmet: list) -> BotExecution:
+    edge, outcome = unmet[0]
+    upstream_bot = db.session.get(PipelineNode, edge.upstream_node_id).bot
+    reason = f"Upstream {upstream_bot.bot_name} ended {outcome.status.value}, edge needs {edge.condition.value}"
+    return _skip(run, node, reason)
+
+
+def _skip(run: PipelineRun, node: PipelineNode, reason: str) -> BotExecution:
+    now = _now()
+    execution = BotExecution(
+        bot_id=node.bot_id,
+        triggered_by_user_id=run.triggered_by_user_id,
+        status=ExecutionStatus.SKIPPED,
+        scheduled_at=now,
+        completed_at=now,
+        status_reason=reason[:255],
+        pipeline_run_id=run.run_id,
+        pipeline_node_id=node.node_id
+    )
+    db.session.add(execution)
+    db.session.commit()
+    logger.info(f"Pipeline run {run.run_id}: bot {node.bot_id} skipped ({reason})")
+    return execution
+
+
+def _finish(run: PipelineRun, outcomes):
+    failed = any(outcome.status in FAILED_STATUSES for outcome in outcomes)
+    status = PipelineRunStatus.FAILED if failed else PipelineRunStatus.SUCCESS
+    completed_at = max((o.completed_at for o in outcomes if o.completed_at), default=None) or _now()
+    result = db.session.execute(
+        update(PipelineRun)
+        .where(PipelineRun.run_id == run.run_id, PipelineRun.status == PipelineRunStatus.RUNNING)
+        .values(status=status, completed_at=completed_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        logger.info(
+            f"Pipeline {run.pipeline_id} run {run.run_id} ended {status.value} "
+            f"in {(completed_at - run.started_at).total_seconds():.1f}s"
+        )
+
+
+def runs_of_executions(execution_ids) -> list:
+    """Running pipeline runs the given executions belong to"""
+    rows = (
+        db.session.query(BotExecution.pipeline_run_id)
+        .join(PipelineRun, PipelineRun.run_id == BotExecution.pipeline_run_id)
+        .filter(
+            BotExecution.execution_id.in_(list(execution_ids)),
+            PipelineRun.status == PipelineRunStatus.RUNNING
+        )
+        .distinct()
+        .all()
+    )
+    return [row.pipeline_run_id for row in rows]
+
+
+def running_runs() -> list:
+    return [
+        row.run_id for row in
+        db.session.query(PipelineRun.run_id).filter(PipelineRun.status == PipelineRunStatus.RUNNING).all()
+    ]
+
+
+def pipeline_for_schedule(schedule_id: int) -> Pipeline | None:
+    """The active pipeline the schedule's runs start, if any"""
+    return (
+        db.session.query(Pipeline)
+        .filter(Pipeline.trigger_schedule_id == schedule_id, Pipeline.is_active.is_(True))
+        .first()
+    )
+
+
+def run_summary(run: PipelineRun) -> dict:
+    """A run with its node executions and where the time went"""
+    executions = {e.pipeline_node_id: e for e in run.executions}
+    end = run.completed_at or _now()
+    nodes = []
+    for node in run.pipeline.nodes:
+        e = executions.get(node.node_id)
+        nodes.append({
+            'node_id': node.node_id,
+            'bot_id': node.bot_id,
+            'bot_name': node.bot.bot_name,
+            'execution_id': e.execution_id if e else None,
+            'status': e.status.value if e else 'WAITING',
+            'status_reason': e.status_reason if e else None,
+            'queued_at': e.scheduled_at.isoformat() if e and e.scheduled_at else None,
+            'started_at': e.started_at.isoformat() if e and e.started_at else None,
+            'completed_at': e.completed_at.isoformat() if e and e.completed_at else None,
+            # Time from queued (upstream done) to started: dispatch and launch latency
+            'wait_seconds': (e.started_at - e.scheduled_at).total_seconds()
+                if e and e.started_at and e.scheduled_at else None,
+            'run_seconds': (e.completed_at - e.started_at).total_seconds()
+                if e and e.started_at and e.completed_at else None
+        })
+
+    run_seconds = sum(node['run_seconds'] or 0 for node in nodes)
+    return {
+        'run_id': run.run_id,
+        'pipeline_id': run.pipeline_id,
+        'pipeline_name': run.pipeline.name,
+        'status': run.status.value,
+        'triggered_by': run.triggered_by_user.name if run.triggered_by_user else ('Scheduled' if run.schedule_id else None),
+        'started_at': run.started_at.isoformat(),
+        'completed_at': run.completed_at.isoformat() if run.completed_at else None,
+        'duration_seconds': (end - run.started_at).total_seconds(),
+        'bot_run_seconds': run_seconds,
+        'nodes': nodes,
+        'edges': [
+            {'from': edge.upstream.bot_id, 'to': edge.downstream.bot_id, 'condition': edge.condition.value}
+            for edge in run.pipeline.edges
+        ]
+    }
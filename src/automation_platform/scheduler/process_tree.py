@@ -0,0 +1,177 @@
+"""
+process_tree.py - Find and reap the processes an execution left behind
+
+Every bot runs in its own session (the launcher or the warm child is the
+session leader) and carries EXECUTION_MARKER_ENV in its environment, which
+its descendants inherit. A descendant that is still alive once the bot has
+exited - a chromedriver or browser a Selenium bot never quit - is a stray:
+it is found by its session id, or by the marker if it moved to a session
+of its own, and terminated with SIGTERM and, after a grace period, SIGKILL.
+
+Discovery reads /proc, so stray sweeping only happens on Linux; elsewhere
+kills still take down the bot's process group.
+"""
+
+from dataclasses import dataclass
+import asyncio, logging, os, signal, time
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MARKER_ENV = "AUTOMATION_PLATFORM_EXECUTION"
+
+DEFAULT_KILL_GRACE_SECONDS = 10
+
+PROC = "/proc"
+
+# How often a terminating group is checked for exit during the grace period
+GRACE_POLL_INTERVAL = 0.1
+
+
+def sweeping_supported() -> bool:
+    return os.path.isdir(PROC) and hasattr(os, "killpg")
+
+
+def execution_marker(worker_id: str, execution_id: int) -> str:
+    return f"{worker_id}:{execution_id}"
+
+
+def parse_marker(marker: str):
+    """(worker_id, execution_id) of a marker, or None"""
+    worker_id, _, execution_id = marker.rpartition(":")
+    try:
+        return worker_id, int(execution_id)
+    except ValueError:
+        return None
+
+
+@dataclass
+class ProcessInfo:
+    pid: int
+    session_id: int
+    rss_kb: int
+    marker: str | None
+
+
+def _read_process(pid: int) -> ProcessInfo | None:
+    """Session, resident memory and execution marker of one process; None if gone or a zombie"""
+    try:
+        with open(f"{PROC}/{pid}/stat", "rb") as f:
+            stat = f.read().decode(errors="replace")
+        # comm may contain spaces and parentheses; fields resume after the last ')'
+        fields = stat[stat.rindex(")") + 2:].split()
+        if fields[0] in ("Z", "X"):
+            return None
+        session_id = int(fields[3])
+        rss_kb = int(fields[21]) * (os.sysconf("SC_PAGE_SIZE") // 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+    marker = None
+    try:
+        with open(f"{PROC}/{pid}/environ", "rb") as f:
+            prefix = EXECUTION_MARKER_ENV.encode() + b"="
+            for entry in f.read().split(b"\0"):
+                if entry.startswith(prefix):
+                    marker = entry[len(prefix):].decode(errors="replace")
+                    break
+    except OSError:
+        pass  # not ours to read; only its session can identify it
+    return ProcessInfo(pid, session_id, rss_kb, marker)
+
+
+def list_processes() -> list:
+    """Every live process we can see, except this one"""
+    own = os.getpid()
+    processes = []
+    try:
+        entries = os.listdir(PROC)
+    except OSError:
+        return []
+    for entry in entries:
+        if entry.isdigit() and int(entry) != own:
+            info = _read_process(int(entry))
+            if info:
+                processes.append(info)
+    return processes
+
+
+def find_strays(session_id: int | None, marker: str) -> list:
+    """Live processes in the session `session_id` or carrying `marker`"""
+    if not sweeping_supported():
+        return []
+    return [
+        info for info in list_processes()
+        if info.marker == marker or (session_id is not None and info.session_id == session_id)
+    ]
+
+
+def find_worker_strays(worker_id: str, active_execution_ids) -> dict:
+    """
+    Processes marked by this worker for executions that are no longer
+    running, by execution id
+    """
+    if not sweeping_supported():
+        return {}
+    strays = {}
+    for info in list_processes():
+        parsed = parse_marker(info.marker) if info.marker else None
+        if parsed and parsed[0] == worker_id and parsed[1] not in active_execution_ids:
+            strays.setdefault(parsed[1], []).append(info)
+    return strays
+
+
+def find_workers_processes(worker_ids) -> dict:
+    """Live processes marked by any of the given workers, by execution id"""
+    if not sweeping_supported():
+        return {}
+    processes = {}
+    for info in list_processes():
+        parsed = parse_marker(info.marker) if info.marker else None
+        if parsed and parsed[0] in worker_ids:
+            processes.setdefault(parsed[1], []).append(info)
+    return processes
+
+
+def signal_group(pgid: int, signum: int) -> bool:
+    """Signal a whole process group; False if it no longer exists"""
+    try:
+        os.killpg(pgid, signum)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        logger.warning(f"Not permitted to signal process group {pgid}")
+        return False
+
+
+def _signal_processes(processes, signum: int):
+    for info in processes:
+        try:
+            os.kill(info.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _alive(processes) -> list:
+    alive = []
+    for info in processes:
+        current = _read_process(info.pid)
+        # A reused pid is not the process we signalled
+        if current and current.session_id == info.session_id:
+            alive.append(info)
+    return alive
+
+
+async def reap(processes, grace: float):
+    """SIGTERM the processes, SIGKILL whatever is left after `grace` seconds"""
+    if not processes:
+        return
+    loop = asyncio.get_running_loop()
+    _signal_processes(processes, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    remaining = processes
+    while remaining and time.monotonic() < deadline:
+        await asyncio.sleep(GRACE_POLL_INTERVAL)
+        remaining = await loop.run_in_executor(None, _alive, remaining)
+    if remaining:
+        _signal_processes(remaining, signal.SIGKILL)
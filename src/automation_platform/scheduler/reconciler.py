@@ -0,0 +1,152 @@
+"""
+reconciler.py - Keep scheduled jobs in line with BotSchedule rows
+
+Routes schedule a row right after committing it, but a row edited in SQL,
+a commit that failed after the job was changed or a crash in between
+leaves BotSchedule.is_active / cron_expression and the scheduler state
+(BotSchedule.next_run_at, see jobstore.py) disagreeing. The reconciler
+finds such rows and fixes only those:
+
+- added: active, but not scheduled
+- removed: inactive, but still scheduled
+- rescheduled: next_run_at is not a fire time of the current cron expression
+  (and jitter offset)
+- invalid: the cron expression does not parse or never fires; the row is
+  unscheduled
+
+Each pass only reads rows whose updated_at moved since the previous pass
+(indexed). The first pass after start-up, and every FULL_PASS_EVERY-th
+pass after it, reads every row instead, to catch edits that did not
+touch updated_at.
+"""
+
+from datetime import datetime, timedelta
+from threading import Lock
+import logging, pytz
+
+from sqlalchemy import func, select, update
+
+from automation_platform.database.database import db
+from automation_platform.database.models import BotSchedule, TriggerType
+from automation_platform.scheduler.jobstore import schedule_trigger
+from automation_platform.scheduler.smoothing import launch_smoother
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+# Rows committed shortly before a pass may carry an older updated_at
+WATERMARK_OVERLAP = timedelta(seconds=30)
+
+FULL_PASS_EVERY = 60
+
+ADDED = "added"
+REMOVED = "removed"
+RESCHEDULED = "rescheduled"
+INVALID = "invalid"
+
+schedules = BotSchedule.__table__
+
+
+def _expected_next_run(row, now):
+    """
+    The next_run_at the row should have: None if unscheduled (or fired by
+    events rather than cron), the current value if it is consistent, else a
+    new one. Raises ValueError for a cron expression that does not parse
+    or never fires.
+    """
+    if not row.is_active or row.trigger_type != TriggerType.CRON:
+        return None
+    trigger = launch_smoother.jittered(row.schedule_id, schedule_trigger(row.cron_expression))
+    if row.next_run_at is not None:
+        scheduled = ist.localize(row.next_run_at)
+        if trigger.get_next_fire_time(None, scheduled) == scheduled:
+            return row.next_run_at
+    next_run_at = trigger.get_next_fire_time(None, now)
+    if next_run_at is None:
+        raise ValueError(f"'{row.cron_expression}' never fires")
+    return next_run_at.replace(tzinfo=None)
+
+
+class ScheduleReconciler:
+    def __init__(self):
+        self._watermark = None  # database time the previous pass started
+        self._passes = 0
+        self._lock = Lock()
+        self.last_report = None
+
+    def reconcile(self, full: bool = False) -> dict:
+        """
+        Fix drifted schedules; returns the drift found. Must be called
+        inside an app context.
+        """
+        with self._lock:
+            full = full or self._watermark is None or self._passes % FULL_PASS_EVERY == 0
+            started = datetime.now(ist)
+            report = {ADDED: [], REMOVED: [], RESCHEDULED: [], INVALID: []}
+
+            with db.engine.begin() as connection:
+                db_now = connection.execute(select(func.now())).scalar()
+                query = select(
+                    schedules.c.schedule_id,
+                    schedules.c.trigger_type,
+                    schedules.c.cron_expression,
+                    schedules.c.is_active,
+                    schedules.c.next_run_at
+                )
+                if not full:
+                    query = query.where(schedules.c.updated_at >= self._watermark - WATERMARK_OVERLAP)
+                rows = connection.execute(query).all()
+
+                for row in rows:
+                    try:
+                        next_run_at = _expected_next_run(row, started)
+                        kind = (
+                            None if next_run_at == row.next_run_at
+                            else REMOVED if next_run_at is None
+                            else ADDED if row.next_run_at is None
+                            else RESCHEDULED
+                        )
+                    except ValueError as e:
+                        logger.error(f"Schedule {row.schedule_id} has an invalid cron expression: {e}")
+                        next_run_at, kind = None, INVALID if row.next_run_at is not None else None
+                    if kind is None:
+                        continue
+
+                    # Only if the scheduler has not moved the row on meanwhile
+                    result = connection.execute(
+                        update(schedules)
+                        .where(
+                            schedules.c.schedule_id == row.schedule_id,
+                            schedules.c.next_run_at.is_(None) if row.next_run_at is None
+                            else schedules.c.next_run_at == row.next_run_at
+                        )
+                        .values(next_run_at=next_run_at, updated_at=schedules.c.updated_at)
+                    )
+                    if result.rowcount:
+                        report[kind].append(row.schedule_id)
+
+            self._watermark = db_now
+            self._passes += 1
+
+            drift = sum(len(ids) for ids in report.values())
+            self.last_report = {
+                'at': started.isoformat(),
+                'full': full,
+                'rows_checked': len(rows),
+                'drift': drift,
+                **report
+            }
+            if drift:
+                logger.warning(
+                    f"Schedule reconciliation fixed {drift} of {len(rows)} schedules: "
+                    + ", ".join(f"{kind} {ids}" for kind, ids in report.items() if ids)
+                )
+            else:
+                logger.debug(f"Schedule reconciliation checked {len(rows)} schedules, no drift")
+            return self.last_report
+
+
+# -------------------
+# Global reconciler instance
+# -------------------
+schedule_reconciler = ScheduleReconciler()
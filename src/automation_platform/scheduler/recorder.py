@@ -0,0 +1,501 @@
+"""
+recorder.py - Write-behind recording of execution state transitions
+
+The RUNNING and final-status updates of an execution are queued in memory
+and written by a background thread as one executemany UPDATE per kind of
+transition, every flush interval or as soon as a batch fills up. A burst
+of bots starting and finishing together then costs a few transactions
+instead of two per bot.
+
+Transitions of the same execution are merged, so a run that starts and
+ends within one interval is written once. Durability:
+
+- stop() flushes everything still queued (called on scheduler shutdown)
+- record_*(..., sync=True) flushes before returning, for transitions that
+  must be on disk at once
+- a flush interval of 0 makes every transition synchronous
+- a failed flush is put back in the queue and retried; after
+  SPLIT_AFTER_ATTEMPTS failures its executions are written one at a time,
+  then without their usage, log segments and records. A transition still
+  failing after MAX_ATTEMPTS is dropped; for a final status the run is
+  marked FAILED instead ("Final status lost"), and if even that cannot
+  be written the run is left RUNNING and claimed by this worker (its
+  lease renewed) for an operator to settle. A finished run is never
+  released to lease recovery, which would queue it to run again.
+
+Must be started with the Flask app; until then transitions are written
+synchronously.
+"""
+
+from collections import OrderedDict, deque
+from datetime import datetime
+from threading import Condition, Lock, Thread
+import logging, time, pytz
+
+from sqlalchemy import bindparam, case, func, insert, literal, or_, update
+
+from automation_platform.database.database import db
+from automation_platform.database.models import (
+    BotExecution, BotExecutionEvent, BotExecutionLogSegment, BotExecutionMetric, BotExecutionUsage,
+    ExecutionStatus
+)
+from automation_platform.scheduler.execution_queue import WORKER_ID, release_local_claims
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds
+DEFAULT_BATCH_SIZE = 100
+
+# Flushes slower than this are logged
+SLOW_FLUSH_MS = 1000
+
+# Flush latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 256
+
+# Failed flushes of an execution before it is written on its own, and
+# before its transition is given up
+SPLIT_AFTER_ATTEMPTS = 3
+MAX_ATTEMPTS = 10
+
+# Rows written next to a final status; dropped if they keep it from being written
+AUXILIARY_VALUES = ('usage', 'log_segments', 'records')
+
+# status_reason of a run whose final status could not be written
+LOST_STATUS_REASON = "Final status lost"
+
+START = "start"
+FINISH = "finish"
+
+executions = BotExecution.__table__
+usages = BotExecutionUsage.__table__
+log_segments = BotExecutionLogSegment.__table__
+metrics = BotExecutionMetric.__table__
+events = BotExecutionEvent.__table__
+
+USAGE_FIELDS = [column.name for column in usages.columns if column.name != 'execution_id']
+
+
+class ExecutionRecorder:
+    def __init__(self):
+        self.app = None
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self._pending = OrderedDict()  # execution_id -> (kind, values)
+        self._cond = Condition()
+        self._flush_lock = Lock()
+        self._thread = None
+        self._stopping = False
+        self._listeners = []
+
+        self._attempts = {}  # execution_id -> failed flushes
+        self._flushes = 0
+        self._rows = 0
+        self._failures = 0
+        self._dropped = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._max_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, flush_interval: float = DEFAULT_FLUSH_INTERVAL, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Start the flush thread; flush_interval=0 keeps recording synchronous"""
+        self.app = app
+        self.flush_interval = flush_interval
+        self.batch_size = max(batch_size, 1)
+        if self.running or flush_interval <= 0:
+            return
+        self._stopping = False
+        self._thread = Thread(target=self._run, name="execution-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Execution recorder started (interval {flush_interval}s, batch {self.batch_size})")
+
+    def stop(self):
+        """Stop the flush thread after writing everything still queued"""
+        was_running = self.running
+        if was_running:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join()
+            self._thread = None
+        if self.app:
+            self.flush()
+        if was_running:
+            logger.info("Execution recorder stopped")
+
+    def add_flush_listener(self, listener):
+        """listener(finished_ids) is called after final statuses are written"""
+        self._listeners.append(listener)
+
+    # -------------------
+    # Recording
+    # -------------------
+    def record_started(self, execution_id: int, started_at: datetime, admission_delay_ms: int = None,
+                       sync: bool = False):
+        """The bot process was handed to the supervisor, admission_delay_ms after it was due"""
+        values = {'status': ExecutionStatus.RUNNING, 'started_at': started_at}
+        if admission_delay_ms is not None:
+            values['admission_delay_ms'] = admission_delay_ms
+        self._record(execution_id, START, values, sync)
+
+    def record_finished(self, execution_id: int, status: ExecutionStatus,
+                        started_at: datetime = None, warm_start_saved_ms: int = None,
+                        usage: dict = None, reclaimed: dict = None, log_segments: list = None,
+                        records: dict = None, sync: bool = False):
+        """
+        Final status of an execution this worker owns. started_at, when
+        given, is when the process actually started; usage is the
+        process's resource usage, reclaimed the stray_processes /
+        reclaimed_rss_kb of the stray sweep, log_segments where its
+        output went (BotOutputCapture.segments()) and records the metrics
+        and events it printed (BotOutputCapture.records()). The lease is
+        kept (and renewed) until the status is written.
+        """
+        values = {'status': status, 'completed_at': datetime.now(ist)}
+        if started_at:
+            values['started_at'] = started_at
+        if warm_start_saved_ms is not None:
+            values['warm_start_saved_ms'] = warm_start_saved_ms
+        if usage:
+            values['usage'] = usage
+        if log_segments:
+            values['log_segments'] = log_segments
+        if records:
+            values['records'] = records
+            if records['malformed'] or records['dropped']:
+                logger.warning(
+                    f"Execution {execution_id}: ignored {records['malformed']} malformed and "
+                    f"{records['dropped']} excess metric/event line(s)"
+                )
+        if reclaimed:
+            values.update(reclaimed)
+        self._record(execution_id, FINISH, values, sync)
+
+    def _record(self, execution_id, kind, values, sync):
+        with self._cond:
+            self._merge(execution_id, kind, values)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        if sync or not self.running:
+            self.flush()
+
+    def _merge(self, execution_id, kind, values):
+        """Queue a transition on top of any not yet written for the same execution"""
+        previous = self._pending.pop(execution_id, None)
+        if previous:
+            previous_kind, previous_values = previous
+            kind = FINISH if FINISH in (kind, previous_kind) else START
+            values = {**previous_values, **values}
+        self._pending[execution_id] = (kind, values)
+
+    # -------------------
+    # Flushing
+    # -------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued transitions; returns the number of executions written"""
+        with self._flush_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = OrderedDict()
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    lost = self._write(batch)
+                for execution_id in batch:
+                    self._attempts.pop(execution_id, None)
+            except Exception as e:
+                self._failures += 1
+                batch, lost = self._write_failed(batch, e)
+                if not batch:
+                    return 0
+
+            latency = (time.perf_counter() - started) * 1000
+            self._flushes += 1
+            self._rows += len(batch)
+            self._latencies.append(latency)
+            self._max_latency = max(self._max_latency, latency)
+            if latency > SLOW_FLUSH_MS:
+                logger.warning(f"Slow execution flush: {len(batch)} transitions in {latency:.0f}ms")
+
+            finished = [execution_id for execution_id, (kind, _) in batch.items() if kind == FINISH]
+            release_local_claims(finished)
+            for execution_id in lost:
+                logger.warning(f"Execution {execution_id} lease was lost before completion")
+
+        if finished:
+            for listener in self._listeners:
+                try:
+                    listener(finished)
+                except Exception as e:
+                    logger.error(f"Error in execution flush listener: {e}", exc_info=True)
+        return len(batch)
+
+    def _write_failed(self, batch, error):
+        """
+        After a failed flush: queue the batch again, or once it has failed
+        SPLIT_AFTER_ATTEMPTS times, write its executions one at a time so a
+        bad row only holds up its own. Returns (written, lost).
+        """
+        for execution_id in batch:
+            self._attempts[execution_id] = self._attempts.get(execution_id, 0) + 1
+        if max(self._attempts[execution_id] for execution_id in batch) < SPLIT_AFTER_ATTEMPTS:
+            logger.error(f"Error flushing {len(batch)} execution transitions, will retry: {error}", exc_info=True)
+            self._requeue(batch)
+            return OrderedDict(), set()
+
+        logger.error(f"Error flushing {len(batch)} execution transitions, writing them one by one: {error}", exc_info=True)
+        written, lost, retry = OrderedDict(), set(), OrderedDict()
+        with self.app.app_context():
+            for execution_id, (kind, values) in batch.items():
+                bare = {key: value for key, value in values.items() if key not in AUXILIARY_VALUES}
+                try:
+                    try:
+                        lost |= self._write({execution_id: (kind, values)})
+                    except Exception as e:
+                        if bare == values:
+                            raise
+                        lost |= self._write({execution_id: (kind, bare)})
+                        logger.error(
+                            f"Execution {execution_id}: wrote its status without its usage, "
+                            f"log segments and records, which failed: {e}"
+                        )
+                except Exception as e:
+                    attempts = self._attempts[execution_id]
+                    if attempts < MAX_ATTEMPTS:
+                        retry[execution_id] = (kind, values)
+                        continue
+                    logger.error(f"Execution {execution_id}: dropped its {kind} transition after {attempts} failed writes: {e}")
+                    self._attempts.pop(execution_id, None)
+                    self._dropped += 1
+                    if kind == FINISH and self._write_lost(execution_id, values):
+                        written[execution_id] = (kind, values)
+                    continue
+                written[execution_id] = (kind, values)
+                self._attempts.pop(execution_id, None)
+        self._requeue(retry)
+        return written, lost
+
+    def _write_lost(self, execution_id, values) -> bool:
+        """
+        The run ended but its final status cannot be written: mark it
+        FAILED with nothing else. Returns False, leaving the run claimed,
+        if that fails too.
+        """
+        try:
+            db.session.execute(
+                update(executions)
+                .where(
+                    executions.c.execution_id == execution_id,
+                    executions.c.claimed_by == WORKER_ID
+                )
+                .values(
+                    status=case(
+                        (executions.c.status == ExecutionStatus.CANCELLED, executions.c.status),
+                        else_=literal(ExecutionStatus.FAILED, executions.c.status.type)
+                    ),
+                    status_reason=LOST_STATUS_REASON,
+                    completed_at=values['completed_at'],
+                    lease_expires_at=None
+                )
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Still tracked, so its lease is renewed: never reclaimed and run again
+            logger.critical(
+                f"Execution {execution_id} finished but no status could be written ({e}); "
+                f"left RUNNING and claimed by {WORKER_ID} for an operator to settle"
+            )
+            return False
+        logger.error(f"Execution {execution_id}: marked FAILED, its final status ({values['status'].value}) was lost")
+        return True
+
+    def _requeue(self, batch):
+        """Put unwritten transitions back, under any queued since"""
+        if not batch:
+            return
+        with self._cond:
+            pending = self._pending
+            self._pending = OrderedDict(batch)
+            for execution_id, (kind, values) in pending.items():
+                self._merge(execution_id, kind, values)
+
+    def _write(self, batch) -> set:
+        """
+        One executemany UPDATE per transition kind and one INSERT each of
+        the resource usage and log segment rows; returns ids whose lease
+        was lost
+        """
+        starts = [
+            {
+                'b_id': execution_id,
+                'b_started_at': values['started_at'],
+                'b_admission_delay_ms': values.get('admission_delay_ms')
+            }
+            for execution_id, (kind, values) in batch.items() if kind == START
+        ]
+        finishes = [
+            {
+                'b_id': execution_id,
+                'b_status': values['status'],
+                'b_started_at': values.get('started_at'),
+                'b_completed_at': values['completed_at'],
+                'b_warm_start_saved_ms': values.get('warm_start_saved_ms'),
+                'b_admission_delay_ms': values.get('admission_delay_ms'),
+                'b_stray_processes': values.get('stray_processes'),
+                'b_reclaimed_rss_kb': values.get('reclaimed_rss_kb')
+            }
+            for execution_id, (kind, values) in batch.items() if kind == FINISH
+        ]
+
+        try:
+            if starts:
+                # A start never overwrites a cancellation that got there first
+                db.session.execute(
+                    update(executions)
+                    .where(
+                        executions.c.execution_id == bindparam('b_id'),
+                        executions.c.claimed_by == WORKER_ID,
+                        executions.c.status == ExecutionStatus.PENDING
+                    )
+                    .values(
+                        status=ExecutionStatus.RUNNING,
+                        started_at=bindparam('b_started_at'),
+                        admission_delay_ms=bindparam('b_admission_delay_ms')
+                    ),
+                    starts
+                )
+            if finishes:
+                # A kill or REPLACE that cancelled the run while it was ending keeps its CANCELLED
+                db.session.execute(
+                    update(executions)
+                    .where(
+                        executions.c.execution_id == bindparam('b_id'),
+                        executions.c.claimed_by == WORKER_ID
+                    )
+                    .values(
+                        status=case(
+                            (executions.c.status == ExecutionStatus.CANCELLED, executions.c.status),
+                            else_=bindparam('b_status', type_=executions.c.status.type)
+                        ),
+                        started_at=func.coalesce(
+                            bindparam('b_started_at', type_=executions.c.started_at.type),
+                            executions.c.started_at
+                        ),
+                        completed_at=bindparam('b_completed_at'),
+                        warm_start_saved_ms=bindparam('b_warm_start_saved_ms'),
+                        admission_delay_ms=func.coalesce(
+                            bindparam('b_admission_delay_ms', type_=executions.c.admission_delay_ms.type),
+                            executions.c.admission_delay_ms
+                        ),
+                        stray_processes=bindparam('b_stray_processes'),
+                        reclaimed_rss_kb=bindparam('b_reclaimed_rss_kb'),
+                        lease_expires_at=None
+                    ),
+                    finishes
+                )
+            lost = set()
+            if finishes:
+                finished_ids = [row['b_id'] for row in finishes]
+                lost = {
+                    row.execution_id for row in
+                    db.session.query(BotExecution.execution_id)
+                    .filter(
+                        BotExecution.execution_id.in_(finished_ids),
+                        or_(BotExecution.claimed_by != WORKER_ID, BotExecution.claimed_by.is_(None))
+                    )
+                    .all()
+                }
+
+            usage_rows = [
+                {'execution_id': execution_id, **{field: values['usage'].get(field, 0) for field in USAGE_FIELDS}}
+                for execution_id, (kind, values) in batch.items()
+                if kind == FINISH and values.get('usage') and execution_id not in lost
+            ]
+            if usage_rows:
+                db.session.execute(insert(usages), usage_rows)
+
+            segment_rows = [
+                {'execution_id': execution_id, 'seq': seq, **segment}
+                for execution_id, (kind, values) in batch.items()
+                if kind == FINISH and execution_id not in lost
+                for seq, segment in enumerate(values.get('log_segments') or ())
+            ]
+            if segment_rows:
+                db.session.execute(insert(log_segments), segment_rows)
+
+            records = {
+                execution_id: values['records']
+                for execution_id, (kind, values) in batch.items()
+                if kind == FINISH and values.get('records') and execution_id not in lost
+            }
+            metric_rows = [
+                {'execution_id': execution_id, 'name': name, **metric}
+                for execution_id, emitted in records.items()
+                for name, metric in emitted['metrics'].items()
+            ]
+            if metric_rows:
+                db.session.execute(insert(metrics), metric_rows)
+            event_rows = [
+                {'execution_id': execution_id, **event}
+                for execution_id, emitted in records.items()
+                for event in emitted['events']
+            ]
+            if event_rows:
+                db.session.execute(insert(events), event_rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return lost
+
+    # -------------------
+    # Metrics
+    # -------------------
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._pending)
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            'running': self.running,
+            'flush_interval': self.flush_interval,
+            'batch_size': self.batch_size,
+            'queued': queued,
+            'flushes': self._flushes,
+            'rows_flushed': self._rows,
+            'failed_flushes': self._failures,
+            'dropped_transitions': self._dropped,
+            'flush_latency_ms': {
+                'last': round(self._latencies[-1], 2) if self._latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(self._max_latency, 2)
+            }
+        }
+
+
+# -------------------
+# Global recorder instance
+# -------------------
+execution_recorder = ExecutionRecorder()
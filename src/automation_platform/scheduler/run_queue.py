@@ -0,0 +1,118 @@
+"""
+run_queue.py - In-process hand-off of "Run now" requests
+
+A manual run is queued as a PENDING BotExecution row, the only durable
+record of it; the web request then only has to get the dispatcher going.
+That hand-off is an in-memory queue served by a couple of threads, not a
+scheduler job: no job object, job store or scheduler wake-up per click,
+and a REPLACE run waiting for the run it supersedes to die does not hold
+up other requests for long.
+
+Nothing here has to survive a crash: a PENDING row whose hand-off was
+lost is picked up by the next queue poll, or by start-up recovery.
+"""
+
+from queue import Empty, SimpleQueue
+from threading import Lock, Thread
+import logging, time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+# Tells a thread to exit
+_STOP = object()
+
+
+class RunQueue:
+    def __init__(self):
+        self._queue = SimpleQueue()
+        self._threads = []
+        self._handler = None
+        self._lock = Lock()
+
+        self._submitted = 0
+        self._handled = 0
+        self._errors = 0
+        self._max_wait_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, handler, workers: int = DEFAULT_WORKERS):
+        """Serve queued runs with handler(*args) on `workers` threads"""
+        if self.running:
+            return
+        self._handler = handler
+        self._threads = [
+            Thread(target=self._run, name=f"run-now-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Run queue started ({len(self._threads)} threads)")
+
+    def stop(self, timeout: float = 5):
+        """Stop the threads; runs still queued stay PENDING in the database"""
+        if not self.running:
+            return
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        # Anything left is picked up from the execution queue by the next worker
+        dropped = 0
+        try:
+            while True:
+                if self._queue.get_nowait() is not _STOP:
+                    dropped += 1
+        except Empty:
+            pass
+        if dropped:
+            logger.info(f"Run queue stopped with {dropped} runs left to the execution queue")
+        logger.info("Run queue stopped")
+
+    def submit(self, *args) -> bool:
+        """Queue a run for the handler; False if the queue is not running"""
+        if not self.running:
+            return False
+        with self._lock:
+            self._submitted += 1
+        self._queue.put((time.perf_counter(), args))
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            queued_at, args = item
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            try:
+                self._handler(*args)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                logger.error(f"Error handing off run {args}: {e}", exc_info=True)
+            with self._lock:
+                self._handled += 1
+                self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'queued': self._queue.qsize(),
+                'submitted': self._submitted,
+                'handled': self._handled,
+                'errors': self._errors,
+                'max_wait_ms': round(self._max_wait_ms, 2)
+            }
+
+
+# -------------------
+# Global run queue instance
+# -------------------
+run_queue = RunQueue()
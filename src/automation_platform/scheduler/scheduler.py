@@ -1,16 +1,34 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
-from threading import Lock
-from datetime import datetime
+from threading import Event, Lock
+from datetime import datetime, timedelta
 from pathlib import Path
-import subprocess, logging, atexit, os, pytz
-from collections import defaultdict
+import logging, atexit, os, pytz
 
 from automation_platform.database.database import db
-from automation_platform.database.models import Bot, BotSchedule, BotExecution, ExecutionStatus
+from automation_platform.database.models import Bot, BotSchedule, BotExecution, ExecutionStatus, Pipeline, TriggerType
+from automation_platform.scheduler.supervisor import bot_supervisor
+from automation_platform.bot_logs.rotation import policy_for
+from automation_platform.bot_logs.search import log_indexer
+from automation_platform.bot_logs.writer import log_writer
+from automation_platform.scheduler.execution_queue import (
+    DEFAULT_LEASE_SECONDS, enqueue_execution, enqueue_event, release_claim, cancel_execution, cancel_orphaned_executions, renew_leases,
+    reclaim_expired_leases, get_local_claims, dead_local_workers, requeue_worker_executions
+)
+from automation_platform.scheduler.dispatch import dispatch_next, execution_priority
+from automation_platform.scheduler.recorder import execution_recorder
+from automation_platform.scheduler.jobstore import (
+    ERROR, MISSED, NOT_QUEUED, BotScheduleJobStore, parse_job_id, schedule_job_id, schedule_trigger
+)
+from automation_platform.scheduler.reconciler import schedule_reconciler
+from automation_platform.scheduler.smoothing import launch_smoother
+from automation_platform.scheduler.run_queue import run_queue
+from automation_platform.scheduler.file_watch import file_watcher
+from automation_platform.scheduler.pipelines import (
+    advance_run, pipeline_for_schedule, running_runs, runs_of_executions, start_run
+)
 
 logger = logging.getLogger(__name__)
 ist = pytz.timezone("Asia/Kolkata")
@@ -23,13 +41,13 @@ bot_locks_lock = Lock()  # Lock for the locks dictionary itself
 killed_bots = set()
 killed_bots_lock = Lock()
 
-# Track running processes to allow kill/stop
-running_processes = {}
-running_processes_lock = Lock()
-
-# Lock for log file writes
-log_file_locks = defaultdict(Lock)
+# Track running executions to allow kill/stop
+running_executions = {}  # bot_id -> execution_id handed to the supervisor
+running_executions_lock = Lock()
 
+# One dispatch round at a time per process; requests made meanwhile re-run it
+dispatch_lock = Lock()
+dispatch_requested = Event()
 
 def _get_bot_lock(bot_id: int) -> Lock:
     """Thread-safe way to get or create a lock for a bot"""
@@ -57,37 +75,40 @@ def _is_bot_killed(bot_id: int) -> bool:
         return bot_id in killed_bots
 
 
-def _add_running_process(bot_id: int, process):
-    """Thread-safe way to track a running process"""
-    with running_processes_lock:
-        running_processes[bot_id] = process
+def _add_running_execution(bot_id: int, execution_id: int):
+    """Thread-safe way to track a running execution"""
+    with running_executions_lock:
+        running_executions[bot_id] = execution_id
 
 
-def _remove_running_process(bot_id: int):
-    """Thread-safe way to remove a running process"""
-    with running_processes_lock:
-        running_processes.pop(bot_id, None)
+def _remove_running_execution(bot_id: int):
+    """Thread-safe way to remove a running execution"""
+    with running_executions_lock:
+        running_executions.pop(bot_id, None)
 
 
-def _get_running_process(bot_id: int):
-    """Thread-safe way to get a running process"""
-    with running_processes_lock:
-        return running_processes.get(bot_id)
+def _get_running_execution(bot_id: int):
+    """Thread-safe way to get the execution a bot is running"""
+    with running_executions_lock:
+        return running_executions.get(bot_id)
 
 
 # -------------------
 # Module-level function for job execution
 # -------------------
-def _execute_bot_wrapper(bot_id: int, schedule_id: int = None, execution_id: int = None):
-    """Module-level wrapper callable by APScheduler (safe for serialization)"""
-    app = scheduler_service.app
-    lock = _get_bot_lock(bot_id)
-    execution = None
+def _execute_bot_wrapper(bot_id: int, schedule_id: int = None, next_run_at: datetime = None):
+    """
+    Module-level wrapper callable by APScheduler (safe for serialization).
 
-    # Try to acquire lock - skip if already running
-    if not lock.acquire(blocking=False):
-        logger.warning(f"Bot {bot_id} is already running. Skipping this execution.")
-        return
+    next_run_at is the fire time the job store read for this firing (see
+    jobstore.py). Scheduled runs enqueue an execution for its slot with the
+    schedule's priority; the bot's overlap policy decides what happens if it
+    is still busy. The dispatcher then decides, across all queued work, what
+    runs next.
+
+    Returns the queued (or skipped) execution id, None if nothing was queued.
+    """
+    app = scheduler_service.app
 
     try:
         with app.app_context():
@@ -96,165 +117,368 @@ def _execute_bot_wrapper(bot_id: int, schedule_id: int = None, execution_id: int
             if not bot:
                 logger.error(f"Bot {bot_id} not found")
                 return
-            
+
             if not bot.is_active:
                 logger.error(f"Bot {bot_id} is inactive")
                 return
 
-            # Create or get execution record
-            if execution_id:
-                execution = db.session.get(BotExecution, execution_id)
-                if not execution:
-                    logger.error(f"Execution {execution_id} not found")
-                    return
-            else:
-                execution = BotExecution(
-                    bot_id=bot_id,
-                    schedule_id=schedule_id,
-                    status=ExecutionStatus.PENDING,
-                    scheduled_at=datetime.now(ist)
+            schedule = db.session.get(BotSchedule, schedule_id) if schedule_id else None
+
+            # The slot is the cron time being fired (next_run_at less the
+            # schedule's jitter), not when the job got to run: workers firing
+            # the same tick get the same slot however late they are
+            fire_time = next_run_at or datetime.now(ist)
+            slot = (fire_time - timedelta(seconds=launch_smoother.offset(schedule_id))).replace(second=0, microsecond=0)
+            execution, replaced = enqueue_execution(
+                bot,
+                schedule_id=schedule_id,
+                scheduled_at=slot,
+                schedule_slot=slot,
+                priority=execution_priority(bot, schedule)
+            )
+            if not execution:
+                return
+            if execution.status == ExecutionStatus.SKIPPED:
+                return execution.execution_id
+            execution_id = execution.execution_id
+            nodes = _start_schedule_pipeline(schedule_id, execution)
+
+    except Exception as e:
+        logger.error(f"Error queueing bot {bot_id}: {e}", exc_info=True)
+        return
+
+    _replace_for_nodes(nodes)
+    _start_queued(bot_id, execution_id, replaced)
+    return execution_id
+
+
+def _start_queued(bot_id: int, execution_id: int, replaced: list):
+    """Stop the runs a REPLACE execution supersedes, then dispatch"""
+    if replaced:
+        _replace_executions(bot_id, replaced, execution_id)
+    _dispatch_pending()
+
+
+def _start_schedule_pipeline(schedule_id: int, execution: BotExecution) -> list:
+    """
+    Start the pipeline this schedule triggers, if any, with `execution` as
+    its root run. Returns the other pipeline nodes queued. Needs an app context.
+    """
+    if schedule_id is None:
+        return []
+    try:
+        pipeline = pipeline_for_schedule(schedule_id)
+        if pipeline is None:
+            return []
+        _, queued = start_run(pipeline, schedule_id=schedule_id, root_execution=execution)
+        return queued
+    except Exception as e:
+        logger.error(f"Error starting pipeline of schedule {schedule_id}: {e}", exc_info=True)
+        return []
+
+
+def _advance_pipelines(execution_ids=None) -> list:
+    """
+    Queue the pipeline nodes whose upstream runs have ended: of the runs
+    the given executions belong to, or of every running pipeline run.
+    The caller dispatches them.
+    """
+    queued = []
+    try:
+        with scheduler_service.app.app_context():
+            run_ids = running_runs() if execution_ids is None else runs_of_executions(execution_ids)
+            for run_id in run_ids:
+                queued += advance_run(run_id)
+    except Exception as e:
+        logger.error(f"Error advancing pipeline runs: {e}", exc_info=True)
+    _replace_for_nodes(queued)
+    return queued
+
+
+def _replace_for_nodes(queued: list):
+    """Stop the runs that queued pipeline nodes supersede (REPLACE bots)"""
+    for bot_id, execution_id, replaced in queued:
+        if replaced:
+            _replace_executions(bot_id, replaced, execution_id)
+
+
+def _replace_executions(bot_id: int, execution_ids: list, replacement_id: int):
+    """
+    Cancel executions superseded by a REPLACE run. Local processes are killed
+    here; a worker running one elsewhere kills it on its next poll.
+    """
+    reason = f"Replaced by execution {replacement_id}"
+    for execution_id in execution_ids:
+        try:
+            with scheduler_service.app.app_context():
+                cancel_execution(execution_id, reason)
+
+            if _get_running_execution(bot_id) == execution_id:
+                _add_killed_bot(bot_id)
+                if not bot_supervisor.kill(execution_id):
+                    logger.warning(f"Execution {execution_id} did not terminate gracefully")
+            logger.info(f"Execution {execution_id} of bot {bot_id} cancelled: {reason}")
+        except Exception as e:
+            logger.error(f"Error replacing execution {execution_id}: {e}", exc_info=True)
+
+
+def _dispatch_pending():
+    """
+    Claim queued executions in dispatch order, up to the free supervisor
+    capacity, and start them. Safe to call from any thread: if a round is
+    already running it is repeated instead of run concurrently.
+    """
+    dispatch_requested.set()
+    while dispatch_requested.is_set():
+        if not dispatch_lock.acquire(blocking=False):
+            return  # the running round picks up this request
+        try:
+            dispatch_requested.clear()
+            _dispatch_round()
+        finally:
+            dispatch_lock.release()
+
+
+def _dispatch_round():
+    app = scheduler_service.app
+    if not scheduler_service.accepting:
+        return  # shutting down
+    try:
+        with app.app_context():
+            capacity = bot_supervisor.max_concurrency - len(get_local_claims())
+            # The launch rate limits claims to the runs that can start shortly
+            launchable = launch_smoother.launch_capacity(capacity)
+            claimed = dispatch_next(launchable, _lease_seconds())
+            for execution_id in claimed:
+                delay = launch_smoother.reserve()
+                scheduler_service.scheduler.add_job(
+                    _run_claimed_execution,
+                    trigger='date',
+                    run_date=datetime.now(ist) + timedelta(seconds=delay),
+                    args=[execution_id, delay],
+                    id=f"queued_{execution_id}",
+                    name=f"Queued execution {execution_id}",
+                    jobstore='internal',
+                    replace_existing=True
+                )
+                logger.info(f"Dispatched queued execution {execution_id}" + (f" (launch in {delay:.2f}s)" if delay else ""))
+
+            # Throttled: come back for the rest when the bucket has room again
+            if launchable < capacity and len(claimed) == launchable:
+                scheduler_service.scheduler.add_job(
+                    _dispatch_pending,
+                    trigger='date',
+                    run_date=datetime.now(ist) + timedelta(seconds=launch_smoother.next_launch_in()),
+                    id='launch_throttle',
+                    name='Throttled dispatch',
+                    jobstore='internal',
+                    replace_existing=True
                 )
-                db.session.add(execution)
-                db.session.commit()
-
-            # Update to RUNNING
-            execution.status = ExecutionStatus.RUNNING
-            execution.started_at = datetime.now(ist)
-            db.session.commit()
-            logger.info(f"Starting execution {execution.execution_id} for bot {bot_id}")
-
-            # Run the bot script
-            result = _run_bot_script(bot, app)
-
-            # Check if bot was killed manually (highest priority)
-            if _is_bot_killed(bot_id):
-                execution.status = ExecutionStatus.CANCELLED
-                _remove_killed_bot(bot_id)
-                execution.completed_at = datetime.now(ist)
-                db.session.commit()
-                logger.info(f"Execution {execution.execution_id} cancelled manually")
+
+    except Exception as e:
+        logger.error(f"Error dispatching queued executions: {e}", exc_info=True)
+
+
+def _run_claimed_execution(execution_id: int, launch_delay: float = 0.0):
+    """
+    Start an execution this worker has claimed from the queue.
+    Returns as soon as the bot is handed to the supervisor;
+    _complete_execution records the outcome when the process exits.
+    launch_delay is how long the launch rate held it back.
+    """
+    app = scheduler_service.app
+    bot_id = None
+    lock = None
+
+    try:
+        with app.app_context():
+            execution = db.session.get(BotExecution, execution_id)
+            if not execution:
+                logger.error(f"Execution {execution_id} not found")
                 return
+            bot_id = execution.bot_id
 
-            # Normal status handling
-            if result['success']:
-                execution.status = ExecutionStatus.SUCCESS
-            elif result.get('timeout'):
-                execution.status = ExecutionStatus.TIMEOUT
-            else:
-                execution.status = ExecutionStatus.FAILED
+            # Cancelled (e.g. replaced) between claim and start
+            if execution.status != ExecutionStatus.PENDING:
+                logger.info(f"Execution {execution_id} is {execution.status.value}, not starting it")
+                release_claim(execution_id)
+                return
+
+            # Local guard on top of the queue claim
+            lock = _get_bot_lock(bot_id)
+            if not lock.acquire(blocking=False):
+                lock = None
+                logger.warning(f"Bot {bot_id} is already running. Returning execution {execution_id} to the queue.")
+                release_claim(execution_id)
+                return
+
+            # The bot may have been removed or deactivated while queued
+            bot = db.session.get(Bot, bot_id)
+            if not bot or not bot.is_active:
+                logger.error(f"Bot {bot_id} not found or inactive, cancelling execution {execution_id}")
+                execution_recorder.record_finished(execution_id, ExecutionStatus.CANCELLED)
+                lock.release()
+                return
+
+            command = _build_bot_command(bot)
+            if command.get('error'):
+                logger.error(f"Execution {execution_id} for bot {bot_id} cannot start: {command['error']}")
+                execution_recorder.record_finished(execution_id, ExecutionStatus.FAILED)
+                lock.release()
+                return
+
+            # Update to RUNNING (written behind by the recorder)
+            execution_recorder.record_started(
+                execution_id, datetime.now(ist),
+                admission_delay_ms=_admission_delay_ms(execution, launch_delay)
+            )
+            logger.info(f"Starting execution {execution_id} for bot {bot_id}")
 
-            execution.completed_at = datetime.now(ist)
-            db.session.commit()
-            logger.info(f"Execution {execution.execution_id} completed with status {execution.status.value}")
+            # Hand the bot to the supervisor
+            _add_running_execution(bot_id, execution_id)
+            held_lock = lock
+            bot_supervisor.submit(
+                execution_id,
+                command['cmd'],
+                command['cwd'],
+                log_file_path=bot.log_file_path,
+                timeout=app.config.get('BOT_EXECUTION_TIMEOUT'),
+                on_done=lambda result: _complete_execution(bot_id, execution_id, held_lock, result),
+                warm_python=command.get('python'),
+                log_policy=policy_for(bot, app.config['BOT_LOG_ROTATION'])
+            )
+            lock = None  # released by _complete_execution
 
     except Exception as e:
         logger.error(f"Error executing bot {bot_id}: {e}", exc_info=True)
-        
-        # Update execution status on error
-        if execution:
-            try:
-                with app.app_context():
-                    # Refresh the execution object in this context
-                    execution = db.session.get(BotExecution, execution.execution_id)
-                    if execution:
-                        # Check if killed during error handling
-                        if _is_bot_killed(bot_id):
-                            execution.status = ExecutionStatus.CANCELLED
-                            _remove_killed_bot(bot_id)
-                        else:
-                            execution.status = ExecutionStatus.FAILED
-                        
-                        execution.completed_at = datetime.now(ist)
-                        db.session.commit()
-            except Exception as db_error:
-                logger.error(f"Failed to update execution status: {db_error}", exc_info=True)
-    
-    finally:
-        # Always release the lock
-        lock.release()
+        if bot_id is not None:
+            _remove_running_execution(bot_id)
+        _record_failure(app, bot_id, execution_id)
+        if lock:
+            lock.release()
 
 
-# -------------------
-# Bot script runner
-# -------------------
-def _run_bot_script(bot: Bot, app):
-    """Execute the bot script and return results"""
-    bot_id = bot.bot_id
-    process = None
-    
+def _admission_delay_ms(execution: BotExecution, launch_delay: float) -> int | None:
+    """Delay launch smoothing added to a run: its schedule's jitter plus the launch wait"""
+    if not (launch_smoother.jitter_max or launch_smoother.rate):
+        return None
+    jitter = launch_smoother.offset(execution.schedule_id) if execution.triggered_by_user_id is None else 0
+    return round((jitter + launch_delay) * 1000)
+
+
+def _complete_execution(bot_id: int, execution_id: int, lock: Lock, result: dict):
+    """
+    Supervisor callback: record the outcome of a finished bot process.
+    The next queued run is dispatched once the recorder has written it.
+    """
+    app = scheduler_service.app
+    _remove_running_execution(bot_id)
+
+    # Check if bot was killed manually (highest priority)
+    killed = _is_bot_killed(bot_id)
+    if killed:
+        _remove_killed_bot(bot_id)
+
+    # The process is gone, so the bot is free for its next run
+    lock.release()
+
     try:
-        if not bot.script_path:
-            return {'success': False, 'error': "Bot script path not configured"}
-
-        script_path = Path(bot.script_path).resolve()
-        if not script_path.exists() or not script_path.is_file():
-            return {'success': False, 'error': f"Script not found or invalid: {script_path}"}
-
-        # Determine command based on file extension
-        ext = script_path.suffix.lower()
-        if ext == ".py":
-            python_path = getattr(bot, 'venv_path', None)
-            if python_path:
-                python_executable = Path(python_path).resolve()
-                if not python_executable.exists():
-                    return {'success': False, 'error': f"Python executable not found: {python_executable}"}
-                cmd = [str(python_executable), str(script_path)]
-            else:
-                cmd = ['python', str(script_path)]
-        elif ext == ".exe":
-            cmd = [str(script_path)]
-        elif ext == ".sh":
-            cmd = ['bash', str(script_path)]
-        elif ext == ".bat":
-            cmd = ['cmd', '/c', str(script_path)]
+        if killed:
+            execution_recorder.record_finished(
+                execution_id, ExecutionStatus.CANCELLED,
+                usage=result.get('usage'),
+                reclaimed=_reclaimed(result),
+                log_segments=result.get('log_segments'),
+                records=result.get('records')
+            )
+            logger.info(f"Execution {execution_id} cancelled manually")
+            return
+
+        # Normal status handling
+        if result['success']:
+            status = ExecutionStatus.SUCCESS
+        elif result.get('timeout'):
+            status = ExecutionStatus.TIMEOUT
         else:
-            if not os.access(script_path, os.X_OK):
-                return {'success': False, 'error': f"Script is not executable: {script_path}"}
-            cmd = [str(script_path)]
-
-        # Start the process
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            text=True, 
-            cwd=script_path.parent
+            status = ExecutionStatus.FAILED
+
+        execution_recorder.record_finished(
+            execution_id, status,
+            started_at=result.get('started_at'),
+            warm_start_saved_ms=result.get('warm_start_saved_ms'),
+            usage=result.get('usage'),
+            reclaimed=_reclaimed(result),
+            log_segments=result.get('log_segments'),
+            records=result.get('records')
         )
-        _add_running_process(bot_id, process)
+        logger.info(f"Execution {execution_id} completed with status {status.value}")
 
-        # Wait for completion with optional timeout
-        timeout = getattr(app.config, 'BOT_EXECUTION_TIMEOUT', None)
-        try:
-            stdout, stderr = process.communicate(timeout=timeout)
-        except subprocess.TimeoutExpired:
-            process.kill()
-            process.communicate()  # Clean up
-            _remove_running_process(bot_id)
-            return {'success': False, 'timeout': True, 'error': "Execution timed out"}
+    except Exception as e:
+        logger.error(f"Error completing execution {execution_id} for bot {bot_id}: {e}", exc_info=True)
+        _record_failure(app, bot_id, execution_id)
 
-        # Remove from running processes
-        _remove_running_process(bot_id)
 
-        # Write logs if configured
-        if bot.log_file_path:
-            _write_log(bot.log_file_path, stdout, stderr)
+def _reclaimed(result: dict) -> dict:
+    """Stray sweep figures of a supervisor result"""
+    return {key: result[key] for key in ('stray_processes', 'reclaimed_rss_kb') if key in result}
 
-        return {
-            'success': process.returncode == 0, 
-            'timeout': False, 
-            'output': stdout, 
-            'error': stderr if process.returncode != 0 else None
-        }
 
-    except Exception as e:
-        if process:
-            try:
-                process.kill()
-            except:
-                pass
-        _remove_running_process(bot_id)
-        logger.error(f"Error running bot {bot_id}: {e}", exc_info=True)
-        return {'success': False, 'timeout': False, 'error': str(e)}
+def _record_failure(app, bot_id: int, execution_id: int):
+    """Best-effort final status after an unexpected error, written synchronously"""
+    try:
+        # Check if killed during error handling
+        if bot_id is not None and _is_bot_killed(bot_id):
+            _remove_killed_bot(bot_id)
+            execution_recorder.record_finished(execution_id, ExecutionStatus.CANCELLED, sync=True)
+        else:
+            execution_recorder.record_finished(execution_id, ExecutionStatus.FAILED, sync=True)
+    except Exception as db_error:
+        logger.error(f"Failed to update execution status: {db_error}", exc_info=True)
+
+
+def _lease_seconds() -> int:
+    return scheduler_service.app.config.get('EXECUTION_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+
+# -------------------
+# Bot command builder
+# -------------------
+def _build_bot_command(bot: Bot) -> dict:
+    """
+    Work out how to launch the bot script: {'cmd', 'cwd'} or {'error'}.
+    Python bots also get 'python', the interpreter, for the warm pools.
+    """
+    if not bot.script_path:
+        return {'error': "Bot script path not configured"}
+
+    script_path = Path(bot.script_path).resolve()
+    if not script_path.exists() or not script_path.is_file():
+        return {'error': f"Script not found or invalid: {script_path}"}
+
+    # Determine command based on file extension
+    ext = script_path.suffix.lower()
+    if ext == ".py":
+        python_path = getattr(bot, 'venv_path', None)
+        if python_path:
+            python_executable = Path(python_path).resolve()
+            if not python_executable.exists():
+                return {'error': f"Python executable not found: {python_executable}"}
+            cmd = [str(python_executable), str(script_path)]
+        else:
+            cmd = ['python', str(script_path)]
+        return {'cmd': cmd, 'cwd': str(script_path.parent), 'python': cmd[0]}
+    elif ext == ".exe":
+        cmd = [str(script_path)]
+    elif ext == ".sh":
+        cmd = ['bash', str(script_path)]
+    elif ext == ".bat":
+        cmd = ['cmd', '/c', str(script_path)]
+    else:
+        if not os.access(script_path, os.X_OK):
+            return {'error': f"Script is not executable: {script_path}"}
+        cmd = [str(script_path)]
+
+    return {'cmd': cmd, 'cwd': str(script_path.parent)}
 
 
 def kill_bot(bot_id: int):
@@ -265,14 +489,39 @@ def kill_bot(bot_id: int):
     # Mark as killed FIRST (before any other operations)
     _add_killed_bot(bot_id)
     
-    # Get the process
-    process = _get_running_process(bot_id)
-    if not process:
-        _remove_killed_bot(bot_id)  # Clean up since bot wasn't running
-        return {'success': False, 'error': "Bot not running"}
+    # Get the running execution
+    execution_id = _get_running_execution(bot_id)
+    if not execution_id:
+        _remove_killed_bot(bot_id)  # Clean up since bot wasn't running here
+        return _request_remote_kill(bot_id)
     
     try:
         # Update database BEFORE killing process to avoid race conditions
+        with scheduler_service.app.app_context():
+            if cancel_execution(execution_id, "Killed by user"):
+                logger.info(f"Execution {execution_id} marked as CANCELLED")
+
+        # Now kill the process and wait for clean termination
+        if not bot_supervisor.kill(execution_id):
+            logger.warning(f"Bot {bot_id} did not terminate gracefully")
+            return {'success': True, 'warning': 'Process did not terminate gracefully'}
+
+        logger.info(f"Bot {bot_id} killed successfully")
+        return {'success': True}
+    
+    except Exception as e:
+        logger.error(f"Error killing bot {bot_id}: {e}", exc_info=True)
+        _remove_killed_bot(bot_id)  # Clean up on failure
+        return {'success': False, 'error': str(e)}
+
+
+def _request_remote_kill(bot_id: int):
+    """
+    The bot is not running in this process (web-only mode or another worker
+    node), so mark its execution CANCELLED and let the owning worker kill
+    the process on its next poll.
+    """
+    try:
         with scheduler_service.app.app_context():
             execution = (
                 db.session.query(BotExecution)
@@ -280,49 +529,77 @@ def kill_bot(bot_id: int):
                 .order_by(BotExecution.started_at.desc())
                 .first()
             )
-            if execution:
-                execution.status = ExecutionStatus.CANCELLED
-                execution.completed_at = datetime.now(ist)
-                db.session.commit()
-                logger.info(f"Execution {execution.execution_id} marked as CANCELLED")
-
-        # Now kill the process
-        process.kill()
-        process.wait(timeout=5)  # Wait for clean termination
-        _remove_running_process(bot_id)
-        logger.info(f"Bot {bot_id} killed successfully")
+            if not execution:
+                return {'success': False, 'error': "Bot not running"}
 
-        return {'success': True}
+            cancel_execution(execution.execution_id, "Killed by user")
+            logger.info(f"Execution {execution.execution_id} cancellation requested for worker")
+
+        return {'success': True, 'message': 'Cancellation requested'}
 
-    except subprocess.TimeoutExpired:
-        logger.warning(f"Bot {bot_id} did not terminate gracefully, forcing...")
-        _remove_running_process(bot_id)
-        return {'success': True, 'warning': 'Process did not terminate gracefully'}
-    
     except Exception as e:
-        logger.error(f"Error killing bot {bot_id}: {e}", exc_info=True)
-        _remove_killed_bot(bot_id)  # Clean up on failure
+        logger.error(f"Error requesting kill for bot {bot_id}: {e}", exc_info=True)
         return {'success': False, 'error': str(e)}
 
 
-def _write_log(path: str, stdout: str, stderr: str):
-    """Thread-safe log writing"""
+def _worker_poll():
+    """
+    Periodic queue poll for processes that run bots.
+
+    - kills local processes whose execution was cancelled remotely
+    - renews the leases this worker holds (heartbeat)
+    - puts executions with expired leases back in the queue
+    - cancels queued executions of deleted bots
+    - queues pipeline nodes whose upstream runs ended elsewhere
+    - dispatches queued executions up to the free supervisor capacity
+
+    Running it also makes the scheduler re-read the job store, which picks
+    up schedules written by web processes.
+    """
+    app = scheduler_service.app
+    with running_executions_lock:
+        local = dict(running_executions)
+
     try:
-        log_file = Path(path)
-        log_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Use a lock specific to this log file
-        lock = log_file_locks[str(log_file)]
-        
-        with lock:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*80}\nExecution at: {datetime.now(ist)}\n{'='*80}\n")
-                if stdout: 
-                    f.write(f"STDOUT:\n{stdout}\n")
-                if stderr: 
-                    f.write(f"STDERR:\n{stderr}\n")
+        with app.app_context():
+            if local:
+                cancelled = (
+                    db.session.query(BotExecution.bot_id, BotExecution.execution_id)
+                    .filter(
+                        BotExecution.execution_id.in_(local.values()),
+                        BotExecution.status == ExecutionStatus.CANCELLED
+                    )
+                    .all()
+                )
+                for bot_id, execution_id in cancelled:
+                    _kill_local_execution(bot_id, execution_id, local, "remote request")
+
+            # Another worker took over these rows; don't run them twice
+            lost = renew_leases(_lease_seconds())
+            for bot_id, execution_id in local.items():
+                if execution_id in lost:
+                    _kill_local_execution(bot_id, execution_id, local, "lost lease")
+
+            reclaim_expired_leases()
+            cancel_orphaned_executions()
+
     except Exception as e:
-        logger.error(f"Error writing log to {path}: {e}", exc_info=True)
+        logger.error(f"Error polling execution queue: {e}", exc_info=True)
+
+    # Pipeline runs whose nodes ended without passing through the recorder here
+    _advance_pipelines()
+    _dispatch_pending()
+
+
+def _kill_local_execution(bot_id: int, execution_id: int, local: dict, reason: str):
+    """Kill the local process of an execution if it is still the one running"""
+    if _get_running_execution(bot_id) == execution_id and local.get(bot_id) == execution_id:
+        _add_killed_bot(bot_id)
+        try:
+            bot_supervisor.kill(execution_id)
+            logger.info(f"Bot {bot_id} killed on {reason} (execution {execution_id})")
+        except Exception as e:
+            logger.error(f"Error killing bot {bot_id}: {e}", exc_info=True)
 
 
 # -------------------
@@ -331,20 +608,26 @@ def _write_log(path: str, stdout: str, stderr: str):
 class BotSchedulerService:
     def __init__(self, app=None):
         self.scheduler = None
+        self.jobstore = None
         self.app = app
+        self.mode = "embedded"
+        self.accepting = False  # dispatching queued executions to the supervisor
         if app:
             self.init_app(app)
 
     def init_app(self, app):
-        """Initialize the scheduler with Flask app"""
+        """
+        Initialize the scheduler with Flask app.
+
+        In "web" mode the scheduler is started paused: it is only used to
+        read and write the shared job store, and a worker process runs the
+        jobs. "embedded" and "worker" modes run jobs in this process.
+        """
         self.app = app
+        self.mode = app.config.get('SCHEDULER_MODE', 'embedded')
         
-        # Configure job store
-        jobstores = {
-            'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])
-        }
-        
-        # Configure executors - make thread pool size configurable
+        # Configure executors - make thread pool size configurable.
+        # Jobs only queue and hand bots to the supervisor, so a small pool suffices.
         thread_pool_size = app.config.get('SCHEDULER_THREAD_POOL_SIZE', 20)
         executors = {
             'default': ThreadPoolExecutor(thread_pool_size)
@@ -357,6 +640,23 @@ class BotSchedulerService:
             'misfire_grace_time': 300  # 5 minutes grace period
         }
 
+        # Opt-in: per-schedule start offsets and a launch rate (see smoothing.py).
+        # Every process must agree on the offsets, as next_run_at carries them.
+        launch_smoother.configure(
+            jitter_max=app.config.get('SCHEDULE_JITTER_MAX_SECONDS', 0),
+            rate=app.config.get('LAUNCH_RATE', 0),
+            burst=app.config.get('LAUNCH_BURST', 1),
+            misfire_grace_time=job_defaults['misfire_grace_time']
+        )
+
+        # Configure job stores: schedule jobs are derived from BotSchedule rows,
+        # "internal" holds this process's housekeeping jobs
+        self.jobstore = BotScheduleJobStore(app, job_defaults=job_defaults)
+        jobstores = {
+            'default': self.jobstore,
+            'internal': MemoryJobStore()
+        }
+
         # Create and start scheduler
         self.scheduler = BackgroundScheduler(
             jobstores=jobstores, 
@@ -378,28 +678,129 @@ class BotSchedulerService:
             lambda e: logger.warning(f"Job {e.job_id} missed"), 
             EVENT_JOB_MISSED
         )
+        self.scheduler.add_listener(
+            self._record_schedule_run,
+            EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+        )
         
+        # Fix schedules that drifted while no scheduler was running
+        self.reconcile_schedules()
+
+        if self.mode == "web":
+            self.scheduler.start(paused=True)
+            atexit.register(self.shutdown)
+            logger.info("APScheduler started in web-only mode (jobs run in the worker)")
+            return
+
+        # Bot output is written to the logs by its own thread
+        log_writer.start(
+            queue_bytes=app.config.get('LOG_WRITER_QUEUE_BYTES', 8 * 1024 * 1024),
+            max_open_files=app.config.get('LOG_WRITER_MAX_OPEN_FILES', 256),
+            fsync_interval=app.config.get('LOG_WRITER_FSYNC_INTERVAL', 5)
+        )
+
+        # Bot processes run under the asyncio supervisor
+        bot_supervisor.start(
+            app.config.get('SUPERVISOR_MAX_CONCURRENCY', 200),
+            warm_pools=app.config.get('WARM_POOLS'),
+            kill_grace=app.config.get('BOT_KILL_GRACE_SECONDS', 10),
+            sweep_interval=app.config.get('STRAY_SWEEP_INTERVAL', 60)
+        )
+
+        # Execution state changes are batched; written finals free slots for the next runs
+        execution_recorder.start(
+            app,
+            flush_interval=app.config.get('EXECUTION_FLUSH_INTERVAL', 0.5),
+            batch_size=app.config.get('EXECUTION_FLUSH_BATCH_SIZE', 100)
+        )
+        # Downstream pipeline nodes are queued first, so the same round dispatches them
+        execution_recorder.add_flush_listener(_advance_pipelines)
+        execution_recorder.add_flush_listener(lambda finished: _dispatch_pending())
+        execution_recorder.add_flush_listener(self.jobstore.record_results)
+        self.accepting = True
+
+        # "Run now" requests are handed to the dispatcher in memory
+        run_queue.start(_start_queued, workers=app.config.get('RUN_NOW_WORKERS', 2))
+
+        # FILE schedules fire from this process's directory watches
+        file_watcher.start(self._on_file_events, poll_interval=app.config.get('FILE_WATCH_POLL_INTERVAL', 5))
+        self.sync_file_watches()
+
+        # Bot logs written on this host are indexed here for log search
+        log_indexer.start(
+            app,
+            path=app.config.get('LOG_INDEX_PATH', 'logs/log_index.db'),
+            interval=app.config.get('LOG_INDEX_INTERVAL', 10),
+            keep_days=app.config.get('LOG_INDEX_KEEP_DAYS', 30)
+        )
+
+        # Queue poll: heartbeats, lease reclaim and dispatching queued executions
+        self.scheduler.add_job(
+            _worker_poll,
+            trigger='interval',
+            seconds=app.config.get('WORKER_POLL_INTERVAL', 5),
+            id='worker_poll',
+            name='Worker poll',
+            jobstore='internal',
+            replace_existing=True
+        )
+
+        # Schedules changed behind the scheduler's back
+        self.scheduler.add_job(
+            self.reconcile_schedules,
+            trigger='interval',
+            seconds=app.config.get('SCHEDULE_RECONCILE_INTERVAL', 60),
+            id='schedule_reconcile',
+            name='Schedule reconciliation',
+            jobstore='internal',
+            replace_existing=True
+        )
+
         self.scheduler.start()
-        atexit.register(lambda: self.scheduler.shutdown())
-        logger.info("APScheduler started successfully")
+        atexit.register(self.shutdown)
+        logger.info(f"APScheduler started successfully ({self.mode} mode)")
+
+        # Pick up what a crashed predecessor left queued or running
+        self.recover_executions()
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the scheduler if it is running; running bots finish first when
+        wait=True. Queued execution state is flushed before returning.
+        """
+        self.accepting = False
+        file_watcher.stop()
+        log_indexer.stop()
+        run_queue.stop()
+        bot_supervisor.stop(wait=wait)
+        log_writer.stop()
+        execution_recorder.stop()
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.shutdown(wait=wait)
+            logger.info("APScheduler shut down")
 
     def add_schedule(self, schedule: BotSchedule):
         """Add or update a schedule in the scheduler"""
         if not schedule.is_active:
             self.remove_schedule(schedule.schedule_id)
             return
+
+        # Event-triggered schedules have no job; they fire from trigger_event
+        if schedule.trigger_type != TriggerType.CRON:
+            self.remove_schedule(schedule.schedule_id)
+            return
         
-        job_id = f"schedule_{schedule.schedule_id}"
+        job_id = schedule_job_id(schedule.schedule_id)
         
         try:
             # Validate cron expression
-            trigger = CronTrigger.from_crontab(schedule.cron_expression, timezone=ist)
+            trigger = launch_smoother.jittered(schedule.schedule_id, schedule_trigger(schedule.cron_expression))
             
             # Add job
             self.scheduler.add_job(
                 _execute_bot_wrapper, 
                 trigger=trigger,
-                args=[schedule.bot_id, schedule.schedule_id, None],
+                args=[schedule.bot_id, schedule.schedule_id],
                 id=job_id,
                 name=f"{schedule.name} (Bot: {schedule.bot.bot_name})",
                 replace_existing=True
@@ -413,19 +814,73 @@ class BotSchedulerService:
             logger.error(f"Error adding schedule {schedule.schedule_id}: {e}", exc_info=True)
             raise
 
+    def _record_schedule_run(self, event):
+        """Job event listener: keep the schedule's latest run up to date"""
+        schedule_id = parse_job_id(event.job_id)
+        if schedule_id is None:
+            return
+        try:
+            if event.code == EVENT_JOB_MISSED:
+                self.jobstore.record_run(schedule_id, event.scheduled_run_time, status=MISSED)
+            elif event.exception is not None:
+                self.jobstore.record_run(schedule_id, event.scheduled_run_time, status=ERROR)
+            elif event.retval is None:
+                self.jobstore.record_run(schedule_id, event.scheduled_run_time, status=NOT_QUEUED)
+            else:
+                self.jobstore.record_run(schedule_id, event.scheduled_run_time, execution_id=event.retval)
+        except Exception as e:
+            logger.error(f"Error recording run of schedule {schedule_id}: {e}", exc_info=True)
+
+    def reconcile_schedules(self, full: bool = False) -> dict | None:
+        """Bring scheduled jobs in line with BotSchedule rows; returns the drift report"""
+        try:
+            with self.app.app_context():
+                report = schedule_reconciler.reconcile(full=full)
+            if report['drift'] and self.scheduler.running:
+                self.scheduler.wakeup()
+            # Also picks up watched directories that did not exist before
+            self.sync_file_watches()
+            return report
+        except Exception as e:
+            logger.error(f"Error reconciling schedules: {e}", exc_info=True)
+            return None
+
+    def recover_executions(self):
+        """
+        Start-up recovery. Executions claimed by earlier worker processes on
+        this host that died are put back in the queue at once, after
+        terminating any of their bots still running, instead of waiting for
+        their leases to expire. Then everything PENDING is dispatched.
+        """
+        try:
+            with self.app.app_context():
+                dead = dead_local_workers()
+                if dead:
+                    reaped = bot_supervisor.reap_workers_processes(dead)
+                    requeued = requeue_worker_executions(dead)
+                    logger.warning(
+                        f"Recovered {len(requeued)} executions of {len(dead)} stopped workers"
+                        + (f", terminated {reaped} processes they left running" if reaped else "")
+                    )
+        except Exception as e:
+            logger.error(f"Error recovering executions: {e}", exc_info=True)
+        _dispatch_pending()
+
     def remove_schedule(self, schedule_id: int):
         """Remove a schedule from the scheduler"""
-        job_id = f"schedule_{schedule_id}"
+        job_id = schedule_job_id(schedule_id)
         try:
             if self.scheduler.get_job(job_id):
                 self.scheduler.remove_job(job_id)
                 logger.info(f"Schedule {schedule_id} removed")
         except Exception as e:
             logger.error(f"Error removing schedule {schedule_id}: {e}", exc_info=True)
+        self.sync_file_watches()
 
     def pause_schedule(self, schedule_id: int):
         """Pause a schedule"""
-        job_id = f"schedule_{schedule_id}"
+        self.sync_file_watches()
+        job_id = schedule_job_id(schedule_id)
         try:
             job = self.scheduler.get_job(job_id)
             if job:
@@ -438,7 +893,8 @@ class BotSchedulerService:
 
     def resume_schedule(self, schedule_id: int):
         """Resume a paused schedule"""
-        job_id = f"schedule_{schedule_id}"
+        self.sync_file_watches()
+        job_id = schedule_job_id(schedule_id)
         try:
             job = self.scheduler.get_job(job_id)
             if job:
@@ -450,7 +906,10 @@ class BotSchedulerService:
             logger.error(f"Error resuming schedule {schedule_id}: {e}", exc_info=True)
 
     def run_bot_immediately(self, bot_id: int, user_id: int):
-        """Schedule a bot to run immediately"""
+        """
+        Queue a manual run; it is dispatched ahead of scheduled runs.
+        The bot's overlap policy applies, so the returned execution may be SKIPPED.
+        """
         with self.app.app_context():
             # Validate bot exists and is active
             bot = db.session.get(Bot, bot_id)
@@ -459,29 +918,146 @@ class BotSchedulerService:
             if not bot.is_active:
                 raise ValueError(f"Bot {bot_id} is inactive")
             
-            # Create execution record
-            execution = BotExecution(
-                bot_id=bot_id, 
-                triggered_by_user_id=user_id,
-                status=ExecutionStatus.PENDING,
-                scheduled_at=datetime.now(ist)
+            # Create execution record; this queues it for any worker
+            execution, replaced = enqueue_execution(
+                bot, user_id=user_id, priority=execution_priority(bot, manual=True)
             )
-            db.session.add(execution)
-            db.session.commit()
-            
-            # Schedule immediate execution
-            job_id = f"immediate_{execution.execution_id}"
-            self.scheduler.add_job(
-                _execute_bot_wrapper,
-                args=[bot_id, None, execution.execution_id],
-                id=job_id,
-                name=f"Immediate execution - Bot {bot_id}",
-                replace_existing=True
-            )
-            logger.info(f"Bot {bot_id} scheduled for immediate execution by user {user_id}")
+            if execution.status == ExecutionStatus.SKIPPED:
+                return execution
+
+            # Web-only mode: a worker dispatches the PENDING row from the queue
+            if self.mode == "web":
+                if replaced:
+                    _replace_executions(bot_id, replaced, execution.execution_id)
+                logger.info(f"Bot {bot_id} queued for immediate execution by user {user_id} (execution {execution.execution_id})")
+                return execution
+
+            # Dispatch now instead of waiting for the next queue poll; if the
+            # hand-off is lost the PENDING row is still dispatched by the poll
+            if run_queue.submit(bot_id, execution.execution_id, replaced):
+                logger.info(f"Bot {bot_id} queued for immediate execution by user {user_id}")
+            else:
+                logger.warning(f"Run queue not running; execution {execution.execution_id} waits for the next queue poll")
             
             return execution
 
+    def trigger_event(self, schedule_id: int, events: int = 1, source: str = "event") -> dict:
+        """
+        Queue a debounced run of a FILE or WEBHOOK schedule for `events`
+        events; events during its quiet period join the run already queued.
+        Raises ValueError if the schedule cannot be fired.
+        """
+        with self.app.app_context():
+            schedule = db.session.get(BotSchedule, schedule_id)
+            if not schedule:
+                raise ValueError(f"Schedule {schedule_id} not found")
+            if schedule.trigger_type == TriggerType.CRON:
+                raise ValueError(f"Schedule {schedule_id} is fired by its cron expression")
+            if not schedule.is_active:
+                raise ValueError(f"Schedule {schedule_id} is paused")
+            bot = schedule.bot
+            bot_id = bot.bot_id
+            if not bot.is_active:
+                raise ValueError(f"Bot {bot_id} is inactive")
+
+            execution, replaced, coalesced = enqueue_event(
+                bot, schedule_id, schedule.debounce_seconds, events=events,
+                priority=execution_priority(bot, schedule)
+            )
+            if execution is None:
+                return {'schedule_id': schedule_id, 'queued': False, 'coalesced': False}
+
+            result = {
+                'schedule_id': schedule_id,
+                'queued': execution.status == ExecutionStatus.PENDING,
+                'coalesced': coalesced,
+                'execution_id': execution.execution_id,
+                'status': execution.status.value,
+                'trigger_events': execution.trigger_events,
+                'not_before': execution.not_before.isoformat() if execution.not_before else None
+            }
+            not_before = ist.localize(execution.not_before) if execution.not_before else datetime.now(ist)
+            execution_id = execution.execution_id
+            nodes = _start_schedule_pipeline(schedule_id, execution) if result['queued'] and not coalesced else []
+
+        if coalesced:
+            logger.info(f"{events} {source} events for schedule {schedule_id} joined execution {execution_id}")
+        else:
+            self.jobstore.record_run(schedule_id, datetime.now(ist), execution_id=execution_id)
+            logger.info(f"Schedule {schedule_id} fired by {events} {source} events (execution {execution_id})")
+        if not result['queued']:
+            return result
+        _replace_for_nodes(nodes)
+
+        # Web-only mode: a worker dispatches the row once its debounce is over
+        if self.mode == "web":
+            if replaced:
+                _replace_executions(bot_id, replaced, execution_id)
+            return result
+
+        if replaced:
+            run_queue.submit(bot_id, execution_id, replaced)
+        # Dispatch when the quiet period ends; later events move this job
+        self.scheduler.add_job(
+            _dispatch_pending,
+            trigger='date',
+            run_date=not_before,
+            id=f"trigger_{schedule_id}",
+            name=f"Debounced run of schedule {schedule_id}",
+            jobstore='internal',
+            replace_existing=True
+        )
+        return result
+
+    def run_pipeline(self, pipeline_id: int, user_id: int) -> int:
+        """Start a run of a pipeline by hand; its root bots are queued at once. Returns the run id."""
+        with self.app.app_context():
+            pipeline = db.session.get(Pipeline, pipeline_id)
+            if not pipeline:
+                raise ValueError(f"Pipeline {pipeline_id} not found")
+            if not pipeline.is_active:
+                raise ValueError(f"Pipeline {pipeline_id} is inactive")
+            run, queued = start_run(pipeline, user_id=user_id)
+            run_id = run.run_id
+
+        logger.info(f"Pipeline {pipeline_id} run {run_id} started by user {user_id}")
+        if self.mode == "web":
+            _replace_for_nodes(queued)
+            return run_id
+        for bot_id, execution_id, replaced in queued:
+            run_queue.submit(bot_id, execution_id, replaced)
+        return run_id
+
+    def _on_file_events(self, hits: dict):
+        """File watcher callback: {schedule_id: events}"""
+        for schedule_id, events in hits.items():
+            try:
+                self.trigger_event(schedule_id, events, source="file")
+            except ValueError as e:
+                logger.warning(f"File events for schedule {schedule_id} ignored: {e}")
+            except Exception as e:
+                logger.error(f"Error firing schedule {schedule_id} for file events: {e}", exc_info=True)
+
+    def sync_file_watches(self):
+        """Watch the directories of the active FILE schedules (where the watcher runs)"""
+        if not file_watcher.running:
+            return
+        try:
+            with self.app.app_context():
+                rows = (
+                    db.session.query(BotSchedule.schedule_id, BotSchedule.watch_path, BotSchedule.watch_pattern)
+                    .join(Bot, Bot.bot_id == BotSchedule.bot_id)
+                    .filter(
+                        BotSchedule.trigger_type == TriggerType.FILE,
+                        BotSchedule.is_active.is_(True),
+                        Bot.is_active.is_(True)
+                    )
+                    .all()
+                )
+            file_watcher.update({row.schedule_id: (row.watch_path, row.watch_pattern) for row in rows})
+        except Exception as e:
+            logger.error(f"Error syncing file watches: {e}", exc_info=True)
+
     def get_all_jobs(self):
         """Get information about all scheduled jobs"""
         try:
@@ -501,26 +1077,34 @@ class BotSchedulerService:
     def get_running_bots(self):
         """
         Returns a list of bot_ids that are currently running.
+        In web-only mode the bots run elsewhere, so this reads the database.
         """
-        with running_processes_lock:
-            return list(running_processes.keys())
+        if self.mode == "web":
+            with self.app.app_context():
+                rows = (
+                    db.session.query(BotExecution.bot_id)
+                    .filter(BotExecution.status == ExecutionStatus.RUNNING)
+                    .distinct()
+                    .all()
+                )
+                return [row.bot_id for row in rows if row.bot_id is not None]
+
+        with running_executions_lock:
+            return list(running_executions.keys())
     
-    def cleanup_completed_immediate_jobs(self):
-        """
-        Remove completed immediate execution jobs from the job store.
-        Call this periodically (e.g., daily) to prevent job store bloat.
-        """
-        try:
-            removed_count = 0
-            for job in self.scheduler.get_jobs():
-                if job.id.startswith('immediate_') and job.next_run_time is None:
-                    self.scheduler.remove_job(job.id)
-                    removed_count += 1
-            
-            if removed_count > 0:
-                logger.info(f"Cleaned up {removed_count} completed immediate jobs")
-        except Exception as e:
-            logger.error(f"Error cleaning up jobs: {e}", exc_info=True)
+    def get_stats(self):
+        """Supervisor and execution recorder metrics of this process"""
+        return {
+            'mode': self.mode,
+            'supervisor': bot_supervisor.stats(),
+            'run_queue': run_queue.stats(),
+            'file_watch': file_watcher.stats(),
+            'log_index': log_indexer.stats(),
+            'log_writer': log_writer.stats(),
+            'recorder': execution_recorder.stats(),
+            'schedule_reconciliation': schedule_reconciler.last_report,
+            'launch_smoothing': launch_smoother.stats()
+        }
 
 
 # -------------------
@@ -0,0 +1,169 @@
+"""
+smoothing.py - Spread out bot launches that would all happen at once
+
+Many schedules share a cron slot ("0 9 * * *"), so their jobs fire in the
+same instant and the worker spawns dozens of processes and opens as many
+database sessions together. Two opt-in layers smooth that out:
+
+- jitter: every schedule fires a fixed offset after its cron time, between
+  0 and the configured maximum. The offset is a hash of schedule_id, so
+  it is the same in every process and on every run, and next_run_at
+  already carries it: due schedules come up one by one instead of together.
+  The offset counts against misfire_grace_time, which is still measured
+  from the cron time.
+- launch rate: a token bucket (rate launches per second, bursts of up to
+  `burst`) paces the bots this worker starts. The dispatcher only claims
+  the runs that can start within RESERVE_AHEAD_SECONDS and starts each at
+  its reserved time; the rest stay queued for any worker.
+
+The delay a run was given (offset plus launch wait) is recorded as
+BotExecution.admission_delay_ms.
+"""
+
+from datetime import timedelta
+from threading import Lock
+import logging, math, time, zlib
+
+from apscheduler.triggers.base import BaseTrigger
+
+logger = logging.getLogger(__name__)
+
+# Claims are limited to launches that can start this soon
+RESERVE_AHEAD_SECONDS = 1.0
+
+
+def jitter_offset(schedule_id: int, max_offset: int) -> int:
+    """Deterministic offset in seconds, 0..max_offset, of a schedule"""
+    if max_offset <= 0:
+        return 0
+    return zlib.crc32(f"schedule:{schedule_id}".encode()) % (max_offset + 1)
+
+
+class OffsetTrigger(BaseTrigger):
+    """A trigger firing a fixed offset after another one"""
+
+    def __init__(self, trigger: BaseTrigger, offset: timedelta):
+        self.trigger = trigger
+        self.offset = offset
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        previous = previous_fire_time - self.offset if previous_fire_time else None
+        fire_time = self.trigger.get_next_fire_time(previous, now - self.offset)
+        return fire_time + self.offset if fire_time else None
+
+    def __str__(self):
+        return f"{self.trigger} + {int(self.offset.total_seconds())}s"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({self.trigger!r}, offset={self.offset})>"
+
+
+class LaunchSmoother:
+    def __init__(self):
+        self.jitter_max = 0
+        self.rate = 0.0
+        self.burst = 1
+        self._lock = Lock()
+        self._tat = 0.0  # theoretical arrival time of the next launch (monotonic)
+
+        self._launches = 0
+        self._delayed = 0
+        self._delay_total = 0.0
+        self._max_delay = 0.0
+
+    def configure(self, jitter_max: int = 0, rate: float = 0, burst: int = 1, misfire_grace_time: int = None):
+        """
+        Set the jitter bound (seconds) and launch rate (per second, 0 = off).
+        The jitter stays below misfire_grace_time, or jittered runs would
+        count as missed.
+        """
+        jitter_max = max(int(jitter_max or 0), 0)
+        if misfire_grace_time and jitter_max >= misfire_grace_time:
+            logger.warning(
+                f"Schedule jitter of {jitter_max}s exceeds the misfire grace time, "
+                f"using {misfire_grace_time - 1}s"
+            )
+            jitter_max = misfire_grace_time - 1
+        self.jitter_max = jitter_max
+        self.rate = max(float(rate or 0), 0.0)
+        self.burst = max(int(burst or 1), 1)
+        if self.jitter_max or self.rate:
+            logger.info(f"Launch smoothing: jitter up to {self.jitter_max}s, rate {self.rate or 'unlimited'}/s, burst {self.burst}")
+
+    # -------------------
+    # Jitter
+    # -------------------
+    def offset(self, schedule_id: int | None) -> int:
+        """Seconds a schedule fires after its cron time"""
+        return jitter_offset(schedule_id, self.jitter_max) if schedule_id is not None else 0
+
+    def jittered(self, schedule_id: int, trigger: BaseTrigger) -> BaseTrigger:
+        """A schedule's cron trigger, offset by its jitter"""
+        offset = self.offset(schedule_id)
+        return OffsetTrigger(trigger, timedelta(seconds=offset)) if offset else trigger
+
+    def misfire_grace_time(self, schedule_id: int, grace: int) -> int:
+        """A job's grace time, so runs are still missed `grace` seconds after the cron time"""
+        return max(grace - self.offset(schedule_id), 1)
+
+    # -------------------
+    # Launch rate (GCRA token bucket)
+    # -------------------
+    def _interval(self) -> float:
+        return 1.0 / self.rate
+
+    def _tolerance(self) -> float:
+        return (self.burst - 1) * self._interval()
+
+    def launch_capacity(self, limit: int) -> int:
+        """How many of `limit` launches can be reserved to start within RESERVE_AHEAD_SECONDS"""
+        if not self.rate:
+            return limit
+        with self._lock:
+            now = time.monotonic()
+            slack = now + RESERVE_AHEAD_SECONDS - (max(self._tat, now) - self._tolerance())
+            if slack < 0:
+                return 0
+            return min(limit, math.floor(slack / self._interval()) + 1)
+
+    def reserve(self) -> float:
+        """Take a launch slot; returns the seconds to wait before launching"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._tat - self._tolerance())
+            self._tat = max(self._tat, now) + self._interval()
+            delay = start - now
+            self._launches += 1
+            if delay > 0:
+                self._delayed += 1
+                self._delay_total += delay
+                self._max_delay = max(self._max_delay, delay)
+            return delay
+
+    def next_launch_in(self) -> float:
+        """Seconds until the bucket has a slot again"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            return max(self._tat - self._tolerance() - time.monotonic(), 0.0)
+
+    def stats(self) -> dict:
+        return {
+            'jitter_max_seconds': self.jitter_max,
+            'launch_rate': self.rate,
+            'launch_burst': self.burst,
+            'launches': self._launches,
+            'delayed_launches': self._delayed,
+            'launch_delay_ms': {
+                'avg': round(self._delay_total / self._delayed * 1000, 2) if self._delayed else None,
+                'max': round(self._max_delay * 1000, 2)
+            }
+        }
+
+
+# -------------------
+# Global smoother instance
+# -------------------
+launch_smoother = LaunchSmoother()
@@ -0,0 +1,471 @@
+"""
+supervisor.py - asyncio supervisor for bot processes
+
+All bot subprocesses are started with asyncio.create_subprocess_exec and
+watched from one event loop thread: output pipes, timeouts and kills are
+handled there, so a running bot no longer occupies an APScheduler pool
+thread for its whole lifetime. A global semaphore caps how many bots run
+at once; runs beyond the cap wait in the loop until a slot frees up.
+
+Completion callbacks (database updates) run on a small thread pool so the
+event loop never blocks on the database.
+
+Python bots whose interpreter has a warm pool (warm_pool.py) are forked
+from an already warmed-up zygote instead of being started cold.
+
+Cold processes are started through launcher.py, which waits for the bot
+with os.wait4 and reports its resource usage; the zygote reports it for
+warm runs. The usage ends up in the result dict.
+
+Every bot runs in its own session and process group. Kills and timeouts
+send SIGTERM to the whole group and SIGKILL after the kill grace period;
+processes the bot leaves behind are reaped when it exits and by a
+periodic sweep (process_tree.py).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Lock, Thread
+import asyncio, json, logging, os, signal, sys, pytz
+
+from automation_platform.bot_logs.capture import (
+    BotOutputCapture, CHUNK_SIZE, OUTPUT_DRAIN_TIMEOUT
+)
+from automation_platform.bot_logs.rotation import LogPolicy
+from automation_platform.bot_logs.writer import log_writer
+from automation_platform.scheduler.execution_queue import WORKER_ID
+from automation_platform.scheduler.process_tree import (
+    DEFAULT_KILL_GRACE_SECONDS, EXECUTION_MARKER_ENV, execution_marker, find_strays,
+    find_worker_strays, find_workers_processes, reap, signal_group, sweeping_supported
+)
+from automation_platform.scheduler.warm_pool import WarmPools
+
+logger = logging.getLogger(__name__)
+ist = pytz.timezone("Asia/Kolkata")
+
+LAUNCHER_SCRIPT = str(Path(__file__).with_name("launcher.py"))
+
+# The launcher needs fork/wait4; elsewhere bots run without resource accounting
+LAUNCHER_SUPPORTED = hasattr(os, "wait4") and hasattr(os, "fork") and bool(sys.executable)
+
+DEFAULT_MAX_CONCURRENCY = 200
+COMPLETION_WORKERS = 4
+
+# Seconds between sweeps for processes of executions that already finished
+DEFAULT_SWEEP_INTERVAL = 60
+
+# How often a bot whose output pipes are still open is checked for exit
+EXIT_POLL_INTERVAL = 0.5
+
+
+class BotSupervisor:
+    def __init__(self):
+        self.loop = None
+        self.max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.kill_grace = DEFAULT_KILL_GRACE_SECONDS
+        self.sweep_interval = DEFAULT_SWEEP_INTERVAL
+        self._thread = None
+        self._semaphore = None
+        self._completion_pool = None
+        self._tasks = set()
+        self._processes = {}  # execution_id -> asyncio Process
+        self._waiting = set()  # execution_ids waiting for a concurrency slot
+        self._cancelled = set()  # killed while still waiting
+        self._sweeping = set()  # exited, their strays being reaped
+        self._sweeper = None
+        self._strays_reaped = 0
+        self._reclaimed_rss_kb = 0
+        self._lock = Lock()
+        self.warm_pools = WarmPools()
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, warm_pools: dict | None = None,
+              kill_grace: float = DEFAULT_KILL_GRACE_SECONDS, sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        """
+        Start the event loop thread. warm_pools is the WARM_POOLS setting;
+        its zygotes start in the background and runs stay cold until ready.
+        kill_grace is how long a bot gets between SIGTERM and SIGKILL;
+        sweep_interval=0 turns the periodic stray sweep off.
+        """
+        if self.running:
+            return
+        self.max_concurrency = max_concurrency
+        self.kill_grace = kill_grace
+        self.sweep_interval = sweep_interval
+        self.loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._completion_pool = ThreadPoolExecutor(COMPLETION_WORKERS, thread_name_prefix="bot-completion")
+        self._thread = Thread(target=self._run_loop, name="bot-supervisor", daemon=True)
+        self._thread.start()
+        if warm_pools:
+            asyncio.run_coroutine_threadsafe(self.warm_pools.start(warm_pools), self.loop)
+        if sweep_interval > 0 and sweeping_supported():
+            self._sweeper = asyncio.run_coroutine_threadsafe(self._sweep_periodically(), self.loop)
+        logger.info(f"Bot supervisor started (max concurrency {max_concurrency})")
+
+    def stop(self, wait: bool = True):
+        """Stop the loop; with wait=True running bots are allowed to finish first"""
+        if not self.running:
+            return
+        if wait:
+            try:
+                asyncio.run_coroutine_threadsafe(self._drain(), self.loop).result()
+            except Exception as e:
+                logger.error(f"Error waiting for running bots: {e}", exc_info=True)
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+        try:
+            asyncio.run_coroutine_threadsafe(self.warm_pools.stop(), self.loop).result(OUTPUT_DRAIN_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error stopping warm pools: {e}", exc_info=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._completion_pool.shutdown(wait=True)
+        self.loop.close()
+        self.loop = None
+        logger.info("Bot supervisor stopped")
+
+    def submit(self, execution_id: int, cmd: list, cwd: str, log_file_path: str | None = None,
+               timeout: float | None = None, on_done=None, warm_python: str | None = None,
+               log_policy: LogPolicy | None = None):
+        """
+        Thread-safe: run a bot command under the supervisor.
+        warm_python is set for Python bots (cmd is [python, script]) so the
+        run can use that interpreter's warm pool. log_policy is the bot's
+        log rotation and retention.
+        on_done(result) is called on a completion thread when the run ends.
+        Returns a concurrent.futures.Future with the result dict.
+        """
+        if not self.running:
+            raise RuntimeError("Bot supervisor is not running")
+        return asyncio.run_coroutine_threadsafe(
+            self._track(self._supervise(
+                execution_id, cmd, cwd, log_file_path, timeout, on_done, warm_python, log_policy
+            )),
+            self.loop
+        )
+
+    def kill(self, execution_id: int, timeout: float | None = None) -> bool:
+        """
+        Thread-safe: terminate a running execution (SIGTERM, then SIGKILL
+        after the kill grace period) and wait up to `timeout` seconds for it
+        to exit, by default a little longer than the grace period. Returns
+        False if it is not running here or did not exit in time.
+        """
+        if not self.running:
+            return False
+        if timeout is None:
+            timeout = self.kill_grace + 5
+        future = asyncio.run_coroutine_threadsafe(self._kill(execution_id, timeout), self.loop)
+        return future.result(timeout + 1)
+
+    def reap_workers_processes(self, worker_ids) -> int:
+        """
+        Thread-safe: terminate bots (and whatever they started) that earlier
+        worker processes on this host left running when they died.
+        Returns the number of processes reaped.
+        """
+        if not self.running or not worker_ids:
+            return 0
+        future = asyncio.run_coroutine_threadsafe(self._reap_workers_processes(set(worker_ids)), self.loop)
+        return future.result(self.kill_grace + 5)
+
+    def is_running(self, execution_id: int) -> bool:
+        with self._lock:
+            return execution_id in self._processes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': len(self._processes),
+                'waiting': len(self._waiting),
+                'max_concurrency': self.max_concurrency,
+                'kill_grace': self.kill_grace,
+                'strays_reaped': self._strays_reaped,
+                'reclaimed_rss_kb': self._reclaimed_rss_kb,
+                'warm_pools': self.warm_pools.stats()
+            }
+
+    # -------------------
+    # Event loop side
+    # -------------------
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _track(self, coro):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await coro
+        finally:
+            self._tasks.discard(task)
+
+    async def _drain(self):
+        tasks = [t for t in self._tasks if t is not asyncio.current_task()]
+        if tasks:
+            logger.info(f"Waiting for {len(tasks)} running bots to finish")
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _supervise(self, execution_id, cmd, cwd, log_file_path, timeout, on_done, warm_python=None,
+                         log_policy=None):
+        with self._lock:
+            self._waiting.add(execution_id)
+        try:
+            async with self._semaphore:
+                with self._lock:
+                    self._waiting.discard(execution_id)
+                    cancelled = execution_id in self._cancelled
+                    self._cancelled.discard(execution_id)
+                if cancelled:
+                    result = {'success': False, 'timeout': False, 'error': "Cancelled before start"}
+                else:
+                    result = await self._run_process(
+                        execution_id, cmd, cwd, log_file_path, timeout, warm_python, log_policy
+                    )
+        except Exception as e:
+            logger.error(f"Error supervising execution {execution_id}: {e}", exc_info=True)
+            result = {'success': False, 'timeout': False, 'error': str(e)}
+
+        if on_done:
+            try:
+                await self.loop.run_in_executor(self._completion_pool, on_done, result)
+            except Exception as e:
+                logger.error(f"Error completing execution {execution_id}: {e}", exc_info=True)
+        return result
+
+    async def _run_process(self, execution_id, cmd, cwd, log_file_path, timeout, warm_python=None,
+                           log_policy=None):
+        started_at = datetime.now(ist)
+        marker = execution_marker(WORKER_ID, execution_id)
+        env = {**os.environ, EXECUTION_MARKER_ENV: marker}
+        pool = self.warm_pools.get(warm_python)
+        warm = await pool.spawn(cmd[-1], cwd, env={EXECUTION_MARKER_ENV: marker}) if pool else None
+        report_fd = None
+        if warm:
+            process, stdout, stderr, saved_ms = warm
+        elif LAUNCHER_SUPPORTED:
+            report_fd, report_w = os.pipe()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, "-I", "-S", LAUNCHER_SCRIPT, str(report_w), *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=cwd,
+                    limit=CHUNK_SIZE,
+                    env=env,
+                    pass_fds=(report_w,),
+                    start_new_session=True
+                )
+            except Exception:
+                os.close(report_fd)
+                raise
+            finally:
+                os.close(report_w)
+            stdout, stderr, saved_ms = process.stdout, process.stderr, None
+        else:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+                limit=CHUNK_SIZE,
+                env=env,
+                start_new_session=hasattr(os, "setsid")
+            )
+            stdout, stderr, saved_ms = process.stdout, process.stderr, None
+        with self._lock:
+            self._processes[execution_id] = process
+
+        capture = BotOutputCapture(log_file_path, log_policy)
+        capture.open()
+        readers = asyncio.gather(
+            self._pump(stdout, "STDOUT", capture),
+            self._pump(stderr, "STDERR", capture)
+        )
+
+        timed_out = False
+        strays = []
+        try:
+            await asyncio.wait_for(self._wait_exit(process), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Execution {execution_id} timed out after {timeout}s, terminating")
+            await self._terminate(process)
+        finally:
+            with self._lock:
+                self._processes.pop(execution_id, None)
+                self._sweeping.add(execution_id)
+            try:
+                # The bot's session id is its own pid; grandchildren left in it are strays
+                strays = await self._reap_strays(execution_id, process.pid, marker)
+            finally:
+                with self._lock:
+                    self._sweeping.discard(execution_id)
+            # Grandchildren may keep the pipes open, so don't wait forever
+            try:
+                await asyncio.wait_for(readers, OUTPUT_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Execution {execution_id} output still open after exit, detaching")
+            # Waits for the log writer to finish the run's output, off the loop
+            await self.loop.run_in_executor(None, capture.close)
+            usage = process.usage if warm else self._read_usage(report_fd)
+            if warm:
+                await pool.recycle_if_needed()
+
+        reclaimed = {
+            'stray_processes': len(strays),
+            'reclaimed_rss_kb': sum(info.rss_kb for info in strays)
+        } if sweeping_supported() else {}
+
+        if timed_out:
+            return {
+                'success': False, 'timeout': True, 'error': "Execution timed out",
+                'started_at': started_at, 'warm_start_saved_ms': saved_ms, 'usage': usage,
+                'log_segments': capture.segments(), 'records': capture.records(), **reclaimed
+            }
+
+        return {
+            'success': process.returncode == 0,
+            'timeout': False,
+            'error': capture.error_text() if process.returncode != 0 else None,
+            'returncode': process.returncode,
+            'started_at': started_at,
+            'warm_start_saved_ms': saved_ms,
+            'usage': usage,
+            'log_segments': capture.segments(),
+            'records': capture.records(),
+            **reclaimed
+        }
+
+    async def _pump(self, stream, label, capture):
+        """Copy one pipe to the capture line by line, in bounded chunks"""
+        while True:
+            try:
+                chunk = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                chunk = e.partial  # EOF
+            except asyncio.LimitOverrunError as e:
+                chunk = await stream.read(max(e.consumed, 1))
+            if not chunk:
+                break
+            # A full log queue holds the pipe, so a bot outrunning the disk blocks on its writes
+            await log_writer.wait_for_room(len(chunk))
+            capture.feed(label, chunk)
+        capture.finish(label)
+
+    async def _kill(self, execution_id, timeout):
+        with self._lock:
+            process = self._processes.get(execution_id)
+            if not process and execution_id in self._waiting:
+                self._cancelled.add(execution_id)
+                return True
+        if not process:
+            return False
+        # Keeps escalating even if the caller stops waiting
+        terminating = asyncio.ensure_future(self._terminate(process))
+        try:
+            await asyncio.wait_for(asyncio.shield(terminating), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _terminate(self, process):
+        """SIGTERM the bot's process group; SIGKILL it after the kill grace period"""
+        self._signal_process(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self._wait_exit(process), self.kill_grace)
+        except asyncio.TimeoutError:
+            logger.warning(f"Process {process.pid} still running {self.kill_grace}s after SIGTERM, killing")
+            self._signal_process(process, signal.SIGKILL)
+            await self._wait_exit(process)
+
+    @staticmethod
+    async def _wait_exit(process):
+        """
+        Wait for the bot process to exit. asyncio's Process.wait() also
+        waits for the output pipes to close, which never happens while a
+        stray grandchild holds them, so the return code is polled as well.
+        """
+        waiter = asyncio.ensure_future(process.wait())
+        try:
+            while process.returncode is None and not waiter.done():
+                await asyncio.wait({waiter}, timeout=EXIT_POLL_INTERVAL)
+        finally:
+            waiter.cancel()
+        return process.returncode
+
+    async def _reap_strays(self, execution_id, session_id, marker) -> list:
+        """Terminate what an exited execution left running; returns the strays found"""
+        if not sweeping_supported():
+            return []
+        strays = await self.loop.run_in_executor(None, find_strays, session_id, marker)
+        if strays:
+            await self._reap(execution_id, strays)
+        return strays
+
+    async def _reap(self, execution_id, strays):
+        rss_kb = sum(info.rss_kb for info in strays)
+        logger.warning(
+            f"Execution {execution_id} left {len(strays)} processes running "
+            f"({', '.join(str(info.pid) for info in strays)}), reclaiming {rss_kb / 1024:.0f}MB"
+        )
+        await reap(strays, self.kill_grace)
+        with self._lock:
+            self._strays_reaped += len(strays)
+            self._reclaimed_rss_kb += rss_kb
+
+    async def _reap_workers_processes(self, worker_ids) -> int:
+        processes = await self.loop.run_in_executor(None, find_workers_processes, worker_ids)
+        for execution_id, infos in processes.items():
+            await self._reap(execution_id, infos)
+        return sum(len(infos) for infos in processes.values())
+
+    async def _sweep_periodically(self):
+        """Catch strays that escaped the per-execution sweep (e.g. started after it)"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                with self._lock:
+                    active = set(self._processes) | self._sweeping
+                strays = await self.loop.run_in_executor(None, find_worker_strays, WORKER_ID, active)
+                for execution_id, processes in strays.items():
+                    await self._reap(execution_id, processes)
+            except Exception as e:
+                logger.error(f"Error sweeping stray bot processes: {e}", exc_info=True)
+
+    @staticmethod
+    def _read_usage(report_fd):
+        """Resource usage the launcher wrote when the bot exited (None if it was killed)"""
+        if report_fd is None:
+            return None
+        try:
+            os.set_blocking(report_fd, False)
+            data = os.read(report_fd, 4096)
+            return json.loads(data) if data else None
+        except (OSError, ValueError):
+            return None
+        finally:
+            os.close(report_fd)
+
+    @staticmethod
+    def _signal_process(process, signum):
+        """Signal the bot's whole process group, or just the process if it leads none"""
+        try:
+            if hasattr(os, "killpg") and process.pid == os.getpgid(process.pid):
+                signal_group(process.pid, signum)
+            else:
+                process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+
+# -------------------
+# Global supervisor instance
+# -------------------
+bot_supervisor = BotSupervisor()
@@ -0,0 +1,111 @@
+"""
+triggers.py - What fires a schedule besides cron
+
+A BotSchedule fires on its cron expression (CRON), when a file lands in a
+watched directory (FILE, see file_watch.py) or when an authenticated
+webhook is called (WEBHOOK). Event triggers queue a run right away,
+debounced: it is dispatched once events have been quiet for
+debounce_seconds, and events meanwhile join it instead of queueing runs of
+their own (execution_queue.enqueue_event).
+
+Webhook tokens are random and shown once; only their SHA-256 is stored.
+"""
+
+from datetime import datetime
+from fnmatch import fnmatch
+import hashlib, hmac, os, secrets, pytz
+
+from croniter import croniter
+
+from automation_platform.database.models import TriggerType
+from automation_platform.scheduler.jobstore import schedule_trigger
+
+ist = pytz.timezone("Asia/Kolkata")
+
+DEFAULT_DEBOUNCE_SECONDS = 5
+MAX_DEBOUNCE_SECONDS = 3600
+
+DEFAULT_WATCH_PATTERN = "*"
+
+
+def parse_trigger_type(value) -> TriggerType:
+    try:
+        return TriggerType((value or TriggerType.CRON.value).upper())
+    except (ValueError, AttributeError):
+        raise ValueError(f"trigger_type must be one of {', '.join(t.value for t in TriggerType)}")
+
+
+def validate_trigger(trigger_type: TriggerType, data: dict, current=None) -> dict:
+    """
+    BotSchedule trigger fields from request data, for a new schedule or on
+    top of `current` (the schedule being updated). Raises ValueError.
+    """
+    def value(field):
+        if field in data:
+            return data[field]
+        if current is not None and current.trigger_type == trigger_type:
+            return getattr(current, field)
+        return None
+
+    fields = {
+        'trigger_type': trigger_type,
+        'cron_expression': None,
+        'watch_path': None,
+        'watch_pattern': None,
+        'debounce_seconds': None
+    }
+
+    if trigger_type == TriggerType.CRON:
+        cron_expression = value('cron_expression')
+        if not cron_expression:
+            raise ValueError("cron_expression is required")
+        try:
+            croniter(cron_expression)
+            fires = schedule_trigger(cron_expression).get_next_fire_time(None, datetime.now(ist)) is not None
+        except Exception:
+            raise ValueError("Invalid cron expression")
+        # e.g. "0 0 30 2 *": parses, but no date ever matches
+        if not fires:
+            raise ValueError("Cron expression never fires")
+        fields['cron_expression'] = cron_expression
+        return fields
+
+    debounce = value('debounce_seconds')
+    debounce = DEFAULT_DEBOUNCE_SECONDS if debounce is None else debounce
+    if isinstance(debounce, bool) or not isinstance(debounce, int) or not 0 <= debounce <= MAX_DEBOUNCE_SECONDS:
+        raise ValueError(f"debounce_seconds must be an integer between 0 and {MAX_DEBOUNCE_SECONDS}")
+    fields['debounce_seconds'] = debounce
+
+    if trigger_type == TriggerType.FILE:
+        watch_path = value('watch_path')
+        if not watch_path or not os.path.isabs(watch_path):
+            raise ValueError("watch_path must be an absolute directory path")
+        watch_pattern = value('watch_pattern') or DEFAULT_WATCH_PATTERN
+        if "/" in watch_pattern:
+            raise ValueError("watch_pattern is a file name glob, e.g. *.csv")
+        fields['watch_path'] = os.path.normpath(watch_path)
+        fields['watch_pattern'] = watch_pattern
+    return fields
+
+
+def matches(pattern: str | None, name: str) -> bool:
+    return fnmatch(name, pattern or DEFAULT_WATCH_PATTERN)
+
+
+# -------------------
+# Webhook tokens
+# -------------------
+def new_webhook_token() -> tuple:
+    """(token, hash): the token is handed out once, the hash is stored"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_webhook_token(token)
+
+
+def hash_webhook_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def webhook_token_matches(token_hash: str | None, token: str | None) -> bool:
+    if not token_hash or not token:
+        return False
+    return hmac.compare_digest(token_hash, hash_webhook_token(token))
@@ -0,0 +1,314 @@
+"""
+warm_pool.py - Warm interpreter pools for Python bots
+
+Opt-in per interpreter via the WARM_POOLS setting, keyed by the bot's
+venv python path (or "python" for bots without a venv):
+
+    WARM_POOLS={"/opt/venvs/etl/bin/python": {"preload": ["pandas", "selenium.webdriver"],
+                                               "max_runs": 500, "max_rss_mb": 1024}}
+
+Each pool keeps one zygote (zygote.py) running under that interpreter with
+the preload modules already imported; every bot run is a fresh child
+forked from it, so the run skips interpreter start-up and those imports.
+A zygote is recycled after max_runs runs or once its RSS exceeds
+max_rss_mb: it stops taking work, lets its running bots finish and a new
+one is started. While no zygote is ready, runs fall back to a cold start.
+
+All methods run on the supervisor's event loop.
+"""
+
+from pathlib import Path
+import array, asyncio, json, logging, os, shutil, signal, socket, tempfile, time
+
+from automation_platform.bot_logs.capture import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+ZYGOTE_SCRIPT = str(Path(__file__).with_name("zygote.py"))
+
+DEFAULT_MAX_RUNS = 500
+DEFAULT_MAX_RSS_MB = 1024
+
+# Seconds to wait for a zygote to import its modules and become ready
+ZYGOTE_START_TIMEOUT = 120
+
+# Seconds between attempts to restart a zygote that failed or died
+RESTART_BACKOFF = 30
+
+
+def warm_pools_supported() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX") and hasattr(socket.socket, "sendmsg")
+
+
+def pool_key(python: str) -> str:
+    """Normalize an interpreter path the way _build_bot_command does"""
+    return python if python == "python" else str(Path(python).resolve())
+
+
+class WarmChild:
+    """A bot run forked by a zygote; quacks like asyncio.subprocess.Process for the supervisor"""
+
+    def __init__(self, pid: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.pid = pid
+        self.returncode = None
+        self.usage = None  # resource usage reported by the zygote on exit
+        self._reader = reader
+        self._writer = writer
+        self._waiter = None
+
+    async def wait(self) -> int:
+        if self._waiter is None:
+            self._waiter = asyncio.ensure_future(self._read_exit())
+        return await asyncio.shield(self._waiter)
+
+    async def _read_exit(self) -> int:
+        try:
+            line = await self._reader.readline()
+            message = json.loads(line) if line else {}
+        except Exception:
+            message = {}
+        finally:
+            self._writer.close()
+        # No exit message means the zygote died; the child died with it or is orphaned
+        self.returncode = message.get("exit", -signal.SIGKILL)
+        self.usage = message.get("usage")
+        return self.returncode
+
+    def send_signal(self, signum: int):
+        if self.returncode is None:
+            os.kill(self.pid, signum)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class WarmPool:
+    def __init__(self, python: str, socket_dir: str, preload=(), max_runs: int = DEFAULT_MAX_RUNS,
+                 max_rss_mb: int = DEFAULT_MAX_RSS_MB):
+        self.python = python
+        self.preload = list(preload)
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.socket_dir = socket_dir
+        self.boot_ms = None  # cold start cost: interpreter start-up plus preload imports
+        self.runs = 0
+        self.generation = 0
+        self._process = None
+        self._socket_path = None
+        self._starting = None
+        self._last_failure = 0.0
+        self._retired = set()
+
+    @property
+    def ready(self) -> bool:
+        return self._process is not None and self._process.returncode is None and self._starting is None
+
+    async def start(self):
+        """Start a zygote; on failure runs stay cold until the next attempt"""
+        if self._starting:
+            return await self._starting
+        self._starting = asyncio.ensure_future(self._start())
+        try:
+            await self._starting
+        finally:
+            self._starting = None
+
+    async def _start(self):
+        self.generation += 1
+        socket_path = os.path.join(self.socket_dir, f"{abs(hash(self.python))}-{self.generation}.sock")
+        config = json.dumps({"preload": self.preload})
+        started = time.perf_counter()
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.python, ZYGOTE_SCRIPT, socket_path, config,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            line = await asyncio.wait_for(process.stdout.readline(), ZYGOTE_START_TIMEOUT)
+            message = json.loads(line) if line else {}
+            if not message.get("ready"):
+                raise RuntimeError(f"zygote exited before ready: {(await process.stderr.read()).decode(errors='replace')[-500:]}")
+        except Exception as e:
+            self._last_failure = time.monotonic()
+            logger.error(f"Warm pool for {self.python} failed to start: {e}")
+            if process and process.returncode is None:
+                process.kill()
+            return
+
+        self.boot_ms = (time.perf_counter() - started) * 1000
+        self.runs = 0
+        self._process = process
+        self._socket_path = socket_path
+        asyncio.ensure_future(self._log_output(process))
+        for name, error in message.get("failed", {}).items():
+            logger.warning(f"Warm pool for {self.python} could not preload {name}: {error}")
+        logger.info(f"Warm pool for {self.python} ready in {self.boot_ms:.0f}ms (pid {process.pid})")
+
+    async def _log_output(self, process):
+        """Drain the zygote's own output so it never blocks on a full pipe"""
+        async def drain(stream, level):
+            while True:
+                line = await stream.readline()
+                if not line:
+                    return
+                logger.log(level, f"Warm pool {self.python}: {line.decode(errors='replace').rstrip()}")
+        await asyncio.gather(drain(process.stdout, logging.INFO), drain(process.stderr, logging.WARNING))
+        await process.wait()
+        if process is self._process:
+            logger.warning(f"Warm pool zygote for {self.python} exited with {process.returncode}")
+            self._last_failure = time.monotonic()
+
+    async def ensure_ready(self) -> bool:
+        """Restart a dead zygote (with backoff); True if runs can be forked now"""
+        if self.ready:
+            return True
+        if self._starting is None and time.monotonic() - self._last_failure >= RESTART_BACKOFF:
+            asyncio.ensure_future(self.start())
+        return False
+
+    async def spawn(self, script: str, cwd: str, env: dict | None = None):
+        """
+        Fork a run of `script` from the zygote, with `env` added to its environment.
+        Returns (WarmChild, stdout reader, stderr reader, saved_ms) or None to run cold.
+        """
+        if not await self.ensure_ready():
+            return None
+
+        requested = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        writer = None
+        try:
+            await loop.sock_connect(sock, self._socket_path)
+            request = json.dumps({"script": script, "cwd": cwd, "env": env or {}}).encode("utf-8")
+            sock.sendmsg([request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", [out_w, err_w]))])
+            reader, writer = await asyncio.open_unix_connection(sock=sock)
+            line = await asyncio.wait_for(reader.readline(), 10)
+            message = json.loads(line) if line else {}
+            if "pid" not in message:
+                raise RuntimeError(message.get("error", "no reply from zygote"))
+        except Exception as e:
+            logger.warning(f"Warm pool for {self.python} could not start {script}, running cold: {e}")
+            if writer:
+                writer.close()
+            else:
+                sock.close()
+            for fd in (out_r, err_r):
+                os.close(fd)
+            return None
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+
+        stdout = await self._pipe_reader(out_r)
+        stderr = await self._pipe_reader(err_r)
+        self.runs += 1
+        saved_ms = max(0, round(self.boot_ms - (time.perf_counter() - requested) * 1000))
+        return WarmChild(message["pid"], reader, writer), stdout, stderr, saved_ms
+
+    @staticmethod
+    async def _pipe_reader(fd: int) -> asyncio.StreamReader:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=CHUNK_SIZE, loop=loop)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), os.fdopen(fd, "rb", 0))
+        return reader
+
+    def rss_mb(self) -> float | None:
+        """Resident memory of the zygote, from /proc"""
+        if not self.ready:
+            return None
+        try:
+            with open(f"/proc/{self._process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    async def recycle_if_needed(self):
+        """Retire the zygote after max_runs runs or above max_rss_mb, and start a new one"""
+        if not self.ready:
+            return
+        rss = self.rss_mb()
+        if self.runs >= self.max_runs:
+            reason = f"{self.runs} runs"
+        elif rss is not None and rss > self.max_rss_mb:
+            reason = f"RSS {rss:.0f}MB"
+        else:
+            return
+        logger.info(f"Recycling warm pool for {self.python} after {reason}")
+        self._retire()
+        asyncio.ensure_future(self.start())
+
+    def _retire(self):
+        """Stop the current zygote taking work; its running bots finish undisturbed"""
+        process, self._process = self._process, None
+        if process and process.returncode is None:
+            self._retired.add(process)
+            process.send_signal(signal.SIGTERM)
+
+    async def stop(self):
+        self._retire()
+        for process in list(self._retired):
+            try:
+                await process.wait()
+            except Exception:
+                pass
+        self._retired.clear()
+
+    def stats(self) -> dict:
+        rss = self.rss_mb()
+        return {
+            'ready': self.ready,
+            'pid': self._process.pid if self.ready else None,
+            'boot_ms': round(self.boot_ms) if self.boot_ms is not None else None,
+            'runs': self.runs,
+            'generation': self.generation,
+            'rss_mb': round(rss, 1) if rss is not None else None
+        }
+
+
+class WarmPools:
+    """The warm pools of one supervisor, by interpreter"""
+
+    def __init__(self):
+        self.pools = {}
+        self._socket_dir = None
+
+    async def start(self, config: dict):
+        if not config:
+            return
+        if not warm_pools_supported():
+            logger.warning("Warm pools need fork and unix sockets; running all bots cold")
+            return
+        self._socket_dir = tempfile.mkdtemp(prefix="ap-warm-")
+        for python, options in config.items():
+            options = options or {}
+            pool = WarmPool(
+                python,
+                self._socket_dir,
+                preload=options.get("preload", []),
+                max_runs=options.get("max_runs", DEFAULT_MAX_RUNS),
+                max_rss_mb=options.get("max_rss_mb", DEFAULT_MAX_RSS_MB)
+            )
+            self.pools[pool_key(python)] = pool
+        await asyncio.gather(*(pool.start() for pool in self.pools.values()))
+
+    def get(self, python: str | None):
+        return self.pools.get(pool_key(python)) if python and self.pools else None
+
+    async def stop(self):
+        await asyncio.gather(*(pool.stop() for pool in self.pools.values()), return_exceptions=True)
+        self.pools.clear()
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = None
+
+    def stats(self) -> dict:
+        return {python: pool.stats() for python, pool in self.pools.items()}
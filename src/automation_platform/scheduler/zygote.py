@@ -0,0 +1,203 @@
+"""
+zygote.py - Warm parent process for Python bots
+
+Started by the warm pool with a bot virtualenv's interpreter:
+
+    <venv python> zygote.py <socket path> <json config>
+
+It imports the configured modules once, prints a ready line on stdout and
+then serves run requests on a unix socket. Each request carries the bot
+script, its working directory, extra environment variables and the
+stdout/stderr pipe ends (SCM_RIGHTS); the zygote forks a fresh child that
+starts its own session and runs the script with runpy, replies
+with the child pid and, when the child exits, with its exit code and
+resource usage (os.wait4).
+
+This file runs inside bot virtualenvs, so it must only use the standard
+library and must not import automation_platform.
+"""
+
+import array, json, os, runpy, select, signal, socket, sys, time, traceback
+
+MAX_REQUEST = 64 * 1024
+POLL_INTERVAL = 0.2
+
+
+def _preload(modules):
+    """Import the configured modules; report the ones that failed"""
+    failed = {}
+    for name in modules:
+        try:
+            __import__(name)
+        except Exception as e:
+            failed[name] = f"{type(e).__name__}: {e}"
+    return failed
+
+
+def _recv_request(conn):
+    """Read one request line and the two pipe fds sent with it"""
+    fds = array.array("i")
+    data, ancdata, _, _ = conn.recvmsg(MAX_REQUEST, socket.CMSG_SPACE(2 * fds.itemsize))
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - (len(payload) % fds.itemsize)])
+    return json.loads(data.decode("utf-8")), list(fds)
+
+
+def _send(conn, message):
+    try:
+        conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+    except OSError:
+        pass  # the supervisor went away; the child still runs to completion
+
+
+def _usage(rusage):
+    """Same fields as launcher.usage_from_rusage"""
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return {
+        "user_cpu_ms": round(rusage.ru_utime * 1000),
+        "sys_cpu_ms": round(rusage.ru_stime * 1000),
+        "max_rss_kb": max_rss_kb,
+        "block_input_ops": rusage.ru_inblock,
+        "block_output_ops": rusage.ru_oublock,
+        "voluntary_ctx_switches": rusage.ru_nvcsw,
+        "involuntary_ctx_switches": rusage.ru_nivcsw,
+    }
+
+
+def _exit_code(status):
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return 1
+
+
+def _run_child(request, fds, server, connections):
+    """In the forked child: become the bot process and run its script"""
+    try:
+        server.close()
+        for conn in connections:
+            conn.close()
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        # Own session and process group, so the supervisor can stop the bot's whole tree
+        os.setsid()
+        os.environ.update(request.get("env", {}))
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in (devnull, *fds):
+            os.close(fd)
+
+        script = request["script"]
+        os.chdir(request["cwd"])
+        sys.argv = [script, *request.get("args", [])]
+        sys.path.insert(0, os.path.dirname(script))
+    except BaseException:
+        os._exit(70)
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    os._exit(code)
+
+
+def main():
+    socket_path, config = sys.argv[1], json.loads(sys.argv[2])
+    del sys.path[0]  # this file's directory; each bot gets its own script directory
+    started = time.perf_counter()
+    failed = _preload(config.get("preload", []))
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    parent = os.getppid()
+
+    print(json.dumps({
+        "ready": True,
+        "pid": os.getpid(),
+        "preload_ms": round((time.perf_counter() - started) * 1000),
+        "failed": failed
+    }), flush=True)
+
+    children = {}  # child pid -> connection waiting for its exit code
+    while True:
+        # Retired or orphaned: stop taking work, let running bots finish
+        if stopping or os.getppid() != parent:
+            if server.fileno() != -1:
+                server.close()
+            if not children:
+                break
+        else:
+            readable, _, _ = select.select([server], [], [], POLL_INTERVAL)
+            if readable:
+                conn, _ = server.accept()
+                try:
+                    request, fds = _recv_request(conn)
+                except Exception as e:
+                    _send(conn, {"error": f"Bad request: {e}"})
+                    conn.close()
+                    continue
+                if len(fds) != 2:
+                    _send(conn, {"error": "Expected stdout and stderr descriptors"})
+                    for fd in fds:
+                        os.close(fd)
+                    conn.close()
+                    continue
+
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    _run_child(request, fds, server, [conn, *children.values()])
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                _send(conn, {"pid": pid})
+
+        if stopping or os.getppid() != parent:
+            time.sleep(POLL_INTERVAL)
+
+        while children:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn:
+                _send(conn, {"exit": _exit_code(status), "usage": _usage(rusage)})
+                conn.close()
+
+    try:
+        os.unlink(socket_path)
+    except OSError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -10,4 +10,28 @@ class Settings(BaseSettings):
     MS_TENANT_ID: str
     SECRET_KEY: str
 
+    # Where the scheduler runs: "embedded" (in the web process),
+    # "web" (web only, a separate worker runs bots) or "worker"
+    SCHEDULER_MODE: str = "embedded"
+
+    # Warm interpreter pools for Python bots, as JSON keyed by venv python path:
+    # {"/opt/venvs/etl/bin/python": {"preload": ["pandas"], "max_runs": 500, "max_rss_mb": 1024}}
+    WARM_POOLS: dict = {}
+
+    # Launch smoothing (off by default): schedules fire up to
+    # SCHEDULE_JITTER_MAX_SECONDS after their cron time, and each worker starts
+    # at most LAUNCH_RATE bots per second, in bursts of up to LAUNCH_BURST
+    SCHEDULE_JITTER_MAX_SECONDS: int = 0
+    LAUNCH_RATE: float = 0
+    LAUNCH_BURST: int = 10
+
+    # Bot log rotation defaults, overridable per bot (0 = no limit): logs are
+    # rotated past BOT_LOG_ROTATE_MB or once their oldest run is
+    # BOT_LOG_ROTATE_DAYS old, and compressed archives are kept up to
+    # BOT_LOG_KEEP_FILES files and BOT_LOG_KEEP_DAYS days
+    BOT_LOG_ROTATE_MB: int = 100
+    BOT_LOG_ROTATE_DAYS: int = 0
+    BOT_LOG_KEEP_FILES: int = 10
+    BOT_LOG_KEEP_DAYS: int = 0
+
 settings = Settings()
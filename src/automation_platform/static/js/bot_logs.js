@@ -2,6 +2,7 @@
 const botActiveRadio = document.getElementById('botActive');
 const botInactiveRadio = document.getElementById('botInactive');
 const logContainer = document.getElementById("botLogs");
+const executionStatus = document.getElementById("executionStatus");
 const changeAccessBtn = document.getElementById('changeAccessBtn');
 const customUrlButtonContainer = document.getElementById('customUrlButtonContainer'); // The container location is now moved
 
@@ -168,36 +169,142 @@ async function toggleBotStatus(activate) {
         // FIX: Check for res.ok (HTTP status 200-299) AND a successful message/no error
         if (res.ok && data.message && !data.error) {
             console.log(data.message);
-            // On SUCCESS, let fetchBotLogs() confirm the new state and re-enable buttons
-            await fetchBotLogs();
+            // On SUCCESS, let the server confirm the new state (stream event or fetch)
+            await refreshBotState();
         } else {
             // ERROR: Revert radio button state immediately
             alert(`Error: ${data.error || 'Failed to change bot status.'}`);
             if (radioToRevert) radioToRevert.checked = true;
-            await fetchBotLogs();
+            await refreshBotState();
         }
     } catch (err) {
         // NETWORK ERROR: Revert radio button state
         console.error("Error toggling bot status:", err);
         alert("Network error: Could not contact the server.");
         if (radioToRevert) radioToRevert.checked = true;
-        await fetchBotLogs();
+        await refreshBotState();
     } finally {
         if (botActiveRadio) botActiveRadio.disabled = false;
         if (botInactiveRadio) botInactiveRadio.disabled = false;
     }
 }
 
+// --- Log tail state ---
+// The server sends only what was appended since logCursor; the first
+// request (and any rotation or truncation) resets the view to the last lines.
+const LOG_TAIL_LINES = 500;
+const MAX_LOG_CHARS = 2 * 1024 * 1024; // oldest output is dropped beyond this
+let logCursor = null;
+let logChars = 0;
+let logFetchInFlight = false;
+let logStream = null; // EventSource while the server pushes the log
+let logPollTimer = null;
+
+function renderLogChunk(data) {
+    let pre = logContainer.querySelector('pre');
+    if (!pre || data.reset) {
+        logContainer.innerHTML = '';
+        pre = document.createElement('pre');
+        logContainer.appendChild(pre);
+        logChars = 0;
+    }
+    if (!data.logs) return;
+
+    // Follow the output only if the user has not scrolled up
+    const atBottom = logContainer.scrollHeight - logContainer.scrollTop - logContainer.clientHeight < 40;
+    pre.appendChild(document.createTextNode(data.logs));
+    logChars += data.logs.length;
+    if (logChars > MAX_LOG_CHARS) {
+        pre.textContent = pre.textContent.slice(-MAX_LOG_CHARS / 2);
+        logChars = pre.textContent.length;
+    }
+    if (atBottom || data.reset) {
+        logContainer.scrollTop = logContainer.scrollHeight;
+    }
+}
+
+function renderBotStatus(isActive) {
+    if (botActiveRadio && botInactiveRadio) {
+        const botIsActive = isActive === 1 || isActive === true;
+        botActiveRadio.checked = botIsActive;
+        botInactiveRadio.checked = !botIsActive;
+    }
+}
+
+function renderExecutionStatus(data) {
+    if (!executionStatus) return;
+    if (!data.execution_id) {
+        executionStatus.textContent = "No executions yet";
+        return;
+    }
+    const when = data.completed_at || data.started_at;
+    executionStatus.textContent = `Last execution #${data.execution_id}: ${data.status}` + (when ? ` (${when})` : "");
+}
+
+// --- Live log stream ---
+// The server pushes appended output and execution status over SSE; the
+// browser reconnects on its own and resumes after the last event id (the
+// log cursor). If streams are unavailable or refused, fall back to polling.
+function startLogStream() {
+    if (!window.EventSource || !BOT_ID) {
+        startLogPolling();
+        return;
+    }
+    const params = new URLSearchParams({ bot_id: BOT_ID, lines: LOG_TAIL_LINES });
+    if (logCursor) params.set("last_event_id", `${logCursor.inode}:${logCursor.offset}`);
+    logStream = new EventSource(`/api/botcontrol/bot-wise-logs/stream?${params}`);
+
+    logStream.addEventListener("log", (e) => {
+        const data = JSON.parse(e.data);
+        if (e.lastEventId) {
+            const [inode, offset] = e.lastEventId.split(":").map(Number);
+            logCursor = { inode, offset };
+        }
+        renderLogChunk(data);
+    });
+    logStream.addEventListener("status", (e) => {
+        const data = JSON.parse(e.data);
+        renderBotStatus(data.is_active);
+        renderExecutionStatus(data);
+    });
+    logStream.onerror = () => {
+        // CLOSED means the browser gave up (e.g. 503, too many streams)
+        if (logStream.readyState === EventSource.CLOSED) {
+            logStream = null;
+            startLogPolling();
+        }
+    };
+}
+
+function startLogPolling() {
+    if (logPollTimer) return;
+    logPollTimer = setInterval(fetchBotLogs, 5000);
+}
+
+// While streaming, status changes arrive as events
+async function refreshBotState() {
+    if (!logStream) await fetchBotLogs();
+}
+
 // --- Log and Status Fetching Function (MODIFIED) ---
 async function fetchBotLogs() {
-    if (!BOT_ID) return;
+    if (!BOT_ID || logFetchInFlight) return;
+    logFetchInFlight = true;
     try {
-        const res = await fetch("/api/botcontrol/bot-wise-logs", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ bot_id: BOT_ID })
-        });
-        const data = await res.json();
+        let data;
+        do {
+            const res = await fetch("/api/botcontrol/bot-wise-logs", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(logCursor
+                    ? { bot_id: BOT_ID, cursor: logCursor }
+                    : { bot_id: BOT_ID, lines: LOG_TAIL_LINES })
+            });
+            data = await res.json();
+            if (data.error) break;
+            logCursor = data.cursor;
+            renderLogChunk(data);
+        } while (data.more);
 
         // --- 1. HANDLE CUSTOM URL BUTTON (NEW LOGIC) ---
         customUrlButtonContainer.innerHTML = ''; // Clear existing button
@@ -218,27 +325,20 @@ async function fetchBotLogs() {
             customUrlButtonContainer.appendChild(customUrlBtn);
         }
 
-        // --- 2. Update logs ---
+        // --- 2. Logs were appended above; show errors here ---
         if (data.error) {
+            logCursor = null;
             logContainer.textContent = "No logs found for this bot.";
-        } else {
-            // Ensure log content is displayed correctly
-            logContainer.innerHTML = `<pre>${data.logs}</pre>`;
-            logContainer.scrollTop = logContainer.scrollHeight;
         }
 
         // --- 3. Control segmented control state ---
-        if (botActiveRadio && botInactiveRadio) {
-            const isActive = data.is_active;
-            const botIsActive = isActive === 1 || isActive === true;
-
-            // This reads the definitive status from the server and updates the UI
-            botActiveRadio.checked = botIsActive;
-            botInactiveRadio.checked = !botIsActive;
-        }
+        renderBotStatus(data.is_active);
     } catch (err) {
         console.error("Error loading logs or fetching status:", err);
+        logCursor = null;
         logContainer.textContent = "Error loading logs. Check console for details.";
+    } finally {
+        logFetchInFlight = false;
     }
 }
 
@@ -259,9 +359,8 @@ async function checkUserPermission(userId) {
 
 // --- Initialization (FIXED: Added missing change listeners for bot status) ---
 document.addEventListener("DOMContentLoaded", () => {
-    // Initial load and auto-refresh
-    fetchBotLogs();
-    setInterval(fetchBotLogs, 5000);
+    // Initial load (bot URL, status, last lines), then follow the log live
+    fetchBotLogs().then(startLogStream);
 
     // --- SEGMENTED CONTROL LISTENERS (NEW/FIXED) ---
     // These listeners were missing, causing toggleBotStatus to never run.
@@ -0,0 +1,40 @@
+"""
+worker.py - Standalone scheduler worker process
+
+Runs APScheduler and the bot processes without serving web requests.
+Pair it with web processes started with SCHEDULER_MODE=web:
+
+    poetry run python -m automation_platform.worker
+"""
+
+from threading import Event
+import logging, signal
+
+from automation_platform import create_app
+from automation_platform.scheduler.scheduler import scheduler_service
+
+logger = logging.getLogger("automation_platform.scheduler.worker")
+
+
+def main():
+    # Starts the scheduler, which keeps the app; nothing serves it here
+    create_app(scheduler_mode="worker")
+    stop = Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Worker received signal {signum}, shutting down")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    logger.info("Scheduler worker started")
+    while not stop.is_set():
+        stop.wait(1)
+
+    scheduler_service.shutdown()
+    logger.info("Scheduler worker stopped")
+
+
+if __name__ == "__main__":
+    main()